@@ -0,0 +1,336 @@
+"""Benchmarks for the hot paths of main.py over a reproducible synthetic corpus.
+
+    python benchmark.py --files 5000 --output results.json
+
+The corpus (fake audio frames plus tags, in MP3, FLAC, M4A and Ogg Vorbis
+containers) is generated from --seed, so two runs with the same options
+measure the same files. Per-file operations are also timed per format.
+Writes and stripping run last because they modify the corpus.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import struct
+import argparse
+import platform
+import tempfile
+import subprocess
+
+from mutagen.ogg import OggPage
+from mutagen.flac import VCommentDict
+
+from main import (METADATA_FIELDS, DEFAULT_READER_WORKERS, CLIEditor, FilenameRules, MetadataIndex,
+                  MetadataStore, SearchIndex, SortKeys, TagReaderPool, TagSnapshot, Transform, apply_metadata_changes,
+                  diff_metadata, dict_store_memory_usage, read_library, read_metadata_file, restore_snapshot,
+                  write_metadata_file, write_metadata_rows, _strip_file)
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz: 417-byte frames
+MPEG_FRAME = b'\xff\xfb\x90\x64' + b'\x00' * 413
+SAMPLES_PER_FRAME = 1152
+
+
+def _mp3_audio(frames):
+    return MPEG_FRAME * frames
+
+
+def _flac_audio(frames):
+    # STREAMINFO: 44.1 kHz, stereo, 16 bits; the "frames" are sync codes plus zeros
+    samples = frames * SAMPLES_PER_FRAME
+    info = (struct.pack('>HH', 4096, 4096) + b'\x00' * 6
+            + ((44100 << 44) | (1 << 41) | (15 << 36) | samples).to_bytes(8, 'big') + b'\x00' * 16)
+    return b'fLaC' + bytes([0x80]) + len(info).to_bytes(3, 'big') + info + (b'\xff\xf8' + b'\x00' * 415) * frames
+
+
+def _ogg_audio(frames):
+    # Vorbis identification, empty comment and dummy setup headers, then one audio page per frame
+    ident = b'\x01vorbis' + struct.pack('<IBI3iB', 0, 2, 44100, 0, 128000, 0, 0xb8) + b'\x01'
+    headers = [[ident], [b'\x03vorbis' + VCommentDict().write(), b'\x05vorbis' + b'\x00' * 32]]
+    pages = []
+    for sequence, packets in enumerate(headers + [[b'\x00' * 413]] * frames):
+        page = OggPage()
+        page.serial = 1
+        page.sequence = sequence
+        page.packets = packets
+        page.position = max(0, sequence - 1) * SAMPLES_PER_FRAME
+        page.first = sequence == 0
+        page.last = sequence == len(headers) + frames - 1
+        pages.append(page.write())
+    return b''.join(pages)
+
+
+def _mp4_audio(frames):
+    # ftyp + moov/mvhd (length only, no track) + mdat
+    def atom(name, payload):
+        return struct.pack('>I', 8 + len(payload)) + name + payload
+    mvhd = b'\x00' * 12 + struct.pack('>II', 44100, frames * SAMPLES_PER_FRAME) + b'\x00' * 80
+    return (atom(b'ftyp', b'M4A \x00\x00\x00\x00M4A mp42isom') + atom(b'moov', atom(b'mvhd', mvhd))
+            + atom(b'mdat', b'\x00' * 417 * frames))
+
+
+AUDIO_FORMATS = {'mp3': _mp3_audio, 'flac': _flac_audio, 'm4a': _mp4_audio, 'ogg': _ogg_audio}
+
+FILENAME_PATTERNS = {
+    'faixa-titulo-artista': "{track} - {title} - {artist}",
+    'faixa-titulo-espacos-artista': "{track} - {title}   {artist}",
+    'faixa-titulo': "{track}- {title}",
+    'titulo-artista': "{title} - {artist}",
+    'livre': "{title}",
+}
+
+WORDS = ["Amor", "Saudade", "Estrada", "Coração", "Luar", "Sertão", "Mar", "Festa", "Viola",
+         "Noite", "Xote", "Forró", "Pé", "de", "Serra", "Lua", "Café", "Chão", "Asa", "Branca"]
+ARTISTS = ["Ivete Sangalo", "Dino Franco e Mouraí", "Luiz Gonzaga", "Elba Ramalho", "Dominguinhos",
+           "Trio Nordestino", "Tonico e Tinoco", "Gal Costa", "Alceu Valença", "Marinês"]
+GENRES = ["Forró", "Sertanejo", "Axé", "MPB", "Baião"]
+
+
+def generate_corpus(root, files, tag_density=0.6, untagged=0.1, depth=2, album_size=12,
+                    patterns=tuple(FILENAME_PATTERNS), audio_frames=20, seed=0, formats=('mp3',)):
+    """Write a reproducible corpus below root and return the list of file paths.
+
+    Files are grouped in albums of album_size nested depth folders deep; each
+    album uses one filename pattern and one of `formats` (in turn). A tagged
+    file gets each metadata field with probability tag_density (title and
+    artist always); a fraction `untagged` of the files carries no tag at all.
+    """
+    rng = random.Random(seed)
+    audio = {fmt: AUDIO_FORMATS[fmt](audio_frames) for fmt in formats}
+    paths = []
+    album = 0
+    while len(paths) < files:
+        folder = os.path.join(root, *[f"nivel{level}_{rng.randrange(4)}" for level in range(depth - 1)],
+                              f"album_{album:05d}")
+        os.makedirs(folder, exist_ok=True)
+        pattern = FILENAME_PATTERNS[rng.choice(patterns)]
+        fmt = formats[album % len(formats)]
+        artist = rng.choice(ARTISTS)
+        for track in range(1, min(album_size, files - len(paths)) + 1):
+            path = None
+            while path is None or os.path.exists(path):
+                # Patterns without a track number can repeat a name inside the album
+                title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4)))
+                name = pattern.format(track=f"{track:02d}", title=title, artist=artist)
+                path = os.path.join(folder, f"{name}.{fmt}")
+            with open(path, 'wb') as f:
+                f.write(audio[fmt])
+            if rng.random() >= untagged:
+                tags = {'title': title, 'artist': artist}
+                for field, value in [('album', f"Álbum {album}"), ('tracknumber', f"{track}/{album_size}"),
+                                     ('genre', rng.choice(GENRES)), ('date', str(rng.randint(1960, 2024))),
+                                     ('albumartist', artist), ('composer', rng.choice(ARTISTS)),
+                                     ('performer', rng.choice(ARTISTS))]:
+                    if rng.random() < tag_density:
+                        tags[field] = value
+                write_metadata_file(path, tags, padding=1024)
+            paths.append(path)
+        album += 1
+    return paths
+
+
+def timed(results, name, items, func):
+    """Run func once, record its wall time under name and return its result."""
+    start = time.perf_counter()
+    value = func()
+    elapsed = time.perf_counter() - start
+    results[name] = {'seconds': round(elapsed, 4), 'items': items,
+                     'per_second': round(items / elapsed, 1) if elapsed > 0 else None}
+    print(f"{name:<28} {elapsed:8.3f}s  {items:>8} itens", file=sys.stderr)
+    return value
+
+
+def measure_startup(runs=3):
+    """Best of runs for a headless `main.py scan` of an empty folder, in a fresh interpreter."""
+    main_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+    best = None
+    with tempfile.TemporaryDirectory() as empty:
+        for _ in range(runs):
+            start = time.perf_counter()
+            done = subprocess.run([sys.executable, main_path, '--startup-time', 'scan', '--no-index', empty],
+                                  capture_output=True, text=True)
+            elapsed = time.perf_counter() - start
+            report = json.loads(done.stderr.strip().splitlines()[-1])
+            if best is None or elapsed < best['process_s']:
+                best = dict(report, process_s=round(elapsed, 4))
+    print(f"{'startup (cli)':<28} {best['process_s']:8.3f}s  imports {best['imports_ms']:.0f} ms", file=sys.stderr)
+    return best
+
+
+def timed_by_format(results, name, groups, func):
+    """Time func(paths) for each {format: paths} group as name.<format>, plus the total as name."""
+    values = []
+    for fmt, group in groups.items():
+        values.extend(timed(results, f"{name}.{fmt}", len(group), lambda: func(group)))
+    seconds = sum(results[f"{name}.{fmt}"]['seconds'] for fmt in groups)
+    items = sum(len(group) for group in groups.values())
+    results[name] = {'seconds': round(seconds, 4), 'items': items,
+                     'per_second': round(items / seconds, 1) if seconds > 0 else None}
+    return values
+
+
+def run_benchmarks(paths, corpus, workers, mode):
+    results = {'startup': measure_startup()}
+    names = [os.path.basename(p) for p in paths]
+    groups = {}
+    for path in paths:
+        groups.setdefault(os.path.splitext(path)[1].lstrip('.'), []).append(path)
+    pool = TagReaderPool(workers, mode)
+
+    # Filename parsing: cold compiled rules, memoized, and one rule per folder
+    editor = CLIEditor(workers, mode, filename_rules=FilenameRules())
+    timed(results, 'parse_filename', len(names), lambda: [editor.parse_filename(n) for n in names])
+    timed(results, 'parse_filename_memo', len(names), lambda: [editor.parse_filename(n) for n in names])
+    editor.filename_rules = FilenameRules()
+    timed(results, 'parse_folders', len(paths), lambda: editor.parse_folders(paths))
+
+    # Tag reading, one file at a time: tag-only fast path vs. full parse, per format
+    timed_by_format(results, 'read_metadata', groups, lambda group: [read_metadata_file(p) for p in group])
+    timed_by_format(results, 'read_metadata_full', groups,
+                    lambda group: [read_metadata_file(p, fast=False) for p in group])
+
+    # Folder loading on the pool, with an empty and then a warm index
+    metadata_index = MetadataIndex(':memory:')
+    load = lambda: {fp: md for fp, md, _ in read_library(corpus, pool, metadata_index, METADATA_FIELDS)}
+    file_data = timed(results, 'load_folder', len(paths), load)
+    timed(results, 'load_folder_indexed', len(paths), load)
+    metadata_index.close()
+
+    # Memory per track: plain dicts vs. the columnar store the editor keeps
+    store = MetadataStore()
+
+    def build_store():
+        for file_path, metadata in file_data.items():
+            store[file_path] = metadata
+    timed(results, 'store_build', len(file_data), build_store)
+    tracks = max(len(file_data), 1)
+    results['memory'] = {'dict_bytes_per_track': round(dict_store_memory_usage(file_data) / tracks, 1),
+                         'store_bytes_per_track': round(store.memory_usage() / tracks, 1)}
+    print(f"{'memory (bytes/track)':<28} dict {results['memory']['dict_bytes_per_track']:.0f}"
+          f" -> store {results['memory']['store_bytes_per_track']:.0f}", file=sys.stderr)
+
+    # Filtering and sorting over the store
+    search_index = SearchIndex(METADATA_FIELDS)
+
+    def build_index():
+        for file_path, metadata in store.items():
+            search_index.set_row(file_path, metadata)
+    timed(results, 'filter_index_build', len(store), build_index)
+    timed(results, 'filter_substring', len(store), lambda: search_index.search("gonza"))
+    timed(results, 'filter_fuzzy', len(store), lambda: search_index.fuzzy_search("luis gonzaga"))
+    sort_keys = SortKeys()
+    file_paths = list(store)
+    timed(results, 'sort_artist_track', len(file_paths),
+          lambda: sort_keys.sort(file_paths, [('artist', False), ('tracknumber', False)], store))
+    timed(results, 'sort_artist_track_cached', len(file_paths),
+          lambda: sort_keys.sort(file_paths, [('artist', False), ('tracknumber', True)], store))
+
+    # Transform preview: computed in memory, once per distinct value
+    transform = Transform([{'op': 'replace', 'find': ' e ', 'replace': ' & ', 'fields': ['artist']},
+                           {'op': 'case', 'mode': 'title', 'fields': ['title']}, {'op': 'trim'}])
+    timed(results, 'transform_preview', len(store), lambda: transform.plan(store))
+
+    # Export to CSV, then re-import it against a warm index: every row is diffed, nothing is written
+    scratch = tempfile.mkdtemp(prefix="organizador_export_")
+    export_path = os.path.join(scratch, 'export.csv')
+    with open(export_path, 'w', encoding='utf-8', newline='') as f:
+        timed(results, 'export_csv', len(store), lambda: write_metadata_rows(f, store.items(), METADATA_FIELDS, 'csv'))
+    with open(os.devnull, 'w') as devnull:
+        importer = CLIEditor(workers, mode, out=devnull, index_path=os.path.join(scratch, 'index.sqlite3'))
+        importer.scan_command([corpus])
+        timed(results, 'import_csv_unchanged', len(store), lambda: importer.import_command(export_path))
+    shutil.rmtree(scratch, ignore_errors=True)
+
+    # Writes: one edited field per file, as save_metadata does for a cell edit
+    def write_group(group):
+        changes = []
+        for fp in group:
+            md = file_data[fp]
+            changes.append((fp, md, diff_metadata(md, {'title': (md.get('title') or '') + ' (editado)'})))
+        return apply_metadata_changes(changes, pool)
+    timed_by_format(results, 'save_metadata', groups, write_group)
+
+    # Strip with a tag snapshot (as the GUI and CLI do), restore it, then strip without one
+    # so the two strip timings cover the same tags
+    scratch = tempfile.mkdtemp(prefix="organizador_snapshot_")
+    snapshot_path = os.path.join(scratch, 'tags.snap')
+    with TagSnapshot(snapshot_path) as snapshot:
+        timed(results, 'bulk_strip_snapshot', len(paths), lambda: snapshot.map(pool, _strip_file, paths))
+    results['bulk_strip_snapshot']['snapshot_bytes'] = os.path.getsize(snapshot_path)
+    timed(results, 'snapshot_restore', len(paths), lambda: list(restore_snapshot(snapshot_path, pool)))
+    shutil.rmtree(scratch, ignore_errors=True)
+
+    # Strip everything, then again over the now clean files (only the header/trailer peek)
+    stripped = timed_by_format(results, 'bulk_strip', groups, lambda group: pool.map(_strip_file, group))
+    results['bulk_strip']['bytes_reclaimed'] = sum(r for _, error, r in stripped if error is None and r)
+    timed_by_format(results, 'bulk_strip_clean', groups, lambda group: pool.map(_strip_file, group))
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks do Organizador de Músicas")
+    parser.add_argument("--files", type=int, default=2000, help="Número de arquivos do corpus")
+    parser.add_argument("--tag-density", type=float, default=0.6,
+                        help="Probabilidade de cada campo opcional estar preenchido")
+    parser.add_argument("--untagged", type=float, default=0.1, help="Fração de arquivos sem tag")
+    parser.add_argument("--depth", type=int, default=2, help="Profundidade das pastas dos álbuns")
+    parser.add_argument("--album-size", type=int, default=12, help="Arquivos por pasta")
+    parser.add_argument("--patterns", nargs="+", choices=list(FILENAME_PATTERNS), default=list(FILENAME_PATTERNS),
+                        help="Formatos de nome de arquivo usados nos álbuns")
+    parser.add_argument("--audio-frames", type=int, default=20, help="Quadros de áudio por arquivo")
+    parser.add_argument("--formats", nargs="+", choices=list(AUDIO_FORMATS), default=list(AUDIO_FORMATS),
+                        help="Formatos dos arquivos (um por álbum, em rodízio)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=DEFAULT_READER_WORKERS)
+    parser.add_argument("--pool", choices=TagReaderPool.MODES, default='thread')
+    parser.add_argument("--corpus", help="Pasta do corpus (padrão: pasta temporária apagada no final)")
+    parser.add_argument("--output", "-o", help="Arquivo JSON de resultados (padrão: saída padrão)")
+    parser.add_argument("--label", help="Rótulo gravado nos resultados, ex. a versão testada")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    corpus = args.corpus or tempfile.mkdtemp(prefix="organizador_bench_")
+    if os.path.exists(corpus) and os.listdir(corpus):
+        print(f"A pasta do corpus precisa estar vazia: {corpus}", file=sys.stderr)
+        return 2
+    try:
+        start = time.perf_counter()
+        paths = generate_corpus(corpus, args.files, args.tag_density, args.untagged, args.depth,
+                                args.album_size, args.patterns, args.audio_frames, args.seed, args.formats)
+        print(f"Corpus: {len(paths)} arquivos em {time.perf_counter() - start:.1f}s ({corpus})", file=sys.stderr)
+        results = run_benchmarks(paths, os.path.abspath(corpus), args.workers, args.pool)
+    finally:
+        if not args.corpus:
+            shutil.rmtree(corpus, ignore_errors=True)
+
+    report = {
+        'label': args.label,
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'params': {k: v for k, v in vars(args).items() if k not in ('output', 'label')},
+        'results': results,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
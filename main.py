@@ -1,72 +1,2848 @@
+import time
+# Taken before the other imports so --startup-time covers them
+_STARTED_AT = time.perf_counter()
 import os
 import re
-import time
+import io
+import csv
+import gzip
+import json
+import queue
+import sqlite3
+import select
+import struct
+import argparse
+import unicodedata
 import threading
+from array import array
+import multiprocessing
 import sys
-import pygame # pygame-ce
-import sv_ttk
-from PIL import Image, ImageTk
-from mutagen.easyid3 import EasyID3
-from mutagen.mp3 import MP3
-from mutagen.id3 import ID3, ID3NoHeaderError
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+from operator import itemgetter
+from itertools import chain, islice
+# pygame, sv_ttk and PIL are imported on first use, so the CLI never loads them;
+# mutagen's format modules load with the first tag read, after the window paints
+
+# Try to import tkinter, fallback to CLI if not available
+try:
+    import tkinter as tk
+    from tkinter import filedialog, messagebox, ttk
+    GUI_AVAILABLE = True
+except ImportError:
+    GUI_AVAILABLE = False
+
+_IMPORTED_AT = time.perf_counter()
+
+
+# Metadata fields to display
+METADATA_FIELDS = ['title', 'artist', 'album', 'tracknumber', 'genre', 'date',
+                   'albumartist', 'composer', 'performer']
+
+# Default main-thread time slice (ms) for applying queued table updates per frame
+DEFAULT_FRAME_BUDGET_MS = 12
+
+# Delay (ms) after the last keystroke before the filter is applied
+FILTER_DEBOUNCE_MS = 150
+
+# ID3 padding reserved when a tag has to be (re)created, so later edits fit in place
+DEFAULT_TAG_PADDING = 16 * 1024
+STRIP_CHUNK_SIZE = 1024 * 1024
+SNAPSHOT_KEEP = 20  # automatic tag snapshots kept in the user cache dir
+SNAPSHOT_COMPRESSLEVEL = 1  # tags compress well even at the fastest level
+# Frame groups a partial strip can remove; each backend maps them to its own keys
+STRIP_GROUPS = {'comments': "Comentários", 'art': "Capas embutidas", 'lyrics': "Letras"}
+
+# Maximum number of files listed in a change preview
+PREVIEW_LIMIT = 1000
+
+# Quiet time (s) before a cell edit is written, so edits of one song share a write
+WRITE_BEHIND_DELAY = 0.5
+
+# Longest wait (s) for pending edits to be written when the window closes
+WRITE_FLUSH_TIMEOUT = 30
+
+# How often (ms) the main thread refreshes the pending-writes label
+WRITE_STATUS_POLL_MS = 250
+
+# Rows of an imported edit file diffed and written per batch
+IMPORT_BATCH_SIZE = 2000
+
+# Files per folder sampled to pick the folder's filename rule
+FOLDER_SAMPLE_SIZE = 32
+
+# Player icons: name -> (file in icons/, size, required)
+PLAYER_ICONS = {
+    'play': ('play_circle.png', (48, 48), True),
+    'pause': ('pause_circle.png', (48, 48), True),
+    'next': ('next.png', (32, 32), True),
+    'prev': ('prev.png', (32, 32), True),
+    'volume': ('volume.png', (20, 20), True),
+    'shuffle': ('shuffle.png', (24, 24), False),
+    'repeat': ('repeat.png', (24, 24), False),
+}
+
+# Default reader pool size; tag reading is I/O bound so threads can exceed the core count
+DEFAULT_READER_WORKERS = min(32, (os.cpu_count() or 1) * 2)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('profiler', 'name', 'args', 'start')
+
+    def __init__(self, profiler, name, args):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        # list.append is atomic, so worker threads can record without the lock
+        self.profiler.events.append((self.name, self.start, time.perf_counter(),
+                                     threading.get_ident(), self.args))
+        return False
+
+
+class Profiler:
+    """Timing spans and counters for bulk operations.
+
+    While disabled span() returns a shared no-op context manager and count()
+    returns immediately, so instrumented code pays one attribute check.
+    Spans recorded in worker processes are not collected.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.events = []  # (name, start, end, thread id, args)
+        self.counters = Counter()
+        self.totals = Counter()  # name -> accumulated seconds of timed_iter
+        self.origin = time.perf_counter()
+
+    def enable(self, enabled=True):
+        if enabled and not self.enabled:
+            self.clear()
+        self.enabled = enabled
+
+    def span(self, name, **args):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def count(self, name, n=1):
+        if self.enabled:
+            with self.lock:
+                self.counters[name] += n
+
+    def timed_iter(self, name, iterable):
+        """Yield from iterable, adding the time spent producing items to totals[name]."""
+        if not self.enabled:
+            yield from iterable
+            return
+        iterator = iter(iterable)
+        spent = 0.0
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    spent += time.perf_counter() - start
+                yield item
+        finally:
+            with self.lock:
+                self.totals[name] += spent
+
+    def report(self):
+        """Per-span count/total/max seconds plus the counters."""
+        spans = {}
+        for name, start, end, _, _ in list(self.events):
+            entry = spans.setdefault(name, {'count': 0, 'total_s': 0.0, 'max_s': 0.0})
+            entry['count'] += 1
+            entry['total_s'] += end - start
+            entry['max_s'] = max(entry['max_s'], end - start)
+        for name, seconds in self.totals.items():
+            entry = spans.setdefault(name, {'count': 0, 'total_s': 0.0, 'max_s': 0.0})
+            entry['total_s'] += seconds
+        for entry in spans.values():
+            entry['total_s'] = round(entry['total_s'], 6)
+            entry['max_s'] = round(entry['max_s'], 6)
+        return {'elapsed_s': round(time.perf_counter() - self.origin, 3),
+                'spans': dict(sorted(spans.items(), key=lambda item: -item[1]['total_s'])),
+                'counters': dict(self.counters)}
+
+    def chrome_trace(self):
+        """The spans as Chrome trace events (chrome://tracing, Perfetto)."""
+        pid = os.getpid()
+        events = [{'name': name, 'ph': 'X', 'pid': pid, 'tid': tid,
+                   'ts': round((start - self.origin) * 1e6, 1), 'dur': round((end - start) * 1e6, 1),
+                   'args': args}
+                  for name, start, end, tid, args in list(self.events)]
+        events.append({'name': 'counters', 'ph': 'C', 'pid': pid, 'tid': 0,
+                       'ts': round((time.perf_counter() - self.origin) * 1e6, 1), 'args': dict(self.counters)})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': self.report()}
+
+    def export(self, path):
+        """Write the report as JSON, or a Chrome trace when path ends in '.trace.json'."""
+        data = self.chrome_trace() if path.endswith('.trace.json') else self.report()
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+
+
+PROFILER = Profiler()
+
+
+def _profiled(name, func, *args):
+    with PROFILER.span(name):
+        return func(*args)
+
+
+def _join_values(values):
+    # Multi-value tags are shown joined with semicolons, whatever the format
+    return '; '.join(str(v) for v in values) if values else ''
+
+
+def _padding_chooser(padding, in_place):
+    """mutagen padding callback: reuse existing padding when the tag fits, else reserve `padding`."""
+    def choose_padding(info):
+        if info.padding >= 0:
+            # Fits: keep the total tag size so the audio data doesn't move
+            in_place.append(True)
+            return info.padding
+        return padding
+    return choose_padding
+
+
+def _compact_padding(padding, info):
+    # mutagen padding callback for partial strips: give back the freed space
+    # beyond `padding` instead of keeping it all as padding
+    return min(info.padding, padding) if info.padding >= 0 else padding
+
+
+class TagBackend:
+    """Reads and writes one audio format's tags as METADATA_FIELDS strings.
+
+    Subclasses supply the extensions and magic bytes they handle, a full
+    loader (a mutagen FileType) and a tag-only fast reader that never touches
+    the audio stream. read() returns {field: text} with '' for missing
+    fields and raises on unreadable files.
+    """
+
+    name = None
+    extensions = ()
+    file_type = None
+    strip_keys = {}  # STRIP_GROUPS name -> tag keys
+
+    def matches(self, header):
+        """Whether the first 12 bytes of a file belong to this format."""
+        return False
+
+    def load(self, file_path):
+        return self.file_type(file_path)
+
+    def read_tags(self, file_path, fast):
+        """The file's tag mapping, or None when it has no tag."""
+        return self.load(file_path).tags
+
+    def get_field(self, tags, field):
+        return tags.get(field)
+
+    def set_field(self, tags, field, value):
+        tags[field] = value
+
+    def read(self, file_path, fields=METADATA_FIELDS, fast=True):
+        tags = self.read_tags(file_path, fast)
+        if tags is None:
+            return {field: '' for field in fields}
+        return {field: _join_values(self.get_field(tags, field)) for field in fields}
+
+    def write(self, file_path, metadata, fields=METADATA_FIELDS, padding=DEFAULT_TAG_PADDING):
+        """Write the given fields; empty values delete the tag. Returns True when written in place."""
+        audio = self.load(file_path)
+        if audio.tags is None:
+            audio.add_tags()
+        for field, value in metadata.items():
+            if field in fields:
+                if value and value.strip():
+                    self.set_field(audio.tags, field, value.strip())
+                else:
+                    self.set_field(audio.tags, field, None)
+        in_place = []
+        audio.save(padding=_padding_chooser(padding, in_place))
+        return bool(in_place)
+
+    def strip(self, file_path, padding=DEFAULT_TAG_PADDING):
+        """Remove the whole tag. Returns the bytes reclaimed, or None when there was no tag."""
+        if not self.read_tags(file_path, fast=True):
+            return None
+        size = os.path.getsize(file_path)
+        self.load(file_path).delete()
+        return size - os.path.getsize(file_path)
+
+    def remove_keys(self, audio, keys):
+        """Delete keys from a loaded file's tag; returns whether anything was there."""
+        tags = audio.tags
+        present = [key for key in keys if tags is not None and key in tags]
+        for key in present:
+            del tags[key]
+        return bool(present)
+
+    def strip_frames(self, file_path, keys, padding=DEFAULT_TAG_PADDING):
+        """Remove only the given keys, keeping the rest of the tag. Returns bytes reclaimed or None."""
+        audio = self.load(file_path)
+        if not self.remove_keys(audio, keys):
+            return None
+        size = os.path.getsize(file_path)
+        audio.save(padding=partial(_compact_padding, padding))
+        return size - os.path.getsize(file_path)
+
+    def snapshot(self, file_path):
+        """(kind, payload) saving this file's tags for restore(); here the METADATA_FIELDS values."""
+        return 'fields', json.dumps(self.read(file_path), ensure_ascii=False).encode('utf-8')
+
+    def restore(self, file_path, kind, payload, padding=DEFAULT_TAG_PADDING):
+        """Put back a snapshot() of the file. Returns False when its tags already match it."""
+        if kind != 'fields':
+            raise ValueError(f"Snapshot '{kind}' não se aplica a arquivos {self.name}: {file_path}")
+        saved = json.loads(payload)
+        if self.read(file_path, list(saved)) == saved:
+            return False
+        self.write(file_path, saved, list(saved), padding)
+        return True
+
+
+def _move_data(f, src, dst, length):
+    """Move length bytes of an open file from offset src to dst, chunk by chunk (the ranges may overlap)."""
+    if src == dst:
+        return
+    if dst < src:
+        done = 0
+        while done < length:
+            f.seek(src + done)
+            chunk = f.read(min(STRIP_CHUNK_SIZE, length - done))
+            if not chunk:
+                break
+            f.seek(dst + done)
+            f.write(chunk)
+            done += len(chunk)
+    else:
+        # Moving up: copy from the end so nothing is overwritten before it's read
+        remaining = length
+        while remaining > 0:
+            size = min(STRIP_CHUNK_SIZE, remaining)
+            remaining -= size
+            f.seek(src + remaining)
+            chunk = f.read(size)
+            f.seek(dst + remaining)
+            f.write(chunk)
+
+
+def _id3v2_tag_size(header):
+    """Total bytes of the ID3v2 tag starting with header (footer included), or None if the size is invalid."""
+    if any(b & 0x80 for b in header[6:10]):
+        return None
+    size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+    return 10 + size + (10 if header[5] & 0x10 else 0)
+
+
+class ID3Backend(TagBackend):
+    """MP3 files: ID3v2 (with ID3v1 fallback) through EasyID3."""
+
+    name = 'mp3'
+    extensions = ('.mp3',)
+    strip_keys = {'comments': ('COMM',), 'art': ('APIC',), 'lyrics': ('USLT', 'SYLT')}
+
+    def matches(self, header):
+        return header.startswith(b'ID3') or (header[:1] == b'\xff' and header[1:2] >= b'\xe0')
+
+    def read(self, file_path, fields=METADATA_FIELDS, fast=True):
+        """fast=True only reads the ID3v2 header and tag region (plus the last 128
+        bytes for an ID3v1 fallback) instead of building a full MP3 object, which
+        also parses the audio stream headers and scans for Xing/VBR info.
+        """
+        from mutagen.easyid3 import EasyID3
+        from mutagen.id3 import ID3NoHeaderError
+        from mutagen.mp3 import MP3
+        try:
+            if fast:
+                audio = EasyID3(file_path)
+            else:
+                audio = MP3(file_path, ID3=EasyID3)
+        except ID3NoHeaderError:
+            # File has no ID3 tags, or is another format named .mp3 (e.g. an M4A)
+            actual = sniff_backend(file_path)
+            if actual is not None and actual is not self:
+                return actual.read(file_path, fields, fast)
+            if fast:
+                # Same shape as MP3(), which yields empty fields for untagged files
+                return {field: '' for field in fields}
+            return {}
+        return {field: _join_values(audio.get(field)) for field in fields}
+
+    def write(self, file_path, metadata, fields=METADATA_FIELDS, padding=DEFAULT_TAG_PADDING):
+        # Only the tag is parsed; a missing tag is created in the same pass
+        from mutagen.easyid3 import EasyID3
+        from mutagen.id3 import ID3NoHeaderError
+        try:
+            audio = EasyID3(file_path)
+        except ID3NoHeaderError:
+            audio = EasyID3()
+
+        # Update metadata fields
+        for field, value in metadata.items():
+            if field in fields:
+                if value and value.strip():
+                    audio[field] = value.strip()
+                elif field in audio:
+                    del audio[field]
+
+        in_place = []
+        audio.save(file_path, padding=_padding_chooser(padding, in_place))
+        return bool(in_place)
+
+    def _tag_bounds(self, f):
+        """(ID3v2 size, ID3v1 size, file size) of an open file, from its first 10 and last 128 bytes.
+
+        None when the ID3v2 header is damaged (size not synchsafe or past the end of the file).
+        """
+        header = f.read(10)
+        start = 0
+        if len(header) == 10 and header.startswith(b'ID3'):
+            start = _id3v2_tag_size(header)
+        end = f.seek(0, os.SEEK_END)
+        if start is None or start > end:
+            return None
+        trailer = 0
+        if end - start >= 128:
+            f.seek(end - 128)
+            if f.read(3) == b'TAG':
+                trailer = 128
+        return start, trailer, end
+
+    def _read_tag_bytes(self, f, bounds):
+        start, trailer, end = bounds
+        f.seek(0)
+        v2 = f.read(start)
+        f.seek(end - trailer)
+        return v2 + f.read(trailer)
+
+    def strip(self, file_path, padding=DEFAULT_TAG_PADDING):
+        # Untagged files cost two small reads; tagged ones are cut down by
+        # moving the audio in place, one pass and no temporary copy
+        with open(file_path, 'r+b') as f:
+            bounds = self._tag_bounds(f)
+            if bounds is not None:
+                start, trailer, end = bounds
+                if not start and not trailer:
+                    return None
+                _move_data(f, start, 0, end - start - trailer)
+                f.truncate(end - start - trailer)
+                return start + trailer
+        # Damaged ID3v2 header: let mutagen deal with it
+        from mutagen.id3 import delete as delete_id3
+        size = os.path.getsize(file_path)
+        delete_id3(file_path)
+        return size - os.path.getsize(file_path)
+
+    def snapshot(self, file_path):
+        # Raw ID3v2 and ID3v1 bytes, so restore() gives back every frame
+        with open(file_path, 'rb') as f:
+            bounds = self._tag_bounds(f)
+            if bounds is not None:
+                return 'id3', self._read_tag_bytes(f, bounds)
+        return super().snapshot(file_path)
+
+    def restore(self, file_path, kind, payload, padding=DEFAULT_TAG_PADDING):
+        if kind != 'id3':
+            return super().restore(file_path, kind, payload, padding)
+        size = _id3v2_tag_size(payload[:10]) if payload.startswith(b'ID3') else 0
+        with open(file_path, 'r+b') as f:
+            bounds = self._tag_bounds(f)
+            if bounds is None:
+                raise ValueError(f"Tag ID3v2 danificada: {file_path}")
+            if self._read_tag_bytes(f, bounds) == payload:
+                return False
+            # Swap the current tags for the saved bytes around the audio
+            start, trailer, end = bounds
+            audio_size = end - start - trailer
+            _move_data(f, start, size, audio_size)
+            f.seek(0)
+            f.write(payload[:size])
+            f.seek(size + audio_size)
+            f.write(payload[size:])
+            f.truncate(audio_size + len(payload))
+        return True
+
+    def strip_frames(self, file_path, keys, padding=DEFAULT_TAG_PADDING):
+        from mutagen.id3 import ID3, ID3NoHeaderError
+        try:
+            tags = ID3(file_path)
+        except ID3NoHeaderError:
+            return None
+        present = [key for key in keys if tags.getall(key)]
+        if not present:
+            return None
+        for key in present:
+            tags.delall(key)
+        size = os.path.getsize(file_path)
+        # Keep the tag's version: rewriting a v2.3 tag as v2.4 would not be a partial strip
+        tags.save(file_path, v2_version=4 if tags.version >= (2, 4, 0) else 3,
+                  padding=partial(_compact_padding, padding))
+        return size - os.path.getsize(file_path)
+
+
+_BLOCK = struct.Struct('<BI')  # block type, length
+
+
+def _pack_blocks(blocks):
+    return b''.join(_BLOCK.pack(block_type, len(data)) + data for block_type, data in blocks)
+
+
+def _unpack_blocks(payload):
+    blocks = []
+    offset = 0
+    while offset < len(payload):
+        block_type, length = _BLOCK.unpack_from(payload, offset)
+        offset += _BLOCK.size
+        blocks.append((block_type, payload[offset:offset + length]))
+        offset += length
+    return blocks
+
+
+class VorbisCommentBackend(TagBackend):
+    """Formats tagged with Vorbis comments, whose keys already match METADATA_FIELDS."""
+
+    strip_keys = {'comments': ('comment', 'description'), 'art': ('metadata_block_picture', 'coverart'),
+                  'lyrics': ('lyrics', 'unsyncedlyrics')}
+
+    def set_field(self, tags, field, value):
+        if value is not None:
+            tags[field] = value
+        elif field in tags:
+            del tags[field]
+
+    def snapshot(self, file_path):
+        # The whole comment packet: every key, pictures stored as comments included
+        tags = self.read_tags(file_path, fast=True)
+        return 'vorbis', tags.write(framing=False) if tags else b''
+
+    def restore(self, file_path, kind, payload, padding=DEFAULT_TAG_PADDING):
+        if kind != 'vorbis':
+            return super().restore(file_path, kind, payload, padding)
+        if self.snapshot(file_path)[1] == payload:
+            return False
+        audio = self.load(file_path)
+        self._load_comments(audio, payload)
+        audio.save(padding=_padding_chooser(padding, []))
+        return True
+
+    def _load_comments(self, audio, data):
+        # Replace the comments (vendor string included) with a saved packet
+        if audio.tags is None:
+            audio.add_tags()
+        audio.tags.clear()
+        if data:
+            audio.tags.load(io.BytesIO(data), framing=False)
+
+
+class FLACBackend(VorbisCommentBackend):
+    name = 'flac'
+    extensions = ('.flac',)
+
+    def matches(self, header):
+        # Some taggers put an ID3v2 tag in front of the FLAC stream
+        return header.startswith((b'fLaC', b'ID3'))
+
+    def load(self, file_path):
+        from mutagen.flac import FLAC
+        return FLAC(file_path)
+
+    def read_tags(self, file_path, fast):
+        if not fast:
+            return self.load(file_path).tags
+        # Walk the metadata block headers and read only the VORBIS_COMMENT
+        # block, seeking over STREAMINFO, seek tables and embedded pictures
+        with open(file_path, 'rb') as f:
+            if f.read(4) != b'fLaC':
+                # ID3-prefixed or damaged: let mutagen sort it out
+                return self.load(file_path).tags
+            while True:
+                header = f.read(4)
+                if len(header) < 4:
+                    return None
+                block_type = header[0] & 0x7f
+                length = int.from_bytes(header[1:4], 'big')
+                if block_type == 4:
+                    from mutagen.flac import VCommentDict
+                    return VCommentDict(f.read(length), framing=False)
+                if header[0] & 0x80:
+                    return None
+                f.seek(length, os.SEEK_CUR)
+
+    def _blocks(self, audio):
+        blocks = [(6, picture.write()) for picture in audio.pictures]
+        if audio.tags:
+            blocks.insert(0, (4, audio.tags.write(framing=False)))
+        return _pack_blocks(blocks)
+
+    def snapshot(self, file_path):
+        # VORBIS_COMMENT and PICTURE blocks; the other metadata blocks aren't tags
+        return 'flac', self._blocks(self.load(file_path))
+
+    def restore(self, file_path, kind, payload, padding=DEFAULT_TAG_PADDING):
+        if kind != 'flac':
+            return super().restore(file_path, kind, payload, padding)
+        audio = self.load(file_path)
+        if self._blocks(audio) == payload:
+            return False
+        from mutagen.flac import Picture
+        self._load_comments(audio, b'')
+        audio.clear_pictures()
+        for block_type, data in _unpack_blocks(payload):
+            if block_type == 4:
+                self._load_comments(audio, data)
+            else:
+                audio.add_picture(Picture(data))
+        audio.save(padding=_padding_chooser(padding, []))
+        return True
+
+    def strip(self, file_path, padding=DEFAULT_TAG_PADDING):
+        # FLAC.delete() keeps the PICTURE blocks; cover art is part of the tags here
+        audio = self.load(file_path)
+        if not audio.tags and not audio.pictures:
+            return None
+        size = os.path.getsize(file_path)
+        if audio.tags is not None:
+            audio.tags.clear()
+        audio.clear_pictures()
+        audio.save(padding=partial(_compact_padding, padding))
+        return size - os.path.getsize(file_path)
+
+    def remove_keys(self, audio, keys):
+        removed = super().remove_keys(audio, keys)
+        # FLAC keeps cover art in PICTURE blocks rather than in the comments
+        if 'metadata_block_picture' in keys and audio.pictures:
+            audio.clear_pictures()
+            return True
+        return removed
+
+
+class OggVorbisBackend(VorbisCommentBackend):
+    name = 'ogg'
+    extensions = ('.ogg', '.oga')
+
+    def matches(self, header):
+        return header.startswith(b'OggS')
+
+    def load(self, file_path):
+        # Opus or FLAC inside Ogg: mutagen picks the right stream type
+        import mutagen
+        from mutagen.oggvorbis import OggVorbis
+        try:
+            return OggVorbis(file_path)
+        except mutagen.MutagenError:
+            audio = mutagen.File(file_path)
+            if audio is None:
+                raise
+            return audio
+
+    def read_tags(self, file_path, fast):
+        if not fast:
+            return self.load(file_path).tags
+        # Identification and comment headers only; OggVorbis() also seeks to
+        # the last page to compute the length
+        import mutagen
+        from mutagen.oggvorbis import OggVorbisInfo, OggVCommentDict
+        try:
+            with open(file_path, 'rb') as f:
+                return OggVCommentDict(f, OggVorbisInfo(f))
+        except mutagen.MutagenError:
+            return self.load(file_path).tags
+
+
+# MP4 atoms for METADATA_FIELDS; performer has no standard atom, iTunes-style freeform
+MP4_FIELD_ATOMS = {
+    'title': '\xa9nam', 'artist': '\xa9ART', 'album': '\xa9alb', 'tracknumber': 'trkn',
+    'genre': '\xa9gen', 'date': '\xa9day', 'albumartist': 'aART', 'composer': '\xa9wrt',
+    'performer': '----:com.apple.iTunes:PERFORMER',
+}
+
+
+class MP4Backend(TagBackend):
+    name = 'm4a'
+    extensions = ('.m4a', '.m4b', '.mp4')
+    strip_keys = {'comments': ('\xa9cmt', 'desc'), 'art': ('covr',), 'lyrics': ('\xa9lyr',)}
+
+    def matches(self, header):
+        return header[4:8] == b'ftyp'
+
+    def load(self, file_path):
+        from mutagen.mp4 import MP4
+        return MP4(file_path)
+
+    def read_tags(self, file_path, fast):
+        if not fast:
+            return self.load(file_path).tags
+        # Atom headers plus the ilst atom; skips MP4Info's track/codec parsing
+        from mutagen.mp4 import MP4Tags, Atoms
+        with open(file_path, 'rb') as f:
+            atoms = Atoms(f)
+            if not MP4Tags._can_load(atoms):
+                return None
+            return MP4Tags(atoms, f)
+
+    def get_field(self, tags, field):
+        values = tags.get(MP4_FIELD_ATOMS[field])
+        if not values:
+            return None
+        if field == 'tracknumber':
+            # [(track, total)] -> "3/12", like ID3
+            return [f"{track}/{total}" if total else str(track) for track, total in values]
+        return [bytes(v).decode('utf-8', 'replace') if isinstance(v, bytes) else v for v in values]
+
+    def set_field(self, tags, field, value):
+        key = MP4_FIELD_ATOMS[field]
+        if value is None:
+            tags.pop(key, None)
+        elif field == 'tracknumber':
+            match = re.match(r'\s*(\d+)[^\d/]*(?:/\s*(\d+))?', value)
+            if not match:
+                raise ValueError(f"Número de faixa inválido para MP4: {value}")
+            tags[key] = [(int(match.group(1)), int(match.group(2) or 0))]
+        elif key.startswith('----'):
+            from mutagen.mp4 import MP4FreeForm
+            tags[key] = [MP4FreeForm(value.encode('utf-8'))]
+        else:
+            tags[key] = [value]
+
+    def snapshot(self, file_path):
+        # The raw ilst atom: every item, cover art and freeform keys included
+        from mutagen.mp4 import Atoms
+        with open(file_path, 'rb') as f:
+            try:
+                ilst = Atoms(f).path(b'moov', b'udta', b'meta', b'ilst')[-1]
+            except KeyError:
+                return 'mp4', b''
+            f.seek(ilst.offset)
+            return 'mp4', f.read(ilst.length)
+
+    def restore(self, file_path, kind, payload, padding=DEFAULT_TAG_PADDING):
+        if kind != 'mp4':
+            return super().restore(file_path, kind, payload, padding)
+        saved = dict(_mp4_tags_from_ilst(payload).items()) if payload else {}
+        audio = self.load(file_path)
+        # Compared parsed: mutagen re-renders items in its own order
+        if dict(audio.tags.items() if audio.tags is not None else ()) == saved:
+            return False
+        if audio.tags is None:
+            audio.add_tags()
+        audio.tags.clear()
+        audio.tags.update(saved)
+        audio.save(padding=_padding_chooser(padding, []))
+        return True
+
+
+def _mp4_tags_from_ilst(ilst):
+    """MP4Tags parsed from the raw bytes of an ilst atom."""
+    from mutagen.mp4 import MP4Tags, Atoms
+    def atom(name, body):
+        return struct.pack('>I', 8 + len(body)) + name + body
+    # meta is a full atom: 4 bytes of version and flags before its children
+    f = io.BytesIO(atom(b'moov', atom(b'udta', atom(b'meta', b'\0' * 4 + ilst))))
+    return MP4Tags(Atoms(f), f)
+
+
+TAG_BACKENDS = {}  # extension -> TagBackend
+
+
+def register_backend(backend):
+    """Make a TagBackend handle its extensions (replacing any previous backend)."""
+    for extension in backend.extensions:
+        TAG_BACKENDS[extension] = backend
+
+
+for _backend in (ID3Backend(), FLACBackend(), OggVorbisBackend(), MP4Backend()):
+    register_backend(_backend)
+
+
+def _file_header(file_path):
+    try:
+        with open(file_path, 'rb') as f:
+            return f.read(12)
+    except OSError:
+        return b''
+
+
+def sniff_backend(file_path, header=None):
+    """The backend whose magic bytes match the start of the file, or None."""
+    if header is None:
+        header = _file_header(file_path)
+    for backend in dict.fromkeys(TAG_BACKENDS.values()):
+        if backend.matches(header):
+            return backend
+    return None
+
+
+def backend_for(file_path):
+    """The backend for a file's extension, falling back to its magic bytes."""
+    backend = TAG_BACKENDS.get(os.path.splitext(file_path)[1].lower())
+    return backend if backend is not None else sniff_backend(file_path)
+
+
+def _writer_for(file_path):
+    # Before modifying a file, let its magic bytes overrule a wrong extension
+    backend = TAG_BACKENDS.get(os.path.splitext(file_path)[1].lower())
+    header = _file_header(file_path)
+    if backend is None or not backend.matches(header):
+        backend = sniff_backend(file_path, header) or backend
+    if backend is None:
+        raise ValueError(f"Formato não suportado: {file_path}")
+    return backend
+
+
+def scan_music_files(folder, on_file=None):
+    """Yield music file paths below folder as they are discovered, using os.scandir.
+
+    on_file(path, stat) is called for every match so callers can reuse the
+    stat result instead of hitting the filesystem again.
+    """
+    stack = [folder]
+    while stack:
+        current = stack.pop()
+        PROFILER.count('walk.dirs')
+        try:
+            with os.scandir(current) as it:
+                subdirs = []
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                        elif _is_music_file(entry.name) and entry.is_file():
+                            if on_file:
+                                on_file(entry.path, entry.stat())
+                            yield entry.path
+                    except OSError:
+                        continue
+        except OSError:
+            # Unreadable folder: skip it like os.walk does
+            continue
+        # Reverse so folders are visited in listing order
+        stack.extend(reversed(subdirs))
+
+
+def read_metadata_file(file_path, fields=METADATA_FIELDS, fast=True):
+    """Read the tags of a music file as a dictionary, using the backend for its format.
+
+    fast=True uses the backend's tag-only reader, which doesn't parse the
+    audio stream. Unreadable files give an empty dictionary.
+    """
+    backend = backend_for(file_path)
+    if backend is None:
+        return {}
+    try:
+        return backend.read(file_path, fields, fast)
+    except Exception:
+        # Wrong extension (e.g. an M4A named .mp3): trust the magic bytes
+        actual = sniff_backend(file_path)
+        if actual is not None and actual is not backend:
+            try:
+                return actual.read(file_path, fields, fast)
+            except Exception:
+                pass
+        return {}
+
+
+def write_metadata_file(file_path, metadata, fields=METADATA_FIELDS, padding=DEFAULT_TAG_PADDING):
+    """Write the given fields to a music file; empty values delete the tag. Raises on failure.
+
+    Returns True when the tag was rewritten in place. When the new tag fits
+    in the existing tag plus its padding the padding is reused, so only the
+    tag region is written; otherwise (or for a new tag) the audio data has to
+    move and `padding` bytes are reserved for later edits.
+    """
+    return _writer_for(file_path).write(file_path, metadata, fields, padding)
+
+
+def write_summary(results):
+    """Per-batch report of in-place writes vs. full file rewrites."""
+    written = [in_place for _, error, in_place in results if error is None]
+    in_place = sum(written)
+    return f"{in_place} gravação(ões) no local, {len(written) - in_place} reescrita(s) completa(s)."
+
+
+def diff_metadata(current, proposed):
+    """Return the fields of proposed whose (stripped) value differs from current."""
+    changed = {}
+    for field, value in proposed.items():
+        new_value = (value or '').strip()
+        if new_value != (current.get(field) or '').strip():
+            changed[field] = new_value
+    return changed
+
+
+def _write_change(change, padding=DEFAULT_TAG_PADDING):
+    file_path, _, changed = change
+    try:
+        with PROFILER.span('tags.write'):
+            in_place = write_metadata_file(file_path, changed, padding=padding)
+        PROFILER.count('files.written')
+        if in_place:
+            PROFILER.count('files.written_in_place')
+        elif PROFILER.enabled:
+            PROFILER.count('bytes.rewritten', os.path.getsize(file_path))
+        return file_path, None, in_place
+    except Exception as e:
+        PROFILER.count('errors')
+        return file_path, e, False
+
+
+def apply_metadata_changes(changes, pool, metadata_index=None, progress=None, padding=DEFAULT_TAG_PADDING,
+                           snapshot=None):
+    """Write a batch of (file_path, current, changed_fields) on pool.
+
+    Only the changed fields are written. Returns [(file_path, error, in_place)]
+    in input order, error being None on success; the index is refreshed in one
+    transaction for the files that were written. With a TagSnapshot, each
+    file's tags are saved to it just before the write.
+    """
+    write = partial(_write_change, padding=padding)
+    if snapshot is not None:
+        results = snapshot.map(pool, write, changes, key=itemgetter(0), progress=progress)
+    else:
+        results = pool.map(write, changes, progress=progress)
+    if metadata_index is not None:
+        written = [(file_path, dict(current, **changed))
+                   for (file_path, current, changed), (_, error, _) in zip(changes, results) if error is None]
+        metadata_index.update_many(written)
+    return results
+
+
+def strip_tags_file(file_path, frames=None, padding=DEFAULT_TAG_PADDING):
+    """Remove every tag of a music file, or only the given frames.
+
+    frames are STRIP_GROUPS names or the format's raw tag keys (e.g. 'TXXX:foo',
+    'replaygain_track_gain'). Returns the bytes reclaimed, or None when there
+    was nothing to remove. Raises on failure.
+    """
+    backend = _writer_for(file_path)
+    if not frames:
+        return backend.strip(file_path, padding)
+    keys = []
+    for frame in frames:
+        keys.extend(backend.strip_keys.get(frame, (frame,)))
+    return backend.strip_frames(file_path, keys, padding)
+
+
+def _strip_file(file_path, frames=None, padding=DEFAULT_TAG_PADDING):
+    try:
+        with PROFILER.span('tags.strip'):
+            reclaimed = strip_tags_file(file_path, frames, padding)
+        if reclaimed is None:
+            PROFILER.count('files.strip_skipped')
+        else:
+            PROFILER.count('files.stripped')
+            PROFILER.count('bytes.reclaimed', reclaimed)
+        return file_path, None, reclaimed
+    except Exception as e:
+        PROFILER.count('errors')
+        return file_path, e, None
+
+
+def _tag_from_filename(entry, padding=DEFAULT_TAG_PADDING):
+    """Tag one file from its (file_path, parsed name) entry; returns (ok, log message)."""
+    file_path, parsed = entry
+    filename = os.path.basename(file_path)
+    if not parsed:
+        return False, f"[PULAR] Formato não reconhecido: {filename}"
+    tags = filename_metadata(file_path, parsed)
+    try:
+        write_metadata_file(file_path, tags, padding=padding)
+
+        log_msg = f"[OK] {filename} -> T: {tags['title']}"
+        if tags.get('artist'):
+            log_msg += f", A: {tags['artist']}"
+        return True, log_msg
+    except Exception as e:
+        return False, f"[ERRO] Falha ao salvar {filename}: {e}"
+
+
+def _format_size(size):
+    for unit in ('B', 'KB', 'MB'):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def strip_summary(results, elapsed):
+    """Per-batch report of stripped vs. already clean files, bytes reclaimed and time spent."""
+    reclaimed = [r for _, error, r in results if error is None and r is not None]
+    skipped = sum(1 for _, error, r in results if error is None and r is None)
+    return (f"{len(reclaimed)} arquivo(s) limpos, {skipped} já sem tags; "
+            f"{_format_size(sum(reclaimed))} recuperados em {elapsed:.1f}s.")
+
+
+def snapshot_tags_file(file_path):
+    """(file_path, kind, payload) record of a file's tags as they are on disk, for TagSnapshot."""
+    kind, payload = _writer_for(file_path).snapshot(file_path)
+    return file_path, kind, payload
+
+
+def restore_tags_file(file_path, kind, payload, padding=DEFAULT_TAG_PADDING):
+    """Put a snapshot record back. Returns False when the file already matches it; raises on failure."""
+    return _writer_for(file_path).restore(file_path, kind, payload, padding)
+
+
+def _snapshot_then(func, key, item):
+    # Runs on the pool: save the file's tags as they are, then let func modify it.
+    # A file whose tags can't be read is left for func to report.
+    file_path = key(item) if key is not None else item
+    try:
+        with PROFILER.span('tags.snapshot'):
+            record = snapshot_tags_file(file_path)
+    except Exception:
+        record = None
+    return record, func(item)
+
+
+def _restore_record(record, padding=DEFAULT_TAG_PADDING):
+    try:
+        with PROFILER.span('tags.restore'):
+            restored = restore_tags_file(*record, padding=padding)
+        PROFILER.count('files.restored' if restored else 'files.restore_unchanged')
+        return record[0], None, restored
+    except Exception as e:
+        PROFILER.count('errors')
+        return record[0], e, False
+
+
+class TagSnapshot:
+    """Compressed archive of the tags of many files, written sequentially while a bulk operation runs.
+
+    Each record holds a file's tags as they were right before the operation
+    touched it: the raw ID3v2/ID3v1 bytes for MP3, the VORBIS_COMMENT and
+    PICTURE blocks for FLAC, the comment packet for Ogg and the ilst atom for
+    MP4 ('fields' is the METADATA_FIELDS fallback of other backends).
+    """
+
+    MAGIC = b'OMSNAP1\n'
+    KINDS = ('id3', 'fields', 'flac', 'vorbis', 'mp4')
+    _RECORD = struct.Struct('<BHI')  # kind, path length, payload length
+
+    def __init__(self, path):
+        self.path = path
+        self.files = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = gzip.open(path, 'wb', compresslevel=SNAPSHOT_COMPRESSLEVEL)
+        self._file.write(self.MAGIC)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    def add(self, record):
+        file_path, kind, payload = record
+        name = os.fsencode(file_path)
+        self._file.write(self._RECORD.pack(self.KINDS.index(kind), len(name), len(payload)) + name + payload)
+        self.files += 1
+
+    def stream(self, pool, func, items, key=None):
+        """Yield func(item) for each item as pool.stream() does, saving each file's tags
+        on the pool just before func modifies it.
+
+        key(item) gives the file path (items are paths by default). Records are
+        written here, in input order, so the archive is one sequential write.
+        """
+        for _, (record, result) in pool.stream(partial(_snapshot_then, func, key), items):
+            if record is not None:
+                self.add(record)
+            yield result
+
+    def map(self, pool, func, items, key=None, progress=None):
+        """stream() collected into a list, calling progress(done) as results arrive."""
+        results = []
+        for result in self.stream(pool, func, items, key):
+            results.append(result)
+            if progress:
+                progress(len(results))
+        return results
+
+    @classmethod
+    def records(cls, path):
+        """Yield the (file_path, kind, payload) records of a snapshot file.
+
+        A truncated tail (the operation was interrupted) ends the records
+        instead of raising.
+        """
+        with gzip.open(path, 'rb') as f:
+            if f.read(len(cls.MAGIC)) != cls.MAGIC:
+                raise ValueError(f"Não é um snapshot de tags: {path}")
+            try:
+                while True:
+                    header = f.read(cls._RECORD.size)
+                    if len(header) < cls._RECORD.size:
+                        return
+                    kind, name_size, payload_size = cls._RECORD.unpack(header)
+                    name = f.read(name_size)
+                    payload = f.read(payload_size)
+                    if len(payload) < payload_size:
+                        return
+                    yield os.fsdecode(name), cls.KINDS[kind], payload
+            except EOFError:
+                return
+
+
+def restore_snapshot(path, pool, padding=DEFAULT_TAG_PADDING):
+    """Yield (file_path, error, restored) for the files of a snapshot, in archive order.
+
+    Records are read sequentially and restored on pool; files whose tags
+    already match are only read. When a file was saved more than once, the
+    first (oldest) record wins.
+    """
+    seen = set()
+
+    def first_records():
+        for record in TagSnapshot.records(path):
+            if record[0] not in seen:
+                seen.add(record[0])
+                yield record
+
+    for _, result in pool.stream(partial(_restore_record, padding=padding), first_records()):
+        yield result
+
+
+def snapshot_dir():
+    return os.path.join(_user_cache_dir(), 'snapshots')
+
+
+def new_snapshot_path(label):
+    """A fresh snapshot path in the user cache dir, removing the oldest beyond SNAPSHOT_KEEP."""
+    folder = snapshot_dir()
+    os.makedirs(folder, exist_ok=True)
+    existing = sorted(name for name in os.listdir(folder) if name.endswith('.snap'))
+    for name in existing[:max(0, len(existing) - SNAPSHOT_KEEP + 1)]:
+        try:
+            os.remove(os.path.join(folder, name))
+        except OSError:
+            pass
+    stamp = time.strftime('%Y%m%d-%H%M%S') + f"{int(time.time() * 1000) % 1000:03d}"
+    return os.path.join(folder, f"{stamp}-{label}.snap")
+
+
+class TagReaderPool:
+    """Run a per-file function over a thread or process pool, keeping input order."""
+
+    MODES = ('thread', 'process')
+
+    def __init__(self, workers=DEFAULT_READER_WORKERS, mode='thread'):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown pool mode: {mode}")
+        self.workers = max(1, int(workers))
+        self.mode = mode
+
+    def _executor(self):
+        if self.mode == 'process':
+            return ProcessPoolExecutor(max_workers=self.workers)
+        return ThreadPoolExecutor(max_workers=self.workers)
+
+    def stream(self, func, items, max_pending=256, precomputed=None):
+        """Yield (item, func(item)) in input order while items is still being produced.
+
+        items is consumed on a producer thread, so work starts before it is
+        exhausted. At most max_pending results are held in flight, which caps
+        memory on huge trees. precomputed(item) may return a ready result to
+        skip calling func for that item.
+        """
+        pending = queue.Queue(maxsize=max_pending)
+        stop = threading.Event()
+        done = object()
+        errors = []
+
+        def put(entry):
+            while not stop.is_set():
+                try:
+                    pending.put(entry, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        with self._executor() as executor:
+            def produce():
+                try:
+                    for item in items:
+                        if stop.is_set():
+                            break
+                        value = precomputed(item) if precomputed else None
+                        if value is not None:
+                            future = Future()
+                            future.set_result(value)
+                        else:
+                            future = executor.submit(func, item)
+                        put((item, future))
+                except Exception as e:
+                    errors.append(e)
+                finally:
+                    put(done)
+
+            producer = threading.Thread(target=produce, daemon=True)
+            producer.start()
+            try:
+                while True:
+                    entry = pending.get()
+                    if entry is done:
+                        break
+                    item, future = entry
+                    yield item, future.result()
+            finally:
+                # Consumer gave up early: unblock the producer and drop queued work
+                stop.set()
+                while producer.is_alive():
+                    try:
+                        _, future = pending.get(timeout=0.1)
+                        future.cancel()
+                    except (queue.Empty, TypeError, ValueError):
+                        pass
+        if errors:
+            raise errors[0]
+
+    def map(self, func, items, progress=None):
+        """Return [func(item) for item in items], calling progress(done) as results arrive."""
+        items = list(items)
+        results = []
+        if self.workers == 1 or len(items) <= 1:
+            for item in items:
+                results.append(func(item))
+                if progress:
+                    progress(len(results))
+            return results
+
+        if self.mode == 'process':
+            # Batch items per task so IPC overhead doesn't dominate small reads
+            chunksize = max(1, min(64, len(items) // (self.workers * 4)))
+        else:
+            chunksize = 1
+        with self._executor() as executor:
+            # executor.map yields in submission order, so progress stays monotonic
+            for result in executor.map(func, items, chunksize=chunksize):
+                results.append(result)
+                if progress:
+                    progress(len(results))
+        return results
+
+
+def _user_cache_dir():
+    """Return the per-user cache directory for the application."""
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'OrganizadorMusicas')
+
+
+def startup_report(first_paint=None):
+    """Milliseconds spent importing (and until first paint) plus the GUI modules loaded."""
+    report = {'imports_ms': round((_IMPORTED_AT - _STARTED_AT) * 1000, 1)}
+    if first_paint is not None:
+        report['first_paint_ms'] = round((first_paint - _STARTED_AT) * 1000, 1)
+    report['gui_modules'] = [name for name in ('pygame', 'sv_ttk', 'PIL') if name in sys.modules]
+    return report
+
+
+def cached_icon(source, size):
+    """Path of a PNG copy of source resized to size, kept in the user cache dir.
+
+    The copy is rebuilt (with Pillow) only when missing or older than source,
+    so a normal start loads ready-sized PNGs straight into tk.PhotoImage.
+    """
+    stem = os.path.splitext(os.path.basename(source))[0]
+    path = os.path.join(_user_cache_dir(), 'icons', f"{stem}_{size[0]}x{size[1]}.png")
+    try:
+        if os.stat(path).st_mtime_ns >= os.stat(source).st_mtime_ns:
+            return path
+    except FileNotFoundError:
+        pass
+    from PIL import Image
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with Image.open(source) as image:
+        image.resize(size, Image.Resampling.LANCZOS).save(path + '.tmp', 'PNG')
+    os.replace(path + '.tmp', path)
+    return path
+
+
+class MetadataIndex:
+    """Persistent SQLite cache of tags keyed by path + size + mtime."""
+
+    def __init__(self, db_path=None):
+        if db_path is None:
+            db_path = os.path.join(_user_cache_dir(), 'metadata_index.sqlite3')
+        self.lock = threading.Lock()
+        try:
+            if db_path != ':memory:':
+                os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        except (OSError, sqlite3.Error) as e:
+            # Unwritable cache dir: keep working with a throwaway index
+            print(f"Error opening metadata index: {e}", file=sys.stderr)
+            db_path = ':memory:'
+            self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.db_path = db_path
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, metadata TEXT)")
+        self.conn.commit()
+
+    @staticmethod
+    def _folder_range(folder):
+        # Primary key range scan covering every path below folder: paths are
+        # compared as UTF-8 bytes, so the bound is the separator's successor
+        # rather than a high code point (which would miss non-BMP names)
+        prefix = os.path.join(os.path.abspath(folder), '')
+        return prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+    def load_folder(self, folder):
+        """Return {path: (size, mtime_ns, metadata)} for all indexed files under folder."""
+        low, high = self._folder_range(folder)
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT path, size, mtime_ns, metadata FROM files WHERE path >= ? AND path < ?",
+                (low, high)).fetchall()
+        return {path: (size, mtime_ns, metadata) for path, size, mtime_ns, metadata in rows}
+
+    @staticmethod
+    def decode(metadata_json):
+        return json.loads(metadata_json)
+
+    def store_many(self, entries):
+        """Insert or replace (path, size, mtime_ns, metadata) entries."""
+        rows = [(path, size, mtime_ns, json.dumps(metadata, ensure_ascii=False))
+                for path, size, mtime_ns, metadata in entries]
+        if not rows:
+            return
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, metadata) VALUES (?, ?, ?, ?)",
+                rows)
+            self.conn.commit()
+
+    def update(self, file_path, metadata):
+        """Record freshly written metadata, re-reading size/mtime from disk."""
+        self.update_many([(file_path, metadata)])
+
+    def update_many(self, items):
+        """update() for many (file_path, metadata) pairs in one transaction."""
+        entries = []
+        missing = []
+        for file_path, metadata in items:
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                missing.append(file_path)
+                continue
+            entries.append((os.path.abspath(file_path), st.st_size, st.st_mtime_ns, metadata))
+        self.store_many(entries)
+        self.remove_many(missing)
+
+    def remove_many(self, paths):
+        rows = [(os.path.abspath(p),) for p in paths]
+        if not rows:
+            return
+        with self.lock:
+            self.conn.executemany("DELETE FROM files WHERE path = ?", rows)
+            self.conn.commit()
+
+    def load_paths(self, paths):
+        """Return {path: (size, mtime_ns, metadata)} for the indexed files among paths."""
+        found = {}
+        paths = [os.path.abspath(p) for p in paths]
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(paths), 900):
+            chunk = paths[i:i + 900]
+            with self.lock:
+                rows = self.conn.execute(
+                    f"SELECT path, size, mtime_ns, metadata FROM files WHERE path IN ({','.join('?' * len(chunk))})",
+                    chunk).fetchall()
+            for path, size, mtime_ns, metadata in rows:
+                found[path] = (size, mtime_ns, metadata)
+        return found
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def read_library(folder, pool, metadata_index, fields=METADATA_FIELDS, on_file=None, fast=True):
+    """Yield (file_path, metadata, reparsed) for every music file below folder as it is read.
+
+    Files whose size and mtime match metadata_index come straight from the
+    index; the rest are parsed on pool and written back in batches. Index rows
+    for files that no longer exist are dropped once the walk completes.
+    """
+    folder = os.path.abspath(folder)
+    with PROFILER.span('index.load'):
+        cached = metadata_index.load_folder(folder)
+    stats = {}
+    index_hits = set()
+
+    def found(file_path, st):
+        stats[file_path] = st
+        if on_file:
+            on_file(file_path, st)
+
+    def from_index(file_path):
+        # Only re-parse files that are new or changed on disk
+        entry = cached.get(file_path)
+        st = stats[file_path]
+        if entry and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+            index_hits.add(file_path)
+            return metadata_index.decode(entry[2])
+        return None
+
+    reader = partial(read_metadata_file, fields=tuple(fields), fast=fast)
+    if PROFILER.enabled and pool.mode == 'thread':
+        reader = partial(_profiled, 'tags.parse', reader)
+    files = PROFILER.timed_iter('walk', scan_music_files(folder, found))
+    results = pool.stream(reader, files,
+                          max_pending=max(256, pool.workers * 16), precomputed=from_index)
+    fresh_entries = []
+    try:
+        for file_path, metadata in results:
+            reparsed = file_path not in index_hits
+            if reparsed:
+                st = stats[file_path]
+                PROFILER.count('files.parsed')
+                PROFILER.count('bytes.parsed_files', st.st_size)
+                fresh_entries.append((file_path, st.st_size, st.st_mtime_ns, metadata))
+                if len(fresh_entries) >= 500:
+                    with PROFILER.span('index.store', rows=len(fresh_entries)):
+                        metadata_index.store_many(fresh_entries)
+                    fresh_entries = []
+            else:
+                PROFILER.count('files.cached')
+            yield file_path, metadata, reparsed
+    finally:
+        results.close()
+        metadata_index.store_many(fresh_entries)
+
+    # Rows for files that disappeared since the last scan are dropped
+    metadata_index.remove_many([p for p in cached if p not in stats])
+
+
+def read_current_metadata(file_paths, pool, metadata_index, fields=METADATA_FIELDS, fast=True):
+    """{path: metadata} for the files among file_paths that exist.
+
+    Files whose size and mtime match metadata_index come from the index; the
+    rest are read on pool and stored back.
+    """
+    cached = metadata_index.load_paths(file_paths)
+    current = {}
+    stats = {}
+    for file_path in file_paths:
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            continue
+        entry = cached.get(file_path)
+        if entry and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+            current[file_path] = metadata_index.decode(entry[2])
+        else:
+            stats[file_path] = st
+    if stats:
+        reader = partial(read_metadata_file, fields=tuple(fields), fast=fast)
+        parsed = pool.map(reader, list(stats))
+        metadata_index.store_many([(file_path, stats[file_path].st_size, stats[file_path].st_mtime_ns, metadata)
+                                   for file_path, metadata in zip(stats, parsed)])
+        current.update(zip(stats, parsed))
+    return current
+
+
+EXPORT_FORMATS = ('csv', 'jsonl')
+
+
+def export_format(path):
+    """'csv' for .csv files, 'jsonl' otherwise."""
+    return 'csv' if path and path.lower().endswith('.csv') else 'jsonl'
+
+
+def write_metadata_rows(target, rows, fields=METADATA_FIELDS, fmt='jsonl'):
+    """Stream (file_path, metadata) rows to target as CSV or JSON lines; returns the row count.
+
+    Each row holds path, filename and every field, so the file can be edited
+    and fed back to read_metadata_rows.
+    """
+    columns = ['path', 'filename'] + list(fields)
+    count = 0
+    if fmt == 'csv':
+        writer = csv.writer(target)
+        writer.writerow(columns)
+        for file_path, metadata in rows:
+            writer.writerow([file_path, os.path.basename(file_path)] + [metadata.get(field, '') for field in fields])
+            count += 1
+    else:
+        for file_path, metadata in rows:
+            record = {"path": file_path, "filename": os.path.basename(file_path)}
+            for field in fields:
+                record[field] = metadata.get(field, '')
+            target.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+def read_metadata_rows(source, fmt='jsonl', fields=METADATA_FIELDS):
+    """Yield (line, file_path, edits, error) for each row of a CSV/JSON lines edit file.
+
+    edits holds only the fields present in the row (None and '' clear a tag),
+    so a file with just path and genre columns only touches genres. Rows
+    without a path give file_path None and an error message. CSV files may
+    use ',', ';' or tab as delimiter, as spreadsheets export them.
+    """
+    if fmt == 'csv':
+        header = source.readline()
+        try:
+            dialect = csv.Sniffer().sniff(header, delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.DictReader(chain([header], source), dialect=dialect)
+        # Short rows leave cells as None: those fields are not in the row, not cleared
+        rows = ((reader.line_num, {k: v for k, v in row.items() if v is not None}) for row in reader)
+    else:
+        def json_rows():
+            for line, text in enumerate(source, 1):
+                if not text.strip():
+                    continue
+                try:
+                    row = json.loads(text)
+                except ValueError as e:
+                    row = e
+                yield line, row
+        rows = json_rows()
+    for line, row in rows:
+        if not isinstance(row, dict):
+            yield line, None, None, f"Linha inválida: {row}"
+            continue
+        file_path = row.get('path')
+        if not file_path:
+            yield line, None, None, "Linha sem o campo path"
+            continue
+        edits = {field: '' if row[field] is None else str(row[field]) for field in fields if field in row}
+        yield line, os.path.abspath(file_path), edits, None
+
+
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class TrackRecord:
+    """Dict-like view of one row of a MetadataStore; writes go straight to its columns."""
+
+    __slots__ = ('store', 'row')
+
+    def __init__(self, store, row):
+        self.store = store
+        self.row = row
+
+    def __getitem__(self, field):
+        return self.store.strings[self.store.columns[field][self.row]]
+
+    def __setitem__(self, field, value):
+        self.store.columns[field][self.row] = self.store.intern(value)
+
+    def get(self, field, default=None):
+        column = self.store.columns.get(field)
+        if column is None:
+            return default
+        return self.store.strings[column[self.row]]
+
+    def keys(self):
+        return self.store.fields
+
+    def __iter__(self):
+        return iter(self.store.fields)
+
+    def __len__(self):
+        return len(self.store.fields)
+
+    def __contains__(self, field):
+        return field in self.store.columns
+
+    def items(self):
+        strings = self.store.strings
+        return [(field, strings[column[self.row]]) for field, column in self.store.columns.items()]
+
+    def __repr__(self):
+        return f"TrackRecord({dict(self)!r})"
+
+    def __reduce__(self):
+        # Sent to process pools as a plain dict: the store (and its lock) stays behind
+        return dict, (self.items(),)
+
+
+class MetadataStore:
+    """Columnar store of the library's metadata, keyed by file path.
+
+    Each field is an array of 4-byte ids into one table of interned strings,
+    so repeated artist/album/genre values are stored once and a track costs a
+    few bytes per field instead of a dict. It behaves like the old
+    {path: metadata dict} mapping: store[path] returns a TrackRecord and
+    assigning a dict fills the row. Rows of deleted paths are not reused, so
+    records handed out earlier never start pointing at another file.
+    """
+
+    def __init__(self, fields=METADATA_FIELDS):
+        self.fields = tuple(fields)
+        self.clear()
+
+    def clear(self):
+        self.lock = threading.Lock()
+        self.strings = ['']
+        self.string_ids = {'': 0}
+        self.columns = {field: array('I') for field in self.fields}
+        self.paths = []  # row id -> path (None once deleted)
+        self.rows = {}  # path -> row id
+
+    def intern(self, value):
+        value = value or ''
+        string_id = self.string_ids.get(value)
+        if string_id is None:
+            # Worker threads update rows too; the append comes first so an id always has its string
+            with self.lock:
+                string_id = self.string_ids.get(value)
+                if string_id is None:
+                    self.strings.append(value)
+                    string_id = self.string_ids[value] = len(self.strings) - 1
+        return string_id
+
+    def __setitem__(self, file_path, metadata):
+        row = self.rows.get(file_path)
+        if row is None:
+            row = self.rows[file_path] = len(self.paths)
+            self.paths.append(file_path)
+            for field, column in self.columns.items():
+                column.append(self.intern(metadata.get(field)))
+        else:
+            for field, column in self.columns.items():
+                column[row] = self.intern(metadata.get(field))
+
+    def __getitem__(self, file_path):
+        return TrackRecord(self, self.rows[file_path])
+
+    def get(self, file_path, default=None):
+        row = self.rows.get(file_path)
+        return TrackRecord(self, row) if row is not None else default
+
+    def __delitem__(self, file_path):
+        row = self.rows.pop(file_path)
+        self.paths[row] = None
+
+    def __contains__(self, file_path):
+        return file_path in self.rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def keys(self):
+        return self.rows.keys()
+
+    def items(self):
+        return ((file_path, TrackRecord(self, row)) for file_path, row in self.rows.items())
+
+    def values(self):
+        return (TrackRecord(self, row) for row in self.rows.values())
+
+    def map_values(self, funcs, file_paths=None):
+        """{path: {field: new value}} for the rows (all, or those of file_paths) that funcs change.
+
+        funcs maps fields to str -> str functions. Each runs once per
+        distinct value of its field; the changed string ids are then matched
+        against the column.
+        """
+        if file_paths is None:
+            rows = [row for row, path in enumerate(self.paths) if path is not None]
+        else:
+            rows = [self.rows[path] for path in file_paths if path in self.rows]
+        strings = self.strings
+        changed = {}
+        for field, func in funcs.items():
+            column = self.columns[field]
+            string_ids = set(column) if file_paths is None else {column[row] for row in rows}
+            new_values = {}
+            for string_id in string_ids:
+                value = strings[string_id]
+                new_value = func(value)
+                if new_value != value:
+                    new_values[string_id] = new_value
+            if not new_values:
+                continue
+            for row in [row for row in rows if column[row] in new_values]:
+                changed.setdefault(self.paths[row], {})[field] = new_values[column[row]]
+        return changed
+
+    def map_column(self, field, func):
+        """{path: func(value)} for one field, calling func once per distinct value."""
+        column = self.columns[field]
+        strings = self.strings
+        mapped = {}
+        result = {}
+        for file_path, row in self.rows.items():
+            string_id = column[row]
+            key = mapped.get(string_id)
+            if key is None:
+                key = mapped[string_id] = func(strings[string_id])
+            result[file_path] = key
+        return result
+
+    def snapshot(self):
+        """Independent copy of the rows for a background job; the string table is shared (append-only)."""
+        copy = MetadataStore.__new__(MetadataStore)
+        copy.fields = self.fields
+        copy.lock = self.lock
+        copy.strings = self.strings
+        copy.string_ids = self.string_ids
+        copy.columns = {field: array('I', column) for field, column in self.columns.items()}
+        copy.paths = list(self.paths)
+        copy.rows = dict(self.rows)
+        return copy
+
+    def memory_usage(self):
+        """Approximate bytes held by the store (containers plus the strings they own)."""
+        size = sys.getsizeof(self.strings) + sys.getsizeof(self.string_ids)
+        size += sum(sys.getsizeof(s) for s in self.strings)
+        size += sum(sys.getsizeof(column) for column in self.columns.values())
+        size += sys.getsizeof(self.paths) + sys.getsizeof(self.rows)
+        size += sum(sys.getsizeof(p) for p in self.rows)
+        return size
+
+
+def dict_store_memory_usage(file_data):
+    """Approximate bytes of a {path: metadata dict} mapping, for comparison with MetadataStore."""
+    size = sys.getsizeof(file_data)
+    seen = set()
+    for file_path, metadata in file_data.items():
+        size += sys.getsizeof(file_path) + sys.getsizeof(metadata)
+        for value in metadata.values():
+            # Equal strings read from different files are separate objects unless interned
+            if id(value) not in seen:
+                seen.add(id(value))
+                size += sys.getsizeof(value)
+    return size
+
+
+# inotify(7) constants
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_INOTIFY_MASK = (_IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+                 | _IN_DELETE_SELF | _IN_ONLYDIR)
+_INOTIFY_EVENT = struct.Struct('iIII')
+
+
+def _load_inotify():
+    """libc with the inotify calls, or None where inotify isn't available."""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+def _is_music_file(path):
+    return os.path.splitext(path)[1].lower() in TAG_BACKENDS
+
+
+class FolderWatcher:
+    """Report music files added, modified, renamed or removed below a folder.
+
+    Uses inotify on Linux and otherwise (or when the watch limit is reached)
+    polls directory mtimes every `interval` seconds, with a full file stat
+    sweep every `full_every` polls to catch in-place modifications.
+    on_changes(changed, removed) runs on the watcher thread with sets of
+    paths; removed may also hold folders, meaning everything below them.
+    Bursts are coalesced: a batch is delivered once no event arrived for
+    `settle` seconds, or after `max_delay` seconds at most.
+    on_changes(None, None) asks for a full reload (inotify queue overflow).
+    """
+
+    def __init__(self, folder, on_changes, interval=2.0, settle=0.5, max_delay=3.0, full_every=15,
+                 use_inotify=True):
+        self.folder = os.path.abspath(folder)
+        self.on_changes = on_changes
+        self.interval = interval
+        self.settle = settle
+        self.max_delay = max_delay
+        self.full_every = full_every
+        self.use_inotify = use_inotify
+        self.backend = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        libc = _load_inotify() if self.use_inotify else None
+        if libc is not None:
+            fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+            if fd >= 0:
+                try:
+                    watches = {}
+                    if self._watch_tree(libc, fd, self.folder, watches) is not None:
+                        self.backend = 'inotify'
+                        self._inotify_loop(libc, fd, watches)
+                        return
+                finally:
+                    os.close(fd)
+        self.backend = 'polling'
+        self._polling_loop()
 
-# Try to import tkinter, fallback to CLI if not available
-try:
-    import tkinter as tk
-    from tkinter import filedialog, messagebox, ttk
-    GUI_AVAILABLE = True
-except ImportError:
-    GUI_AVAILABLE = False
+    def _watch_tree(self, libc, fd, folder, watches):
+        """Add a watch on folder and its subfolders; returns the music files found, or None if a watch failed."""
+        found = set()
+        stack = [folder]
+        while stack:
+            current = stack.pop()
+            wd = libc.inotify_add_watch(fd, os.fsencode(current), _INOTIFY_MASK)
+            if wd < 0:
+                if os.path.isdir(current):
+                    # Usually fs.inotify.max_user_watches: fall back to polling
+                    return None
+                continue
+            watches[wd] = current
+            try:
+                with os.scandir(current) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif _is_music_file(entry.name):
+                            found.add(entry.path)
+            except OSError:
+                continue
+        return found
+
+    def _deliver(self, changed, removed):
+        if changed or removed:
+            self.on_changes(set(changed), set(removed))
+            changed.clear()
+            removed.clear()
+
+    def _inotify_loop(self, libc, fd, watches):
+        changed = set()
+        removed = set()
+        first_event = last_event = None
+        while not self._stop.is_set():
+            ready, _, _ = select.select([fd], [], [], self.settle)
+            now = time.monotonic()
+            if ready:
+                try:
+                    data = os.read(fd, 64 * 1024)
+                except BlockingIOError:
+                    data = b''
+                offset = 0
+                while offset < len(data):
+                    wd, mask, _, length = _INOTIFY_EVENT.unpack_from(data, offset)
+                    name = data[offset + _INOTIFY_EVENT.size:offset + _INOTIFY_EVENT.size + length]
+                    offset += _INOTIFY_EVENT.size + length
+                    if mask & _IN_Q_OVERFLOW:
+                        # Events were lost; only a full reload is reliable
+                        changed.clear()
+                        removed.clear()
+                        self.on_changes(None, None)
+                        continue
+                    folder = watches.get(wd)
+                    if folder is None:
+                        continue
+                    if mask & _IN_IGNORED:
+                        del watches[wd]
+                        continue
+                    if mask & _IN_DELETE_SELF:
+                        continue
+                    path = os.path.join(folder, os.fsdecode(name.rstrip(b'\0')))
+                    if mask & _IN_ISDIR:
+                        if mask & (_IN_CREATE | _IN_MOVED_TO):
+                            found = self._watch_tree(libc, fd, path, watches)
+                            if found is None:
+                                # Out of watches: the tree is no longer fully covered
+                                self.on_changes(None, None)
+                                return
+                            changed |= found
+                            removed.discard(path)
+                        elif mask & (_IN_DELETE | _IN_MOVED_FROM):
+                            removed.add(path)
+                            prefix = os.path.join(path, '')
+                            changed -= {p for p in changed if p.startswith(prefix)}
+                    elif _is_music_file(path):
+                        if mask & (_IN_CLOSE_WRITE | _IN_MOVED_TO):
+                            changed.add(path)
+                            removed.discard(path)
+                        elif mask & (_IN_DELETE | _IN_MOVED_FROM):
+                            removed.add(path)
+                            changed.discard(path)
+                if changed or removed:
+                    first_event = first_event or now
+                    last_event = now
+            if first_event is not None and (now - last_event >= self.settle
+                                            or now - first_event >= self.max_delay):
+                self._deliver(changed, removed)
+                first_event = last_event = None
+
+    def _snapshot_dir(self, folder):
+        """({music file path: (size, mtime_ns)}, [subfolders]) for one folder."""
+        files = {}
+        subdirs = []
+        with os.scandir(folder) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif _is_music_file(entry.name):
+                        st = entry.stat()
+                        files[entry.path] = (st.st_size, st.st_mtime_ns)
+                except OSError:
+                    continue
+        return files, subdirs
+
+    def _polling_loop(self):
+        dirs = {}  # folder -> (mtime_ns, {music file path: (size, mtime_ns)}, [subfolders])
+
+        def scan(folder, changed):
+            stack = [folder]
+            while stack:
+                current = stack.pop()
+                try:
+                    mtime = os.stat(current).st_mtime_ns
+                    files, subdirs = self._snapshot_dir(current)
+                except OSError:
+                    continue
+                dirs[current] = (mtime, files, subdirs)
+                changed.update(files)
+                stack.extend(subdirs)
+
+        def drop(folder, removed):
+            prefix = os.path.join(folder, '')
+            for path in [d for d in dirs if d == folder or d.startswith(prefix)]:
+                del dirs[path]
+            removed.add(folder)
+
+        scan(self.folder, set())
+        polls = 0
+        while not self._stop.wait(self.interval):
+            polls += 1
+            full = self.full_every and polls % self.full_every == 0
+            changed = set()
+            removed = set()
+            for folder in list(dirs):
+                if folder not in dirs:
+                    continue  # dropped with its parent during this poll
+                old_mtime, old_files, old_subdirs = dirs[folder]
+                try:
+                    mtime = os.stat(folder).st_mtime_ns
+                except OSError:
+                    drop(folder, removed)
+                    continue
+                if mtime == old_mtime and not full:
+                    continue
+                try:
+                    files, subdirs = self._snapshot_dir(folder)
+                except OSError:
+                    drop(folder, removed)
+                    continue
+                dirs[folder] = (mtime, files, subdirs)
+                removed.update(p for p in old_files if p not in files)
+                changed.update(p for p, stat in files.items() if old_files.get(p) != stat)
+                for subdir in set(old_subdirs) - set(subdirs):
+                    drop(subdir, removed)
+                for subdir in set(subdirs) - set(old_subdirs):
+                    scan(subdir, changed)
+            self._deliver(changed, removed)
+
+
+_WORD_RE = re.compile(r"\w+")
+_DIGITS_RE = re.compile(r"(\d+)")
+
+
+def natural_key(text):
+    """Sort key ordering embedded numbers numerically: '3a' < '10/12' < '10/13'."""
+    parts = _DIGITS_RE.split(text.lower())
+    # Odd positions always hold digit runs, so str/int never get compared
+    parts[1::2] = [int(p) for p in parts[1::2]]
+    return tuple(parts)
+
+
+class SortKeys:
+    """Per-column sort keys computed once and refreshed when a row changes.
+
+    Columns are built lazily on their first sort. Keys live in one dict per
+    column so sorting uses dict.__getitem__ as a C-level key function.
+    """
+
+    NATURAL_COLUMNS = ('tracknumber',)
+
+    def __init__(self):
+        self.columns = {}  # column -> {file path: key}
+
+    def clear(self):
+        self.columns = {}
+
+    def make_key(self, col, file_path, metadata):
+        if col == 'filename':
+            return os.path.basename(file_path).lower()
+        elif col == 'path':
+            return file_path.lower()
+        return self.value_key(col, metadata.get(col, ''))
+
+    def value_key(self, col, value):
+        value = value or ''
+        if col in self.NATURAL_COLUMNS:
+            return natural_key(value)
+        return value.lower()
+
+    def set_row(self, file_path, metadata):
+        """Refresh the keys of already built columns after an insert or edit."""
+        for col, keys in self.columns.items():
+            keys[file_path] = self.make_key(col, file_path, metadata)
+
+    def remove(self, file_path):
+        for keys in self.columns.values():
+            keys.pop(file_path, None)
+
+    def column(self, col, file_data):
+        keys = self.columns.get(col)
+        if keys is None:
+            if isinstance(file_data, MetadataStore) and col in file_data.columns:
+                # One key per distinct value instead of one per file
+                keys = file_data.map_column(col, partial(self.value_key, col))
+            else:
+                keys = {fp: self.make_key(col, fp, md) for fp, md in file_data.items()}
+            self.columns[col] = keys
+        return keys
+
+    def sort(self, paths, sort_columns, file_data):
+        """Stable multi-column sort of paths in place; sort_columns is [(col, reverse), ...]."""
+        # Sorting by the least significant column first keeps the earlier ones dominant
+        for col, reverse in reversed(sort_columns):
+            paths.sort(key=self.column(col, file_data).__getitem__, reverse=reverse)
+        return paths
+
+
+def fold_text(text):
+    """Lowercase and strip accents so 'MOURAÍ' and 'mourai' compare equal."""
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def _edit_distance(a, b, max_dist):
+    """Levenshtein distance, or max_dist + 1 once it is known to exceed max_dist."""
+    if abs(len(a) - len(b)) > max_dist:
+        return max_dist + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > max_dist:
+            return max_dist + 1
+        previous = current
+    return previous[-1]
+
+
+def _typo_budget(word):
+    # Short words must match exactly; longer ones tolerate one or two typos
+    if len(word) < 4:
+        return 0
+    return 1 if len(word) < 8 else 2
+
+
+def _word_similarity(query_word, word):
+    """Score in [0, 1] of how well a folded word matches a folded query word."""
+    if word == query_word:
+        return 1.0
+    if word.startswith(query_word):
+        return 0.9
+    if query_word in word:
+        return 0.75
+    budget = _typo_budget(query_word)
+    if budget:
+        distance = _edit_distance(query_word, word, budget)
+        if distance <= budget:
+            return 0.6 - 0.15 * (distance - 1)
+        if len(word) > len(query_word):
+            # Typo inside a word that is still being typed
+            distance = _edit_distance(query_word, word[:len(query_word)], budget)
+            if distance <= budget:
+                return 0.5 - 0.15 * (distance - 1)
+    return 0.0
+
+
+class SearchIndex:
+    """Lowercased per-field keys plus a trigram index for substring filtering.
+
+    Trigrams are indexed per distinct field value rather than per row, since
+    artist/album/genre values repeat heavily; each value keeps the list of rows
+    using it. Postings are append-only arrays, so edits just add the row to its
+    new values; stale entries are harmless because every candidate row is
+    verified against its current key.
+    """
+
+    def __init__(self, fields):
+        self.fields = ['filename'] + list(fields)
+        self.clear()
+
+    def clear(self):
+        self.row_ids = {}  # file path -> row id
+        self.paths = []
+        self.alive = []
+        self.row_value_ids = []  # row id -> distinct value ids across all fields
+        self.keys = {field: [] for field in self.fields + ['all']}
+        self.value_ids = {}   # lowercase value -> value id
+        self.values = []
+        self.value_rows = []  # value id -> array of row ids
+        self.trigrams = {}    # trigram -> array of value ids
+        # Accent-folded words for fuzzy search, also per distinct value
+        self.folded_values = []  # value id -> folded value
+        self.value_words = []    # value id -> tuple of word ids
+        self.word_ids = {}       # folded word -> word id
+        self.words = []
+        self.word_values = []    # word id -> array of value ids
+        self.word_trigrams = {}  # trigram of '$' + word + '$' -> array of word ids
+        self._fuzzy_cache = None
+
+    def _value_id(self, value):
+        value_id = self.value_ids.get(value)
+        if value_id is None:
+            value_id = len(self.values)
+            self.value_ids[value] = value_id
+            self.values.append(value)
+            self.value_rows.append(array('I'))
+            for gram in {value[i:i + 3] for i in range(len(value) - 2)}:
+                postings = self.trigrams.get(gram)
+                if postings is None:
+                    postings = self.trigrams[gram] = array('I')
+                postings.append(value_id)
+
+            folded = fold_text(value)
+            self.folded_values.append(folded)
+            word_ids = tuple(dict.fromkeys(self._word_id(w) for w in _WORD_RE.findall(folded)))
+            self.value_words.append(word_ids)
+            for word_id in word_ids:
+                self.word_values[word_id].append(value_id)
+        return value_id
+
+    def _word_id(self, word):
+        word_id = self.word_ids.get(word)
+        if word_id is None:
+            word_id = len(self.words)
+            self.word_ids[word] = word_id
+            self.words.append(word)
+            self.word_values.append(array('I'))
+            padded = f"${word}$"
+            for gram in {padded[i:i + 3] for i in range(len(padded) - 2)}:
+                postings = self.word_trigrams.get(gram)
+                if postings is None:
+                    postings = self.word_trigrams[gram] = array('I')
+                postings.append(word_id)
+        return word_id
+
+    def set_row(self, file_path, metadata):
+        """Index (or re-index after an edit) one file."""
+        values = [os.path.basename(file_path).lower()]
+        values += [str(metadata.get(field, '')).lower() for field in self.fields[1:]]
+        # Share one string object per distinct value across rows
+        value_ids = [self._value_id(v) if v else None for v in values]
+        values = [self.values[i] if i is not None else '' for i in value_ids]
+        row_value_ids = tuple(dict.fromkeys(i for i in value_ids if i is not None))
+        # Newline can't be typed in the filter, so matches never span fields
+        combined = '\n'.join(values)
+
+        row_id = self.row_ids.get(file_path)
+        if row_id is None:
+            row_id = len(self.paths)
+            self.row_ids[file_path] = row_id
+            self.paths.append(file_path)
+            self.alive.append(True)
+            self.row_value_ids.append(row_value_ids)
+            for field, value in zip(self.fields, values):
+                self.keys[field].append(value)
+            self.keys['all'].append(combined)
+            old_values = set()
+        else:
+            old_values = {self.keys[field][row_id] for field in self.fields}
+            self.alive[row_id] = True
+            self.row_value_ids[row_id] = row_value_ids
+            for field, value in zip(self.fields, values):
+                self.keys[field][row_id] = value
+            self.keys['all'][row_id] = combined
+
+        for value in set(values) - old_values:
+            if value:
+                self.value_rows[self.value_ids[value]].append(row_id)
+
+    def remove(self, file_path):
+        row_id = self.row_ids.get(file_path)
+        if row_id is not None:
+            self.alive[row_id] = False
+
+    def matches(self, file_path, query, field=None):
+        row_id = self.row_ids.get(file_path)
+        if row_id is None:
+            return False
+        return query.lower() in self.keys[field or 'all'][row_id]
+
+    def _candidate_words(self, query_word):
+        """Word ids that may be within the typo budget of query_word (q-gram filter)."""
+        padded = f"${query_word}"
+        grams = {padded[i:i + 3] for i in range(len(padded) - 2)}
+        if not grams:
+            # Single letter: only prefixes can match
+            return [i for i, w in enumerate(self.words) if w.startswith(query_word)]
+        counts = Counter()
+        for gram in grams:
+            postings = self.word_trigrams.get(gram)
+            if postings is not None:
+                counts.update(postings)
+        # Each edit destroys at most 3 grams; the leading one is lost for infix matches
+        needed = max(1, len(grams) - 1 - 3 * _typo_budget(query_word))
+        return [word_id for word_id, count in counts.items() if count >= needed]
+
+    def _prepare_fuzzy(self, query, field, complete=False):
+        """Score the vocabulary against the query words, cached per (query, field).
+
+        Words indexed after preparation are scored lazily, which is enough to
+        check single rows; complete=True rebuilds so candidate lookup sees them.
+        """
+        key = (query, field)
+        cache = self._fuzzy_cache
+        if cache and cache['key'] == key and (not complete or cache['known_words'] == len(self.words)):
+            return cache
+        folded = fold_text(query)
+        query_words = list(dict.fromkeys(_WORD_RE.findall(folded)))
+        word_scores = []
+        for query_word in query_words:
+            scores = {}
+            for word_id in self._candidate_words(query_word):
+                score = _word_similarity(query_word, self.words[word_id])
+                if score:
+                    scores[word_id] = score
+            word_scores.append(scores)
+        self._fuzzy_cache = {
+            'key': key,
+            'phrase': ' '.join(query_words),
+            'query_words': query_words,
+            'word_scores': word_scores,
+            'known_words': len(self.words),
+            'value_scores': {},
+        }
+        return self._fuzzy_cache
+
+    def _value_score(self, prepared, value_id):
+        """Best score per query word for one value, plus a whole-phrase bonus."""
+        cached = prepared['value_scores'].get(value_id)
+        if cached is not None:
+            return cached
+        best = [0.0] * len(prepared['query_words'])
+        known = prepared['known_words']
+        for word_id in self.value_words[value_id]:
+            for i, scores in enumerate(prepared['word_scores']):
+                score = scores.get(word_id)
+                if score is None and word_id >= known:
+                    # Word added after the query was prepared
+                    score = scores[word_id] = _word_similarity(prepared['query_words'][i], self.words[word_id])
+                if score and score > best[i]:
+                    best[i] = score
+        phrase = prepared['phrase']
+        bonus = 0.5 if len(best) > 1 and phrase in self.folded_values[value_id] else 0.0
+        result = prepared['value_scores'][value_id] = (best, bonus)
+        return result
+
+    def _fuzzy_row_score(self, prepared, row_id, field, relevant=None):
+        """Total score of a row, or 0 if some query word matches none of its fields."""
+        if field:
+            value = self.keys[field][row_id]
+            value_ids = (self.value_ids[value],) if value else ()
+        else:
+            value_ids = self.row_value_ids[row_id]
+        best = None
+        bonus = 0.0
+        for value_id in value_ids:
+            if relevant is not None:
+                scored = relevant.get(value_id)
+                if scored is None:
+                    continue
+            else:
+                scored = self._value_score(prepared, value_id)
+            value_best, value_bonus = scored
+            if best is None:
+                best = list(value_best)
+            else:
+                for i, score in enumerate(value_best):
+                    if score > best[i]:
+                        best[i] = score
+            if value_bonus > bonus:
+                bonus = value_bonus
+        if best is None or not all(best):
+            return 0.0
+        return sum(best) + bonus
+
+    def fuzzy_search(self, query, field=None):
+        """Accent-insensitive, typo-tolerant search ranked by match quality.
+
+        Every query word must match some word of the row (or of field) exactly,
+        as a prefix/infix, or within a small edit distance.
+        """
+        prepared = self._prepare_fuzzy(query, field, complete=True)
+        if not prepared['query_words']:
+            return [p for p, alive in zip(self.paths, self.alive) if alive]
+
+        # Only values containing a matching word can contribute to a score
+        relevant = {}
+        matched_values = []
+        for scores in prepared['word_scores']:
+            value_ids = set()
+            for word_id in scores:
+                value_ids.update(self.word_values[word_id])
+            if not value_ids:
+                return []
+            matched_values.append(value_ids)
+            for value_id in value_ids:
+                if value_id not in relevant:
+                    relevant[value_id] = self._value_score(prepared, value_id)
+
+        # Candidate rows come from the query word used by the fewest rows
+        value_rows = self.value_rows
+        rarest = min(matched_values, key=lambda ids: sum(len(value_rows[i]) for i in ids))
+        candidates = set()
+        for value_id in rarest:
+            candidates.update(value_rows[value_id])
+
+        ranked = []
+        alive = self.alive
+        for row_id in candidates:
+            if alive[row_id]:
+                score = self._fuzzy_row_score(prepared, row_id, field, relevant)
+                if score:
+                    ranked.append((-score, row_id))
+        ranked.sort()
+        return [self.paths[row_id] for _, row_id in ranked]
+
+    def fuzzy_matches(self, file_path, query, field=None):
+        row_id = self.row_ids.get(file_path)
+        if row_id is None:
+            return False
+        prepared = self._prepare_fuzzy(query, field)
+        if not prepared['query_words']:
+            return True
+        return bool(self._fuzzy_row_score(prepared, row_id, field))
+
+    def search(self, query, field=None, candidates=None):
+        """Return the paths whose field (or any field) contains query, in row order.
+
+        candidates narrows the search to a previous result, which is valid
+        whenever the new query contains the previous one.
+        """
+        query = query.lower()
+        keys = self.keys[field or 'all']
+        if candidates is not None:
+            ids = [self.row_ids[p] for p in candidates if p in self.row_ids]
+        elif len(query) >= 3:
+            # Scan the rarest trigram's values only, then expand to their rows
+            postings = []
+            for i in range(len(query) - 2):
+                gram = self.trigrams.get(query[i:i + 3])
+                if gram is None:
+                    return []
+                postings.append(gram)
+            values = self.values
+            ids = set()
+            for value_id in set(min(postings, key=len)):
+                if query in values[value_id]:
+                    ids.update(self.value_rows[value_id])
+            ids = sorted(ids)
+        else:
+            ids = range(len(self.paths))
+        alive = self.alive
+        paths = self.paths
+        return [paths[i] for i in ids if alive[i] and query in keys[i]]
+
+
+# Filename rules tried in order of specificity; each names its fields with (?P<field>...)
+DEFAULT_FILENAME_RULES = [
+    # Track - Title - Artist (Standard)
+    # Handles: "01 - DE LADINHO - IVETE SANGALO", "03a - MUSICA - ARTISTA"
+    # Also handles loose spacing around hyphens
+    {"name": "faixa-titulo-artista",
+     "pattern": r"^(?P<track>\d+[a-zA-Z]?)\s*-\s*(?P<title>.+?)\s*-\s*(?P<artist>.+)$"},
+    # Track - Title   Artist (Missing second hyphen, wide spaces)
+    # Handles: "50 - SERTANEJA   DINO FRANCO E MOURAÍ"
+    {"name": "faixa-titulo-espacos-artista",
+     "pattern": r"^(?P<track>\d+[a-zA-Z]?)\s*-\s*(?P<title>.+?)\s{2,}(?P<artist>.+)$"},
+    # Track - Title (No Artist)
+    # Handles: "40- Footloose"
+    {"name": "faixa-titulo",
+     "pattern": r"^(?P<track>\d+[a-zA-Z]?)\s*-\s*(?P<title>.+)$"},
+    # Title - Artist (No Track Number)
+    # Handles: "SANTANA O CANTADOR - XOTE PÉ DE SERRA"
+    # Assumption: Title comes first based on user's other files
+    {"name": "titulo-artista",
+     "pattern": r"^(?P<title>.+?)\s*-\s*(?P<artist>.+)$"},
+]
+
+# Fields a filename rule may capture ('track' is stored as 'tracknumber')
+FILENAME_RULE_FIELDS = ('track', 'title', 'artist', 'album', 'genre', 'date',
+                        'albumartist', 'composer', 'performer')
+
+_GROUP_NAME_RE = re.compile(r"\(\?P<(\w+)>")
+# Backreferences and inline global flags only work in a pattern of their own
+_UNCOMBINABLE_RE = re.compile(r"\(\?P=|\\[1-9]|\(\?[aiLmsux]+\)")
+
+
+def _strip_extension(filename):
+    """os.path.splitext(filename)[0] for a bare file name, without the generic path handling."""
+    dot = filename.rfind('.')
+    if dot > 0 and filename[0] != '.':
+        return filename[:dot]
+    return os.path.splitext(filename)[0]
+
+
+class FilenameRules:
+    """Ordered filename parsing rules compiled once.
+
+    Runs of consecutive rules are merged into a single alternation, so a name
+    is matched in one regex call that still honours rule order (the first
+    alternative that matches wins, as with sequential re.match). Results are
+    memoized per name.
+    """
+
+    CACHE_SIZE = 500_000
+
+    def __init__(self, rules=DEFAULT_FILENAME_RULES):
+        self.rules = []
+        for rule in rules:
+            pattern = re.compile(rule['pattern'])
+            unknown = set(pattern.groupindex) - set(FILENAME_RULE_FIELDS)
+            if unknown:
+                raise ValueError(f"Regra '{rule.get('name', rule['pattern'])}': campos desconhecidos {sorted(unknown)}")
+            if 'title' not in pattern.groupindex:
+                raise ValueError(f"Regra '{rule.get('name', rule['pattern'])}': o grupo (?P<title>...) é obrigatório")
+            self.rules.append({'name': rule.get('name') or f"regra-{len(self.rules) + 1}",
+                               'pattern': rule['pattern'],
+                               'fields': tuple(pattern.groupindex)})
+        self.names = [rule['name'] for rule in self.rules]
+        self.compiled = [re.compile(rule['pattern']) for rule in self.rules]
+        self._groups = [tuple((field, pattern.groupindex[field]) for field in rule['fields'])
+                        for rule, pattern in zip(self.rules, self.compiled)]
+        self._chunks = self._combine()
+        self._cache = {}
+
+    @classmethod
+    def load(cls, path=None):
+        """Rules from a JSON file, or the defaults when path is None.
+
+        The file holds {"rules": [{"name": ..., "pattern": ...}, ...]}; its
+        rules are tried before the defaults unless "include_defaults" is false.
+        """
+        if path is None:
+            return cls()
+        with open(path, encoding='utf-8') as f:
+            config = json.load(f)
+        if isinstance(config, list):
+            config = {'rules': config}
+        rules = list(config.get('rules', []))
+        if config.get('include_defaults', True):
+            rules += DEFAULT_FILENAME_RULES
+        return cls(rules)
+
+    def _combine(self):
+        """Group consecutive combinable rules into (pattern, {lastindex: (rule index, groups)}) chunks.
+
+        groups pairs each captured field with its group number in the chunk's pattern.
+        """
+        chunks = []
+        run = []
+
+        def close_run():
+            if len(run) == 1:
+                index = run[0]
+                # Without a wrapper group lastindex varies, so the single rule is keyed by None
+                chunks.append((self.compiled[index], {None: (index, self._groups[index])}))
+            elif run:
+                alternatives = []
+                for index in run:
+                    # Group names are prefixed so each rule keeps its own captures
+                    pattern = _GROUP_NAME_RE.sub(lambda m: f"(?P<r{index}_{m.group(1)}>",
+                                                 self.rules[index]['pattern'])
+                    alternatives.append(f"(?P<r{index}>{pattern})")
+                pattern = re.compile("|".join(alternatives))
+                # The wrapper group closes after the rule's own groups, so it is the match's lastindex
+                chunks.append((pattern, {
+                    pattern.groupindex[f"r{index}"]: (index, tuple(
+                        (field, pattern.groupindex[f"r{index}_{field}"]) for field in self.rules[index]['fields']))
+                    for index in run}))
+            run.clear()
+
+        for index, rule in enumerate(self.rules):
+            if _UNCOMBINABLE_RE.search(rule['pattern']):
+                close_run()
+                run.append(index)
+                close_run()
+            else:
+                run.append(index)
+        close_run()
+        return chunks
+
+    @staticmethod
+    def _result(match, groups):
+        parsed = {'track': None, 'title': None, 'artist': None}
+        for field, group in groups:
+            value = match.group(group)
+            parsed[field] = value.strip() if value is not None else None
+        return parsed
+
+    def match(self, filename):
+        """(rule index, parsed fields) for a file name, or (None, None)."""
+        hit = self._cache.get(filename)
+        if hit is not None:
+            return hit
+        name = _strip_extension(filename)
+        hit = (None, None)
+        for pattern, rules in self._chunks:
+            m = pattern.match(name)
+            if m is not None:
+                index, groups = rules[m.lastindex] if len(rules) > 1 else rules[None]
+                hit = (index, self._result(m, groups))
+                break
+        if len(self._cache) >= self.CACHE_SIZE:
+            self._cache.clear()
+        self._cache[filename] = hit
+        return hit
+
+    def parse(self, filename):
+        """Fields parsed from a file name by the first matching rule, or None."""
+        parsed = self.match(filename)[1]
+        return dict(parsed) if parsed is not None else None
+
+    def parse_with(self, index, filename):
+        """Fields parsed by one specific rule, or None if the name doesn't fit it."""
+        hit = self._cache.get(filename)
+        if hit is not None and hit[0] == index:
+            return dict(hit[1])
+        m = self.compiled[index].match(_strip_extension(filename))
+        return self._result(m, self._groups[index]) if m else None
+
+    def dominant_rule(self, filenames, sample_size=FOLDER_SAMPLE_SIZE):
+        """Index of the rule most names in an evenly spaced sample match first, or None."""
+        step = max(1, len(filenames) // sample_size)
+        counts = Counter(self.match(name)[0] for name in filenames[::step][:sample_size])
+        counts.pop(None, None)
+        if not counts:
+            return None
+        # On a tie the more specific (earlier) rule wins
+        return max(counts, key=lambda index: (counts[index], -index))
+
+    def __getstate__(self):
+        # The memo table isn't worth shipping to worker processes
+        state = self.__dict__.copy()
+        state['_cache'] = {}
+        return state
+
+
+def filename_metadata(file_path, parsed):
+    """Tags for the fields a rule parsed from the file name.
+
+    Album comes from the folder name unless the rule has an album group.
+    """
+    proposed = {}
+    for field in FILENAME_RULE_FIELDS:
+        if parsed.get(field):
+            proposed['tracknumber' if field == 'track' else field] = parsed[field]
+    if 'album' not in parsed:
+        proposed['album'] = os.path.basename(os.path.dirname(file_path))
+    return proposed
+
+
+TRANSFORM_CASES = ('upper', 'lower', 'title', 'sentence')
+
+
+def _title_case(value):
+    # Word by word, so "d'água" doesn't become "D'Água" the way str.title() does it
+    return ' '.join(word[:1].upper() + word[1:].lower() for word in value.split(' '))
+
+
+def compile_transform_rule(rule):
+    """str -> str function for one transform rule; raises ValueError or re.error for a bad rule.
+
+    Operations: replace (find, replace, ignore_case), regex (pattern,
+    replace, ignore_case), case (mode: upper, lower, title or sentence),
+    trim (strip and collapse inner whitespace) and split_join (split,
+    join, regex, unique), which re-splits the '; '-joined multi-values.
+    """
+    op = rule.get('op')
+    flags = re.IGNORECASE if rule.get('ignore_case') else 0
+    if op == 'replace':
+        find = rule.get('find')
+        if not find:
+            raise ValueError("A regra replace precisa de 'find'")
+        replacement = rule.get('replace', '')
+        if flags:
+            pattern = re.compile(re.escape(find), flags)
+            return lambda value: pattern.sub(lambda match: replacement, value)
+        return lambda value: value.replace(find, replacement)
+    if op == 'regex':
+        pattern = re.compile(rule.get('pattern') or '', flags)
+        if not pattern.pattern:
+            raise ValueError("A regra regex precisa de 'pattern'")
+        replacement = rule.get('replace', '')
+        pattern.sub(replacement, '')  # Reject bad group references now, not on the first match
+        return lambda value: pattern.sub(replacement, value)
+    if op == 'case':
+        mode = rule.get('mode')
+        if mode == 'upper':
+            return str.upper
+        if mode == 'lower':
+            return str.lower
+        if mode == 'title':
+            return _title_case
+        if mode == 'sentence':
+            return lambda value: value[:1].upper() + value[1:].lower()
+        raise ValueError(f"Modo de caixa desconhecido: {mode} (use {', '.join(TRANSFORM_CASES)})")
+    if op == 'trim':
+        return lambda value: ' '.join(value.split())
+    if op == 'split_join':
+        split = rule.get('split', '; ')
+        splitter = re.compile(split if rule.get('regex') else re.escape(split), flags)
+        join = rule.get('join', '; ')
+        unique = rule.get('unique', False)
+
+        def split_join(value):
+            parts = [part.strip() for part in splitter.split(value)]
+            parts = [part for part in parts if part]
+            if unique:
+                parts = list(dict.fromkeys(parts))
+            return join.join(parts)
+        return split_join
+    raise ValueError(f"Operação desconhecida: {op}")
+
+
+# Operations offered in the transform dialog: label -> rule template
+TRANSFORM_CHOICES = {
+    "Substituir texto": {'op': 'replace'},
+    "Expressão regular": {'op': 'regex'},
+    "MAIÚSCULAS": {'op': 'case', 'mode': 'upper'},
+    "minúsculas": {'op': 'case', 'mode': 'lower'},
+    "Título": {'op': 'case', 'mode': 'title'},
+    "Primeira maiúscula": {'op': 'case', 'mode': 'sentence'},
+    "Aparar espaços": {'op': 'trim'},
+    "Dividir/Juntar": {'op': 'split_join'},
+}
+
+
+def describe_transform_rule(rule):
+    """One-line Portuguese description of a transform rule."""
+    fields = ', '.join(rule.get('fields') or ["todos os campos"])
+    op = rule.get('op')
+    if op == 'replace':
+        text = f"substituir {rule.get('find')!r} por {rule.get('replace', '')!r}"
+    elif op == 'regex':
+        text = f"regex {rule.get('pattern')!r} -> {rule.get('replace', '')!r}"
+    elif op == 'split_join':
+        text = f"dividir em {rule.get('split', '; ')!r} e juntar com {rule.get('join', '; ')!r}"
+    else:
+        text = next((label for label, template in TRANSFORM_CHOICES.items()
+                     if all(rule.get(k) == v for k, v in template.items())), op)
+    if rule.get('ignore_case'):
+        text += " (ignorando maiúsc./minúsc.)"
+    return f"{fields}: {text}"
+
+
+class Transform:
+    """Ordered find/replace, regex, case, trim and split/join rules over metadata fields.
+
+    Each rule is a dict with an "op", its parameters (see
+    compile_transform_rule) and optionally "fields" (default: all fields).
+    """
+
+    def __init__(self, rules, fields=METADATA_FIELDS):
+        self.rules = [dict(rule) for rule in rules]
+        self.fields = tuple(fields)
+        steps = []
+        for rule in self.rules:
+            targets = rule.get('fields') or self.fields
+            unknown = set(targets).difference(self.fields)
+            if unknown:
+                raise ValueError(f"Campo(s) desconhecido(s): {', '.join(sorted(unknown))}")
+            steps.append((compile_transform_rule(rule), targets))
+        # Rules only interact within a field, so each field gets its own chain
+        self.chains = {}
+        for field in self.fields:
+            funcs = [func for func, targets in steps if field in targets]
+            if funcs:
+                self.chains[field] = funcs
+
+    @classmethod
+    def load(cls, path, fields=METADATA_FIELDS):
+        """Rules from a JSON file holding {"rules": [...]} or just the list."""
+        with open(path, encoding='utf-8') as f:
+            config = json.load(f)
+        if isinstance(config, dict):
+            config = config.get('rules', [])
+        return cls(config, fields)
+
+    def apply(self, field, value):
+        for func in self.chains.get(field, ()):
+            value = func(value)
+        return value
+
+    def plan(self, file_data, file_paths=None):
+        """Dry run over file_paths (default: every row of file_data).
+
+        Returns (changes, unchanged) like plan_filename_changes. Values are
+        compared as-is, so stray whitespace counts as a change. On a
+        MetadataStore each rule chain runs once per distinct value.
+        """
+        funcs = {field: partial(self.apply, field) for field in self.chains}
+        if isinstance(file_data, MetadataStore):
+            changed = file_data.map_values(funcs, file_paths)
+        else:
+            changed = {}
+            for file_path in (file_data if file_paths is None else file_paths):
+                metadata = file_data.get(file_path)
+                if metadata is None:
+                    continue
+                for field, func in funcs.items():
+                    value = metadata.get(field) or ''
+                    new_value = func(value)
+                    if new_value != value:
+                        changed.setdefault(file_path, {})[field] = new_value
+        # Records are views, so plan over a snapshot when the store may change meanwhile
+        changes = [(file_path, file_data[file_path], fields) for file_path, fields in changed.items()]
+        total = len(file_data) if file_paths is None else sum(1 for p in file_paths if p in file_data)
+        return changes, total - len(changes)
 
 
 class LogicMixin:
+    filename_rules = FilenameRules()
+    profile_path = None  # profiling report written on exit
+    write_queue = None  # WriteBehindQueue flushed on exit
+    mixer = None  # pygame.mixer, initialized on first playback
+    volume = 1.0
+
     def parse_filename(self, filename):
-        # Remove extension
-        name, _ = os.path.splitext(filename)
-
-        # Regex patterns to try
-        # Pattern 1: Track - Title - Artist (Standard)
-        # Handles: "01 - DE LADINHO - IVETE SANGALO", "03a - MUSICA - ARTISTA"
-        # Also handles loose spacing around hyphens
-        pattern1 = r"^(\d+[a-zA-Z]?)\s*-\s*(.+?)\s*-\s*(.+)$"
-
-        # Pattern 2: Track - Title   Artist (Missing second hyphen, wide spaces)
-        # Handles: "50 - SERTANEJA   DINO FRANCO E MOURAÍ"
-        pattern2 = r"^(\d+[a-zA-Z]?)\s*-\s*(.+?)\s{2,}(.+)$"
-
-        # Pattern 3: Track - Title (No Artist)
-        # Handles: "40- Footloose"
-        pattern3 = r"^(\d+[a-zA-Z]?)\s*-\s*(.+)$"
-
-        # Pattern 4: Title - Artist (No Track Number)
-        # Handles: "SANTANA O CANTADOR - XOTE PÉ DE SERRA"
-        # Assumption: Title comes first based on user's other files
-        pattern4 = r"^(.+?)\s*-\s*(.+)$"
-
-        # Try patterns in order of specificity
-        for i, pattern in enumerate([pattern1, pattern2, pattern3, pattern4]):
-            match = re.match(pattern, name)
-            if match:
-                groups = match.groups()
-                if i == 0 or i == 1: # Patterns with Track, Title, Artist
-                    return {
-                        "track": groups[0].strip(),
-                        "title": groups[1].strip(),
-                        "artist": groups[2].strip()
-                    }
-                elif i == 2: # Pattern with Track, Title (No Artist)
-                    return {
-                        "track": groups[0].strip(),
-                        "title": groups[1].strip(),
-                        "artist": None
-                    }
-                elif i == 3: # Pattern with Title, Artist (No Track)
-                    return {
-                        "track": None,
-                        "title": groups[0].strip(),
-                        "artist": groups[1].strip()
-                    }
-        return None
+        return self.filename_rules.parse(filename)
+
+    def parse_folders(self, file_paths):
+        """Parse file names with a single rule per folder.
+
+        Each folder uses the dominant rule of a sample of its files, so an
+        album is read consistently. Names that don't fit it fall back to the
+        first matching rule. Returns ({file path: parsed or None}, report)
+        where report lists (folder, rule name or None, files, misfits).
+        """
+        folders = {}
+        for file_path in file_paths:
+            folders.setdefault(os.path.dirname(file_path), []).append(file_path)
+        with PROFILER.span('parse_folders', folders=len(folders)):
+            return self._parse_folders(folders)
+
+    def _parse_folders(self, folders):
+        rules = self.filename_rules
+        parsed = {}
+        report = []
+        for folder, paths in folders.items():
+            names = [os.path.basename(p) for p in paths]
+            index = rules.dominant_rule(names)
+            misfits = 0
+            for file_path, name in zip(paths, names):
+                result = rules.parse_with(index, name) if index is not None else None
+                if result is None:
+                    misfits += 1
+                    result = rules.parse(name)
+                parsed[file_path] = result
+            report.append((folder, rules.names[index] if index is not None else None, len(paths), misfits))
+        return parsed, report
+
+    def metadata_from_filename(self, file_path, parsed=None):
+        """Metadata parsed from the file name, or None if it doesn't parse.
+
+        parsed can carry the fields already extracted by parse_folders.
+        """
+        if parsed is None:
+            parsed = self.parse_filename(os.path.basename(file_path))
+        if not parsed:
+            return None
+        return filename_metadata(file_path, parsed)
+
+    def plan_filename_changes(self, file_data):
+        """Dry run of filename parsing against the current tags.
+
+        Returns (changes, unchanged, unparsed, report): changes is a list of
+        (file_path, current, changed_fields) for files that would actually
+        change; no-op writes are dropped here. report is the per-folder rule
+        report of parse_folders.
+        """
+        parsed, report = self.parse_folders(file_data)
+        changes = []
+        unchanged = 0
+        unparsed = []
+        for file_path, current in file_data.items():
+            fields = parsed[file_path]
+            proposed = self.metadata_from_filename(file_path, fields) if fields else None
+            if proposed is None:
+                unparsed.append(file_path)
+                continue
+            changed = diff_metadata(current, proposed)
+            if changed:
+                changes.append((file_path, current, changed))
+            else:
+                unchanged += 1
+        return changes, unchanged, unparsed, report
 
     def resource_path(self, relative_path):
         """ Get absolute path to resource, works for dev and for PyInstaller """
@@ -79,48 +2855,430 @@ class LogicMixin:
         return os.path.join(base_path, relative_path)
 
     def on_closing(self):
-        try:
-            pygame.mixer.music.stop()
-            pygame.mixer.quit()
-        except:
-            pass
+        if self.write_queue is not None:
+            # Pending cell edits are written before the window goes away
+            self.write_queue.flush(WRITE_FLUSH_TIMEOUT)
+            pending, failed = self.write_queue.counts()
+            if (pending or failed) and not messagebox.askyesno(
+                    "Alterações não gravadas",
+                    f"{pending + failed} arquivo(s) ainda não foram gravados. Sair mesmo assim?"):
+                return
+        if PROFILER.enabled and self.profile_path:
+            try:
+                PROFILER.export(self.profile_path)
+            except OSError as e:
+                print(f"Error writing profile: {e}")
+        if self.mixer is not None:
+            try:
+                self.mixer.music.stop()
+                self.mixer.quit()
+            except:
+                pass
         self.root.destroy()
         sys.exit()
 
+class WriteBehindQueue:
+    """Background writer for edits, coalesced per file.
+
+    put() merges fields into the file's pending edit and returns at once. A
+    worker thread writes a file once it has been quiet for `delay` seconds,
+    so several edits of one song become one write. Failed writes are retried
+    after each of retry_delays and then kept in `failed` until retry_failed()
+    or a new edit of the file. on_status(pending, failed) is called from the
+    worker thread whenever the counts may have changed, so it must not wait
+    on a thread that may be blocked in flush() (e.g. Tk's main thread).
+    """
+
+    def __init__(self, write, on_status=None, delay=WRITE_BEHIND_DELAY, retry_delays=(1, 3, 10)):
+        self.write = write
+        self.on_status = on_status
+        self.delay = delay
+        self.retry_delays = retry_delays
+        self.cond = threading.Condition()
+        self.pending = {}  # file path -> [fields, due time, attempts]
+        self.failed = {}  # file path -> (fields, error)
+        self.in_flight = {}  # file path -> fields being written
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def put(self, file_path, fields):
+        with self.cond:
+            entry = self.pending.get(file_path)
+            if entry is None:
+                # A failed edit of the same file rides along so it isn't lost
+                fields_before = self.failed.pop(file_path, ({}, None))[0]
+                entry = self.pending[file_path] = [dict(fields_before), 0, 0]
+            entry[0].update(fields)
+            entry[1] = time.monotonic() + self.delay
+            self.cond.notify_all()
+        self._status()
+
+    def counts(self):
+        """(files waiting or being written, files whose write failed)."""
+        with self.cond:
+            return len(self.pending) + len(self.in_flight), len(self.failed)
+
+    def unwritten(self, file_paths):
+        """{file_path: fields} of the edits among file_paths that aren't on disk yet."""
+        with self.cond:
+            edits = {}
+            for file_path in file_paths:
+                fields = dict(self.failed.get(file_path, ({},))[0])
+                fields.update(self.in_flight.get(file_path, {}))
+                if file_path in self.pending:
+                    fields.update(self.pending[file_path][0])
+                if fields:
+                    edits[file_path] = fields
+            return edits
+
+    def retry_failed(self):
+        with self.cond:
+            for file_path, (fields, _) in self.failed.items():
+                entry = self.pending.setdefault(file_path, [{}, 0, 0])
+                entry[0] = dict(fields, **entry[0])
+            self.failed.clear()
+            self.cond.notify_all()
+        self._status()
+
+    def flush(self, timeout=None):
+        """Write everything pending now, skipping the delays; True if nothing is left pending."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            while self.pending or self.in_flight:
+                now = time.monotonic()
+                for entry in self.pending.values():
+                    entry[1] = min(entry[1], now)
+                self.cond.notify_all()
+                if deadline is not None and now >= deadline:
+                    return False
+                self.cond.wait(None if deadline is None else deadline - now)
+        return True
+
+    def _status(self):
+        if self.on_status:
+            self.on_status(*self.counts())
+
+    def _next_due(self):
+        """Pop the file due first, waiting until one is; called with the lock held."""
+        while True:
+            now = time.monotonic()
+            file_path = min(self.pending, key=lambda p: self.pending[p][1], default=None)
+            if file_path is not None and self.pending[file_path][1] <= now:
+                fields, _, attempts = self.pending.pop(file_path)
+                return file_path, fields, attempts
+            self.cond.wait(None if file_path is None else self.pending[file_path][1] - now)
+
+    def _run(self):
+        while True:
+            with self.cond:
+                file_path, fields, attempts = self._next_due()
+                self.in_flight[file_path] = fields
+            error = None
+            try:
+                self.write(file_path, fields)
+            except Exception as e:
+                error = e
+            with self.cond:
+                del self.in_flight[file_path]
+                if error is not None:
+                    newer = self.pending.get(file_path)
+                    if newer is not None:
+                        # Edited again meanwhile: the next write carries both
+                        newer[0] = dict(fields, **newer[0])
+                    elif attempts < len(self.retry_delays):
+                        self.pending[file_path] = [fields, time.monotonic() + self.retry_delays[attempts],
+                                                   attempts + 1]
+                    else:
+                        print(f"Error writing {file_path}: {error}")
+                        self.failed[file_path] = (fields, error)
+                self.cond.notify_all()
+            self._status()
+
+
+class TableUpdateScheduler:
+    """Thread-safe queue of table row inserts/updates drained in time-sliced batches.
+
+    Any thread may queue work; it is applied on the Tk main thread at most
+    budget_ms per frame so the window keeps responding. Multiple updates to
+    the same row are coalesced into one, and an update to a row whose insert
+    is still pending just refreshes the values of that insert.
+    """
+
+    def __init__(self, root, apply_row, budget_ms=DEFAULT_FRAME_BUDGET_MS):
+        self.root = root
+        self.apply_row = apply_row  # apply_row(iid, values, insert) on the main thread
+        self.budget_ms = budget_ms
+        self.lock = threading.Lock()
+        self.pending = OrderedDict()
+        self.scheduled = False
+
+    def put_row(self, iid, values, insert=False):
+        with self.lock:
+            previous = self.pending.get(('row', iid))
+            if previous is not None and previous[1]:
+                insert = True
+            self.pending[('row', iid)] = (values, insert)
+        self._schedule()
+
+    def call(self, func, key=None):
+        """Run func on the main thread after the rows queued before it.
+
+        Calls sharing a key are coalesced (e.g. progress updates), keeping the
+        latest func at the position of the first one.
+        """
+        with self.lock:
+            self.pending[('call', key if key is not None else object())] = func
+        self._schedule()
+
+    def clear(self):
+        with self.lock:
+            self.pending.clear()
+
+    def _schedule(self):
+        with self.lock:
+            if self.scheduled:
+                return
+            self.scheduled = True
+        self.root.after(0, self._drain)
+
+    def _drain(self):
+        with PROFILER.span('table.drain'):
+            more = self._drain_slice()
+        if more:
+            # Yield to Tk so input and redraws are handled before the next slice
+            self.root.after(1, self._drain)
+
+    def _drain_slice(self):
+        """Apply queued updates until the budget runs out; False once the queue is empty."""
+        deadline = time.perf_counter() + self.budget_ms / 1000.0
+        while True:
+            with self.lock:
+                if not self.pending:
+                    self.scheduled = False
+                    return False
+                (kind, key), payload = self.pending.popitem(last=False)
+            try:
+                if kind == 'row':
+                    PROFILER.count('table.rows')
+                    self.apply_row(key, *payload)
+                else:
+                    payload()
+            except Exception as e:
+                print(f"Error applying table update: {e}")
+            if time.perf_counter() >= deadline:
+                return True
+
+
+class VirtualTable:
+    """Viewport-sized pool of Treeview rows recycled while scrolling.
+
+    Only the rows visible in the tree (plus a small overscan) exist as items;
+    scrolling rewrites their values from the current path list instead of
+    inserting/deleting items, so memory and scroll latency stay flat no
+    matter how many files are loaded.
+    """
+
+    def __init__(self, tree, scrollbar, get_paths, get_values, overscan=8, on_scroll=None):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.get_paths = get_paths    # returns the ordered list of shown file paths
+        self.get_values = get_values  # maps a file path to its row values
+        self.overscan = overscan
+        self.on_scroll = on_scroll
+        self.top = 0
+        self.slots = []       # recycled item ids, top to bottom
+        self.slot_paths = {}  # item id -> file path currently shown in it
+        self.selected_path = None
+        self.refresh_pending = False
+        self.bindings = []
+
+    def attach(self):
+        for item in self.tree.get_children():
+            self.tree.delete(item)
+        self.scrollbar.configure(command=self.yview)
+        # The tree never scrolls itself; the scrollbar reflects the virtual offset
+        self.tree.configure(yscrollcommand=lambda *args: None)
+        for sequence, handler in [('<MouseWheel>', self._on_mousewheel),
+                                  ('<Button-4>', lambda e: self.scroll(-3)),
+                                  ('<Button-5>', lambda e: self.scroll(3)),
+                                  ('<Up>', lambda e: self._move_selection(-1)),
+                                  ('<Down>', lambda e: self._move_selection(1)),
+                                  ('<Prior>', lambda e: self._move_selection(-self.visible_rows())),
+                                  ('<Next>', lambda e: self._move_selection(self.visible_rows())),
+                                  ('<Configure>', lambda e: self.schedule_refresh()),
+                                  ('<<TreeviewSelect>>', self._on_select)]:
+            self.bindings.append((sequence, self.tree.bind(sequence, handler, add='+')))
+        self.refresh()
+
+    def detach(self):
+        for sequence, funcid in self.bindings:
+            self.tree.unbind(sequence, funcid)
+        self.bindings = []
+        for item in self.slots:
+            self.tree.delete(item)
+        self.slots = []
+        self.slot_paths = {}
+        self.scrollbar.configure(command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self.scrollbar.set)
+
+    def visible_rows(self):
+        """Number of rows that fit in the tree's current height."""
+        if self.slots:
+            bbox = self.tree.bbox(self.slots[0])
+            if bbox:
+                header, row_height = bbox[1], bbox[3]
+                return max(1, (self.tree.winfo_height() - header) // max(row_height, 1))
+        row_height = ttk.Style().lookup('Treeview', 'rowheight') or 20
+        return max(1, self.tree.winfo_height() // int(row_height))
+
+    def schedule_refresh(self):
+        """Coalesce refresh requests into one idle callback."""
+        if not self.refresh_pending:
+            self.refresh_pending = True
+            self.tree.after_idle(self.refresh)
+
+    def refresh(self):
+        """Re-bind the slot items to the rows at the current offset."""
+        self.refresh_pending = False
+        paths = self.get_paths()
+        total = len(paths)
+        visible = self.visible_rows()
+        self.top = max(0, min(self.top, total - visible))
+        count = max(0, min(visible + self.overscan, total - self.top))
+
+        # Grow or shrink the slot pool to the viewport size
+        while len(self.slots) < count:
+            self.slots.append(self.tree.insert('', 'end'))
+        while len(self.slots) > count:
+            item = self.slots.pop()
+            self.slot_paths.pop(item, None)
+            self.tree.delete(item)
+
+        selected_item = None
+        for offset, item in enumerate(self.slots):
+            file_path = paths[self.top + offset]
+            self.slot_paths[item] = file_path
+            self.tree.item(item, values=self.get_values(file_path))
+            if file_path == self.selected_path:
+                selected_item = item
+        if selected_item:
+            self.tree.selection_set(selected_item)
+        elif self.tree.selection():
+            self.tree.selection_remove(self.tree.selection())
+        self.tree.yview_moveto(0)
+
+        if total:
+            self.scrollbar.set(self.top / total, min(1.0, (self.top + visible) / total))
+        else:
+            self.scrollbar.set(0, 1)
+
+    def update_row(self, file_path, values):
+        """Refresh one row if it is currently materialized."""
+        for item, shown_path in self.slot_paths.items():
+            if shown_path == file_path:
+                self.tree.item(item, values=values)
+                return
+
+    def path_for(self, item):
+        return self.slot_paths.get(item)
+
+    def scroll(self, rows):
+        if self.on_scroll:
+            self.on_scroll()
+        self.top += rows
+        self.refresh()
+        return "break"
+
+    def yview(self, *args):
+        """Scrollbar command: 'moveto fraction' or 'scroll n units|pages'."""
+        if not args:
+            return
+        if args[0] == 'moveto':
+            if self.on_scroll:
+                self.on_scroll()
+            self.top = int(float(args[1]) * len(self.get_paths()))
+            self.refresh()
+        elif args[0] == 'scroll':
+            amount = int(args[1])
+            if args[2] == 'pages':
+                amount *= self.visible_rows()
+            self.scroll(amount)
+
+    def see(self, file_path):
+        """Scroll so file_path is visible and select it."""
+        paths = self.get_paths()
+        try:
+            index = paths.index(file_path)
+        except ValueError:
+            return
+        visible = self.visible_rows()
+        if index < self.top:
+            self.top = index
+        elif index >= self.top + visible:
+            self.top = index - visible + 1
+        self.selected_path = file_path
+        self.refresh()
+
+    def _on_mousewheel(self, event):
+        # Windows reports multiples of 120, macOS small deltas
+        step = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        return self.scroll(-3 * step)
+
+    def _on_select(self, event):
+        selection = self.tree.selection()
+        if selection and selection[0] in self.slot_paths:
+            self.selected_path = self.slot_paths[selection[0]]
+
+    def _move_selection(self, rows):
+        paths = self.get_paths()
+        if not paths:
+            return "break"
+        try:
+            index = paths.index(self.selected_path) + rows
+        except ValueError:
+            index = self.top
+        self.see(paths[max(0, min(index, len(paths) - 1))])
+        return "break"
+
+
 class MusicMetadataEditor(LogicMixin):
-    def __init__(self, root):
+    def __init__(self, root, reader_workers=DEFAULT_READER_WORKERS, reader_mode='thread',
+                 frame_budget_ms=DEFAULT_FRAME_BUDGET_MS, virtual_table=False, fast_read=True,
+                 tag_padding=DEFAULT_TAG_PADDING, filename_rules=None, profile_path=None, watch=False):
         self.root = root
+        self.fast_read = fast_read
+        self.tag_padding = tag_padding
+        if filename_rules is not None:
+            self.filename_rules = filename_rules
+        self.profile_path = profile_path
         self.root.title("Organizador de Músicas")
         self.root.geometry("1400x900")
         
-        # Apply Theme
-        sv_ttk.set_theme("dark")
         self._apply_window_settings()
         
-        # Load Icons
-        
         # Load Icons
         self.icons = {}
         self._load_icons()
 
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         
+        # Persistent tag cache so re-opening a library only re-reads changed files
+        self.metadata_index = MetadataIndex()
+
+        # Transform rules of the last "Transformar" dialog
+        self.transform_rules = []
+
         # Store file paths and metadata
-        self.file_data = {}  # Maps file_path to metadata dict
+        self.file_data = MetadataStore(METADATA_FIELDS)  # Maps file_path to its metadata record
         self.shown_file_paths = [] # List of file paths currently in the table (for sorting/filtering)
-        self.sort_column_active = None
-        self.sort_reverse = False
-
-        # Metadata fields to display
+        self.sort_columns = []  # [(column, reverse), ...], most significant first
+        self.sort_keys = SortKeys()
+        self._load_generation = 0
 
         # Metadata fields to display
-        self.metadata_fields = ['title', 'artist', 'album', 'tracknumber', 'genre', 'date',
-                               'albumartist', 'composer', 'performer']
+        self.metadata_fields = list(METADATA_FIELDS)
 
         # Styles
-        style = ttk.Style()
-        style.configure("TButton", padding=6)
-        style.configure("TLabel", padding=6, font=("Helvetica", 10))
+        self._configure_styles()
 
         # Main Frame
         main_frame = ttk.Frame(root, padding="10")
@@ -139,6 +3297,14 @@ class MusicMetadataEditor(LogicMixin):
         btn_browse = ttk.Button(frame_select, text="Selecionar Pasta", command=self.browse_folder)
         btn_browse.pack(side=tk.LEFT)
 
+        # Tag reader pool settings
+        self.reader_workers = tk.IntVar(value=reader_workers)
+        self.reader_mode = tk.StringVar(value=reader_mode)
+        ttk.Label(frame_select, text="Leitores:").pack(side=tk.LEFT, padx=(10, 5))
+        ttk.Spinbox(frame_select, from_=1, to=64, textvariable=self.reader_workers, width=4).pack(side=tk.LEFT)
+        ttk.Combobox(frame_select, textvariable=self.reader_mode, values=TagReaderPool.MODES,
+                     state="readonly", width=8).pack(side=tk.LEFT, padx=(5, 0))
+
         # Filter Frame
         frame_filter = ttk.Frame(main_frame)
         frame_filter.pack(fill=tk.X, pady=(0, 10))
@@ -149,14 +3315,43 @@ class MusicMetadataEditor(LogicMixin):
         filter_options = ["Todos", "Nome do Arquivo"] + [f.capitalize() for f in self.metadata_fields]
         self.combo_filter = ttk.Combobox(frame_filter, textvariable=self.filter_col_var, values=filter_options, state="readonly", width=15)
         self.combo_filter.pack(side=tk.LEFT, padx=(0, 10))
+        self.combo_filter.bind('<<ComboboxSelected>>', self._on_filter_change)
+
+        # Substring match or accent-insensitive ranked fuzzy match
+        self.filter_mode_var = tk.StringVar(value="Contém")
+        self.combo_filter_mode = ttk.Combobox(frame_filter, textvariable=self.filter_mode_var,
+                                              values=["Contém", "Aproximada"], state="readonly", width=11)
+        self.combo_filter_mode.pack(side=tk.LEFT, padx=(0, 10))
+        self.combo_filter_mode.bind('<<ComboboxSelected>>', self._on_filter_change)
         
         self.filter_text = tk.StringVar()
         self.filter_text.trace("w", self._on_filter_change)
+        self.search_index = SearchIndex(self.metadata_fields)
+        self._filter_after_id = None
+        self._last_filter = None  # (query, field, fuzzy) that produced shown_file_paths
         entry_filter = ttk.Entry(frame_filter, textvariable=self.filter_text, width=40)
         entry_filter.pack(side=tk.LEFT, padx=(0, 10))
         
         ttk.Button(frame_filter, text="Limpar", command=lambda: self.filter_text.set("")).pack(side=tk.LEFT)
 
+        # Pick up files changed on disk by other tools without reloading
+        self.watch_var = tk.BooleanVar(value=watch)
+        self.folder_watcher = None
+        self.loaded_folder = None
+        ttk.Checkbutton(frame_filter, text="Monitorar pasta", variable=self.watch_var,
+                        command=self.toggle_watch).pack(side=tk.RIGHT, padx=(10, 0))
+
+        # Virtualized table mode for very large libraries
+        self.virtual_table_var = tk.BooleanVar(value=virtual_table)
+        ttk.Checkbutton(frame_filter, text="Tabela virtual", variable=self.virtual_table_var,
+                        command=self.toggle_virtual_table).pack(side=tk.RIGHT)
+
+        # Timing spans and counters for the bulk operations
+        self.profiling_var = tk.BooleanVar(value=PROFILER.enabled)
+        ttk.Button(frame_filter, text="Exportar Perfil", command=self.export_profile).pack(side=tk.RIGHT, padx=(0, 10))
+        ttk.Checkbutton(frame_filter, text="Perfil", variable=self.profiling_var,
+                        command=lambda: PROFILER.enable(self.profiling_var.get())).pack(side=tk.RIGHT, padx=(0, 10))
+
         # Table Frame with scrollbars
         table_frame = ttk.Frame(main_frame)
         table_frame.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
@@ -176,11 +3371,16 @@ class MusicMetadataEditor(LogicMixin):
             display_name = field.replace('tracknumber', 'Track #').title()
             self.tree.heading(field, text=display_name, command=lambda f=field: self.sort_column(f))
             self.tree.column(field, width=120, minwidth=80)
+        self.heading_texts = {col: self.tree.heading(col, "text") for col in columns}
+
+        # Shift+click on a heading adds it as a secondary sort column
+        self.tree.bind('<Shift-Button-1>', self._on_heading_shift_click)
 
         # Scrollbars
         v_scrollbar = ttk.Scrollbar(table_frame, orient='vertical', command=self.tree.yview)
         h_scrollbar = ttk.Scrollbar(table_frame, orient='horizontal', command=self.tree.xview)
         self.tree.configure(yscrollcommand=v_scrollbar.set, xscrollcommand=h_scrollbar.set)
+        self.v_scrollbar = v_scrollbar
 
         # Pack scrollbars and tree
         self.tree.grid(row=0, column=0, sticky='nsew')
@@ -192,11 +3392,19 @@ class MusicMetadataEditor(LogicMixin):
         # Bind double-click for editing
         self.tree.bind('<Double-1>', self.on_cell_double_click)
 
+        # Row inserts/updates from worker threads go through the scheduler
+        self.ui_scheduler = TableUpdateScheduler(self.root, self._apply_table_row, frame_budget_ms)
+
         # Store editing state
         self.editing_item = None
+        self.editing_path = None
         self.editing_column = None
         self.edit_entry = None
 
+        self.virtual_table = None
+        if virtual_table:
+            self.toggle_virtual_table()
+
         # Progress Bar and Status Label
         self.progress_frame = ttk.Frame(main_frame)
         self.progress_frame.pack(fill=tk.X, pady=(0, 5))
@@ -207,6 +3415,14 @@ class MusicMetadataEditor(LogicMixin):
         self.lbl_status = ttk.Label(self.progress_frame, text="")
         self.lbl_status.pack(side=tk.LEFT)
 
+        # Cell edits are written in the background; this shows what is still pending
+        self.lbl_pending = ttk.Label(self.progress_frame, text="")
+        self.lbl_pending.pack(side=tk.RIGHT)
+        self.lbl_pending.bind('<Button-1>', lambda e: self.write_queue.retry_failed())
+        self.write_queue = WriteBehindQueue(self._write_edit)
+        self._write_status = None
+        self._poll_write_status()
+
         # Action Buttons Frame
         button_frame = ttk.Frame(main_frame)
         button_frame.pack(fill=tk.X)
@@ -219,34 +3435,65 @@ class MusicMetadataEditor(LogicMixin):
                                              command=self.remove_metadata_for_all)
         self.btn_remove_metadata.pack(side=tk.LEFT)
 
+        self.btn_transform = ttk.Button(button_frame, text="Transformar...", command=self.transform_metadata)
+        self.btn_transform.pack(side=tk.LEFT, padx=(10, 0))
+
+        self.btn_import_metadata = ttk.Button(button_frame, text="Importar Metadados",
+                                             command=self.import_metadata)
+        self.btn_import_metadata.pack(side=tk.RIGHT)
+
+        self.btn_export_metadata = ttk.Button(button_frame, text="Exportar Metadados",
+                                             command=self.export_metadata)
+        self.btn_export_metadata.pack(side=tk.RIGHT, padx=(0, 10))
+
+        self.btn_restore_snapshot = ttk.Button(button_frame, text="Restaurar Snapshot...",
+                                               command=self.restore_tag_snapshot)
+        self.btn_restore_snapshot.pack(side=tk.RIGHT, padx=(0, 10))
+
         # Music Player Frame (Bottom)
         self.dataset_player_ui(main_frame)
+
+        # Show the window before loading the theme, which takes a while to import
+        self.root.update_idletasks()
+        self.first_paint = time.perf_counter()
+        self.root.after_idle(self._apply_theme)
+
+    def _configure_styles(self):
+        # Styles are per theme, so these are set again once sv_ttk's theme is in use
+        style = ttk.Style()
+        style.configure("TButton", padding=6)
+        style.configure("TLabel", padding=6, font=("Helvetica", 10))
+        # Style for transparent buttons (Toolbutton usually provides flat look)
+        style.configure("Player.Toolbutton", padding=5)
+
+    def _apply_theme(self):
+        import sv_ttk
+        sv_ttk.set_theme("dark")
+        self._configure_styles()
+        if self.virtual_table is not None:
+            # Row height comes from the theme
+            self.virtual_table.schedule_refresh()
     
     def _load_icons(self):
-        # Load PNG icons using Pillow for scaling and stability
-        icon_size = (24, 24)
-        control_size = (32, 32)
+        # Pre-sized PNGs from the cache load without Pillow; it is only needed to rebuild them
         try:
-            self.icons['play'] = ImageTk.PhotoImage(Image.open(self.resource_path("icons/play_circle.png")).resize((48, 48), Image.Resampling.LANCZOS))
-            self.icons['pause'] = ImageTk.PhotoImage(Image.open(self.resource_path("icons/pause_circle.png")).resize((48, 48), Image.Resampling.LANCZOS))
-            self.icons['next'] = ImageTk.PhotoImage(Image.open(self.resource_path("icons/next.png")).resize(control_size, Image.Resampling.LANCZOS))
-            self.icons['prev'] = ImageTk.PhotoImage(Image.open(self.resource_path("icons/prev.png")).resize(control_size, Image.Resampling.LANCZOS))
-            self.icons['volume'] = ImageTk.PhotoImage(Image.open(self.resource_path("icons/volume.png")).resize((20, 20), Image.Resampling.LANCZOS))
-            
-            # Additional icons
-            shuffle_path = self.resource_path("icons/shuffle.png")
-            if os.path.exists(shuffle_path):
-                 self.icons['shuffle'] = ImageTk.PhotoImage(Image.open(shuffle_path).resize((24, 24), Image.Resampling.LANCZOS))
-            
-            repeat_path = self.resource_path("icons/repeat.png")
-            if os.path.exists(repeat_path):
-                 self.icons['repeat'] = ImageTk.PhotoImage(Image.open(repeat_path).resize((24, 24), Image.Resampling.LANCZOS))
-                 
+            for name, (filename, size, required) in PLAYER_ICONS.items():
+                source = self.resource_path(os.path.join("icons", filename))
+                if required or os.path.exists(source):
+                    self.icons[name] = tk.PhotoImage(file=cached_icon(source, size))
         except Exception as e:
             print(f"Error loading icons: {e}")
 
+    def _get_mixer(self):
+        # pygame and the audio device are only initialized on first playback
+        if self.mixer is None:
+            import pygame # pygame-ce
+            pygame.mixer.init()
+            pygame.mixer.music.set_volume(self.volume)
+            self.mixer = pygame.mixer
+        return self.mixer
+
     def dataset_player_ui(self, parent):
-        pygame.mixer.init()
         
         # Main Player Container
         player_frame = ttk.Frame(parent, padding=(20, 10))
@@ -260,10 +3507,6 @@ class MusicMetadataEditor(LogicMixin):
         controls_inner = ttk.Frame(controls_container)
         controls_inner.pack(side=tk.TOP, anchor=tk.CENTER)
         
-        # Style for transparent buttons (Toolbutton usually provides flat look)
-        style = ttk.Style()
-        style.configure("Player.Toolbutton", padding=5)
-        
         # Shuffle
         if 'shuffle' in self.icons:
              self.btn_shuffle = ttk.Button(controls_inner, image=self.icons['shuffle'], style="Player.Toolbutton", command=self.toggle_shuffle)
@@ -357,45 +3600,49 @@ class MusicMetadataEditor(LogicMixin):
             self.folder_path.set(folder_selected)
             self.load_songs_from_folder(folder_selected)
 
-    def read_metadata(self, file_path):
-        """Read metadata from an MP3 file and return as dictionary."""
-        metadata = {}
-        try:
-            try:
-                audio = MP3(file_path, ID3=EasyID3)
-            except ID3NoHeaderError:
-                # File has no ID3 tags
-                return metadata
-
-            # Read all available metadata fields
-            for field in self.metadata_fields:
-                try:
-                    value = audio.get(field)
-                    if value:
-                        # EasyID3 returns lists, join them with semicolons
-                        if isinstance(value, list):
-                            metadata[field] = '; '.join(str(v) for v in value)
-                        else:
-                            metadata[field] = str(value)
-                    else:
-                        metadata[field] = ''
-                except (KeyError, AttributeError):
-                    metadata[field] = ''
-        except Exception as e:
-            # Return empty metadata on error
-            pass
-        return metadata
+    def read_metadata(self, file_path):
+        """Read metadata from a music file and return as dictionary."""
+        return read_metadata_file(file_path, self.metadata_fields, self.fast_read)
+
+    def _reader_pool(self, threads=False):
+        """Build the tag reader pool from the current GUI settings.
+
+        threads=True forces a thread pool, for work that can't be pickled.
+        """
+        try:
+            workers = self.reader_workers.get()
+        except tk.TclError:
+            workers = DEFAULT_READER_WORKERS
+        mode = self.reader_mode.get()
+        if threads or mode not in TagReaderPool.MODES:
+            mode = 'thread'
+        return TagReaderPool(workers, mode)
 
     def load_songs_from_folder(self, path):
-        """Scan folder recursively and populate table with all MP3 files."""
+        """Scan folder recursively and populate table with all music files."""
         # Clear existing data
-        for item in self.tree.get_children():
-            self.tree.delete(item)
         self.file_data.clear()
+        self.search_index.clear()
+        self.sort_keys.clear()
+        self._last_filter = None
+        self.shown_file_paths = []
+        self._refresh_table()
+
+        # Rows from a previous, still-running load are discarded
+        self.ui_scheduler.clear()
+        self._load_generation += 1
+        generation = self._load_generation
+
+        # Watching from the start also catches changes made during a long load
+        self.loaded_folder = path
+        self.toggle_watch()
 
         # Disable buttons during loading
         self.btn_create_metadata.config(state='disabled')
         self.btn_remove_metadata.config(state='disabled')
+        self.btn_import_metadata.config(state='disabled')
+        self.btn_transform.config(state='disabled')
+        self.btn_restore_snapshot.config(state='disabled')
         
         # Reset progress
         self.lbl_status.config(text="Procurando arquivos...")
@@ -403,153 +3650,374 @@ class MusicMetadataEditor(LogicMixin):
         self.root.update_idletasks()
 
         def load_in_thread():
-            files_to_process = []
-            
-            # Walk through directory
-            for root, dirs, files in os.walk(path):
-                for file in files:
-                    if file.lower().endswith('.mp3'):
-                        files_to_process.append(os.path.join(root, file))
-            
-            total_files = len(files_to_process)
-            if total_files == 0:
-                self.root.after(0, lambda: self.lbl_status.config(text="Nenhum arquivo encontrado."))
-                self.root.after(0, lambda: self._populate_completed())
+            discovered = 0
+
+            def on_file(file_path, st):
+                nonlocal discovered
+                discovered += 1
+
+            results = read_library(path, self._reader_pool(), self.metadata_index,
+                                   self.metadata_fields, on_file, self.fast_read)
+
+            start = time.perf_counter()
+            last_flush = start
+            loaded = 0
+            parsed_count = 0
+            batch = []
+
+            def flush():
+                rate = loaded / max(time.perf_counter() - start, 1e-6)
+                progress_val = (loaded / discovered) * 100 if discovered else 0
+                msg = f"Encontradas {discovered} · Lidas {loaded} ({rate:.0f} arq/s)"
+                self._populate_table_bulk(batch, generation=generation, done=False)
+                self.ui_scheduler.call(lambda v=progress_val, m=msg: self._update_progress(v, m), key='progress')
+                batch.clear()
+
+            for file_path, metadata, reparsed in results:
+                if generation != self._load_generation:
+                    # A newer load started; stop feeding the table
+                    results.close()
+                    return
+                loaded += 1
+                batch.append((file_path, metadata))
+                if reparsed:
+                    parsed_count += 1
+                # Hand rows to the table a few times per second so the first ones show up quickly
+                now = time.perf_counter()
+                if now - last_flush >= 0.2:
+                    flush()
+                    last_flush = now
+            flush()
+            elapsed = time.perf_counter() - start
+
+            if loaded == 0:
+                self.ui_scheduler.call(lambda: self._populate_completed(" Nenhum arquivo encontrado."))
                 return
 
-            prepared_data = []
-            
-            for i, file_path in enumerate(files_to_process):
-                # Read metadata
-                metadata = self.read_metadata(file_path)
-                prepared_data.append((file_path, metadata))
-                
-                # Update progress periodically (every 10 files or last one)
-                if i % 10 == 0 or i == total_files - 1:
-                    progress_val = ((i + 1) / total_files) * 100
-                    msg = f"Carregando {i + 1} de {total_files} músicas"
-                    self.root.after(0, lambda v=progress_val, m=msg: self._update_progress(v, m))
-
-            # Update UI in main thread with all data
-            self.root.after(0, lambda: self._populate_table_bulk(prepared_data))
-
-        threading.Thread(target=load_in_thread, daemon=True).start()
+            status = ""
+            if parsed_count:
+                status = f" {parsed_count} lidas em {elapsed:.1f}s ({parsed_count / max(elapsed, 1e-6):.0f} arq/s)."
+
+            self._populate_table_bulk([], status, generation=generation)
+
+        threading.Thread(target=partial(_profiled, 'load', load_in_thread), daemon=True).start()
+
+    def toggle_watch(self):
+        """(Re)start or stop watching the loaded folder."""
+        if self.folder_watcher:
+            self.folder_watcher.stop()
+            self.folder_watcher = None
+        if self.watch_var.get() and self.loaded_folder:
+            generation = self._load_generation
+            self.folder_watcher = FolderWatcher(
+                self.loaded_folder, lambda changed, removed: self._on_folder_changes(changed, removed, generation))
+            self.folder_watcher.start()
+
+    def _on_folder_changes(self, changed, removed, generation):
+        """Watcher thread: re-read the changed files and queue one batch of table updates."""
+        if generation != self._load_generation:
+            return
+        if changed is None:
+            # Events were lost: reload, which only re-parses files changed on disk
+            self.ui_scheduler.call(lambda: self.load_songs_from_folder(self.loaded_folder))
+            return
+
+        with PROFILER.span('watch.refresh', changed=len(changed), removed=len(removed)):
+            paths = sorted(p for p in changed if os.path.isfile(p))
+            results = self._reader_pool().map(partial(read_metadata_file, fields=tuple(self.metadata_fields),
+                                                      fast=self.fast_read), paths)
+            self.metadata_index.update_many(zip(paths, results))
+            self.metadata_index.remove_many([p for p in removed if _is_music_file(p)])
+            if generation != self._load_generation:
+                return
+            if self.write_queue is not None:
+                # Our own cell edits that aren't written yet win over what was just read
+                edits = self.write_queue.unwritten(paths)
+                results = [dict(metadata, **edits[p]) if p in edits else metadata
+                           for p, metadata in zip(paths, results)]
+
+            if removed:
+                self.ui_scheduler.call(lambda: self._remove_table_rows(removed))
+            rows = list(zip(paths, results))
+            self.ui_scheduler.call(lambda: self._queue_refreshed_rows(rows))
+            message = f" Pasta atualizada: {len(paths)} alterada(s), {len(removed)} removida(s)."
+            self.ui_scheduler.call(lambda: self.lbl_status.config(
+                text=f"Total: {len(self.file_data)} músicas carregadas.{message}"))
+
+    def _queue_refreshed_rows(self, rows):
+        """Main thread: queue re-read (file_path, metadata) as updates of loaded files or new rows."""
+        for file_path, metadata in rows:
+            self.ui_scheduler.put_row(file_path, self._row_values(file_path, metadata),
+                                      insert=file_path not in self.file_data)
+
+    def _remove_table_rows(self, paths):
+        """Drop files (or every file below a removed folder) from the data and the table."""
+        gone = {p for p in paths if p in self.file_data}
+        prefixes = tuple(os.path.join(p, '') for p in paths if p not in self.file_data)
+        if prefixes:
+            gone.update(fp for fp in self.file_data if fp.startswith(prefixes))
+        if not gone:
+            return
+        if self.editing_path in gone:
+            self.on_edit_cancel()
+        for file_path in gone:
+            del self.file_data[file_path]
+            self.search_index.remove(file_path)
+            self.sort_keys.remove(file_path)
+        self.shown_file_paths = [p for p in self.shown_file_paths if p not in gone]
+        if self.virtual_table:
+            self.virtual_table.refresh()
+        else:
+            items = [p for p in gone if self.tree.exists(p)]
+            if items:
+                self.tree.delete(*items)
 
     def _update_progress(self, value, message):
         self.progress['value'] = value
         self.lbl_status.config(text=message)
 
-    def _populate_table_bulk(self, prepared_data):
-        """Populate table with pre-loaded data."""
-        self.shown_file_paths = []
+    def _populate_table_bulk(self, prepared_data, status="", generation=None, done=True):
+        """Queue pre-loaded rows for insertion; done=True finishes the load.
+
+        Safe to call from worker threads: rows are applied by the UI scheduler.
+        """
+        if generation is not None and generation != self._load_generation:
+            return
         for file_path, metadata in prepared_data:
-            filename = os.path.basename(file_path)
-            
+            self.ui_scheduler.put_row(file_path, self._row_values(file_path, metadata), insert=True)
+
+        if done:
+            def finish():
+                if generation is None or generation == self._load_generation:
+                    self._populate_completed(status)
+            self.ui_scheduler.call(finish)
+
+    def _apply_table_row(self, file_path, values, insert):
+        """Apply one scheduled row change on the main thread."""
+        if insert:
+            if file_path in self.file_data:
+                return
             # Store file data
-            self.file_data[file_path] = metadata
+            self.file_data[file_path] = dict(zip(self.metadata_fields, values[2:]))
+            self.search_index.set_row(file_path, self.file_data[file_path])
+            self.sort_keys.set_row(file_path, self.file_data[file_path])
+            if not self._row_matches_filter(file_path):
+                return
             self.shown_file_paths.append(file_path) # Add to displayed list
-            
-            # Prepare row values
-            values = [filename, file_path]
-            for field in self.metadata_fields:
-                values.append(metadata.get(field, ''))
-            
-            # Insert row (only if matching filter - though usually empty on load)
-            self.tree.insert('', 'end', iid=file_path, values=values)
-            
-        self._populate_completed()
-        
-        # If there's a filter/sort active, re-apply it?
-        # For now, just load as is.
+            if self.virtual_table:
+                self.virtual_table.schedule_refresh()
+            else:
+                self.tree.insert('', 'end', iid=file_path, values=values)
+            return
+
+        # Rows carry their data, so the store is only changed here on the main
+        # thread; keep the search keys in sync, a narrowed filter may no longer be valid
+        if file_path in self.file_data:
+            self.file_data[file_path] = dict(zip(self.metadata_fields, values[2:]))
+            self.search_index.set_row(file_path, self.file_data[file_path])
+            self.sort_keys.set_row(file_path, self.file_data[file_path])
+        self._last_filter = None
+        if self.virtual_table:
+            self.virtual_table.update_row(file_path, values)
+        elif self.tree.exists(file_path):
+            # Rows hidden by the filter are refreshed when it is re-applied
+            self.tree.item(file_path, values=values)
+
+    def _row_values(self, file_path, metadata=None):
+        """Table row values for a file: filename, path, then each metadata field."""
+        if metadata is None:
+            metadata = self.file_data.get(file_path, {})
+        values = [os.path.basename(file_path), file_path]
+        for field in self.metadata_fields:
+            values.append(metadata.get(field, ''))
+        return values
+
+    def _refresh_table(self):
+        """Redraw the table from shown_file_paths."""
+        if self.virtual_table:
+            self.virtual_table.refresh()
+            return
+        for item in self.tree.get_children():
+            self.tree.delete(item)
+        for file_path in self.shown_file_paths:
+            self.tree.insert('', 'end', iid=file_path, values=self._row_values(file_path))
+
+    def toggle_virtual_table(self):
+        """Switch between the regular and the virtualized table."""
+        if self.editing_item:
+            self.on_edit_cancel()
+        if self.virtual_table_var.get() and not self.virtual_table:
+            self.virtual_table = VirtualTable(self.tree, self.v_scrollbar,
+                                              lambda: self.shown_file_paths, self._row_values,
+                                              on_scroll=self.on_edit_commit)
+            self.virtual_table.attach()
+        elif not self.virtual_table_var.get() and self.virtual_table:
+            selected = self.virtual_table.selected_path
+            self.virtual_table.detach()
+            self.virtual_table = None
+            self._refresh_table()
+            if selected and self.tree.exists(selected):
+                self._select_path(selected)
+
+    def export_profile(self):
+        """Save the spans and counters collected since profiling was turned on."""
+        if not PROFILER.enabled:
+            messagebox.showinfo("Perfil", "Ative \"Perfil\" e repita a operação para coletar tempos.")
+            return
+        path = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("Relatório JSON", "*.json"), ("Chrome trace", "*.trace.json")])
+        if not path:
+            return
+        try:
+            PROFILER.export(path)
+        except OSError as e:
+            messagebox.showerror("Erro", f"Não foi possível salvar o perfil: {e}")
+
+    def _item_path(self, item):
+        """File path shown in a tree item (items are recycled in virtual mode)."""
+        if self.virtual_table:
+            return self.virtual_table.path_for(item)
+        return item
+
+    def _selected_path(self):
+        if self.virtual_table:
+            return self.virtual_table.selected_path
+        selected = self.tree.selection()
+        return selected[0] if selected else None
+
+    def _select_path(self, file_path):
+        if self.virtual_table:
+            self.virtual_table.see(file_path)
+        else:
+            self.tree.selection_set(file_path)
+            self.tree.see(file_path)
 
-    def _populate_completed(self):
+    def _populate_completed(self, status=""):
         """Restore UI state after population."""
-        self.lbl_status.config(text=f"Total: {len(self.file_data)} músicas carregadas.")
+        self.lbl_status.config(text=f"Total: {len(self.file_data)} músicas carregadas.{status}")
         self.progress['value'] = 100
         
         # Re-enable buttons
         self.btn_create_metadata.config(state='normal')
         self.btn_remove_metadata.config(state='normal')
+        self.btn_import_metadata.config(state='normal')
+        self.btn_transform.config(state='normal')
+        self.btn_restore_snapshot.config(state='normal')
         
     def _on_filter_change(self, *args):
-        """Filter the table rows based on input."""
-        filter_txt = self.filter_text.get().lower()
+        """Debounce filter input so typing doesn't re-filter on every keystroke."""
+        if self._filter_after_id:
+            self.root.after_cancel(self._filter_after_id)
+        self._filter_after_id = self.root.after(FILTER_DEBOUNCE_MS, self._apply_filter)
+
+    def _filter_query(self):
+        """Current (query, field) from the filter widgets; field None means all columns."""
         col_mode = self.filter_col_var.get()
-        
-        # Clear table
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-            
-        self.shown_file_paths = []
-        
-        for file_path, metadata in self.file_data.items():
-            match = False
-            filename = os.path.basename(file_path)
-            
-            if not filter_txt:
-                match = True
-            elif col_mode == "Todos":
-                # Search everywhere
-                if filter_txt in filename.lower():
-                    match = True
-                else:
-                    for v in metadata.values():
-                        if filter_txt in str(v).lower():
-                            match = True
-                            break
-            elif col_mode == "Nome do Arquivo":
-                if filter_txt in filename.lower():
-                    match = True
+        if col_mode == "Todos":
+            field = None
+        elif col_mode == "Nome do Arquivo":
+            field = 'filename'
+        else:
+            field = col_mode.lower() # Metadata keys are lower
+        return self.filter_text.get().lower(), field
+
+    def _filter_is_fuzzy(self):
+        return self.filter_mode_var.get() == "Aproximada"
+
+    def _row_matches_filter(self, file_path):
+        query, field = self._filter_query()
+        if not query:
+            return True
+        if self._filter_is_fuzzy():
+            return self.search_index.fuzzy_matches(file_path, query, field)
+        return self.search_index.matches(file_path, query, field)
+
+    def _apply_filter(self):
+        """Filter the table rows based on input."""
+        self._filter_after_id = None
+        query, field = self._filter_query()
+        fuzzy = self._filter_is_fuzzy()
+
+        with PROFILER.span('filter', fuzzy=fuzzy):
+            if fuzzy and query:
+                # Ranked by match quality, best first
+                paths = self.search_index.fuzzy_search(query, field)
             else:
-                # Specific column
-                col_key = col_mode.lower() # Metadata keys are lower
-                if col_key in metadata and filter_txt in str(metadata[col_key]).lower():
-                    match = True
-            
-            if match:
-                self.shown_file_paths.append(file_path)
-                values = [filename, file_path]
-                for field in self.metadata_fields:
-                    values.append(metadata.get(field, ''))
-                self.tree.insert('', 'end', iid=file_path, values=values)
+                # A query that extends the previous one can only narrow its result
+                candidates = None
+                last = self._last_filter
+                if last and last[0] and last[1] == field and not last[2] and last[0] in query:
+                    candidates = self.shown_file_paths
+
+                paths = self.search_index.search(query, field, candidates)
+                if candidates is None and self.sort_columns:
+                    self.sort_keys.sort(paths, self.sort_columns, self.file_data)
+            self._last_filter = (query, field, fuzzy)
+            self._show_paths(paths)
+
+    def _show_paths(self, paths):
+        """Make the table show exactly paths, touching only the rows that changed."""
+        old_paths = self.shown_file_paths
+        self.shown_file_paths = paths
+        if self.virtual_table:
+            self.virtual_table.refresh()
+            return
+
+        new_set = set(paths)
+        removed = [p for p in old_paths if p not in new_set]
+        if removed:
+            self.tree.delete(*removed)
+        kept = set(old_paths).difference(removed)
+        for index, file_path in enumerate(paths):
+            if file_path not in kept:
+                self.tree.insert('', index, iid=file_path, values=self._row_values(file_path))
 
-    def sort_column(self, col):
-        """Sort table by column."""
-        if self.sort_column_active == col:
-            self.sort_reverse = not self.sort_reverse
+        # Kept rows keep their old relative order; fix it up if that differs
+        if self.tree.get_children() != tuple(paths):
+            self.tree.set_children('', *paths)
+
+    def sort_column(self, col, add=False):
+        """Sort table by column; add=True makes it the next tie-breaker."""
+        columns = [c for c, _ in self.sort_columns]
+        if add and col in columns:
+            i = columns.index(col)
+            self.sort_columns[i] = (col, not self.sort_columns[i][1])
+        elif add:
+            self.sort_columns.append((col, False))
+        elif columns[:1] == [col] and len(columns) == 1:
+            self.sort_columns = [(col, not self.sort_columns[0][1])]
         else:
-            self.sort_reverse = False
-            self.sort_column_active = col
+            self.sort_columns = [(col, False)]
             
-        # Sort shown_file_paths based on data
-        def sort_key(file_path):
-            if col == 'filename':
-                return os.path.basename(file_path).lower()
-            elif col == 'path':
-                return file_path.lower()
+        with PROFILER.span('sort', columns=len(self.sort_columns)):
+            # Sort shown_file_paths based on data
+            self.sort_keys.sort(self.shown_file_paths, self.sort_columns, self.file_data)
+
+            # Reorder the existing rows
+            if self.virtual_table:
+                self.virtual_table.refresh()
             else:
-                return self.file_data[file_path].get(col, '').lower()
-        
-        self.shown_file_paths.sort(key=sort_key, reverse=self.sort_reverse)
-        
-        # Refresh table
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-            
-        for file_path in self.shown_file_paths:
-            filename = os.path.basename(file_path)
-            metadata = self.file_data[file_path]
-            values = [filename, file_path]
-            for field in self.metadata_fields:
-                values.append(metadata.get(field, ''))
-            self.tree.insert('', 'end', iid=file_path, values=values)
+                self.tree.set_children('', *self.shown_file_paths)
             
-        # Update header arrow (visual only - simplified)
-        heading_text = self.tree.heading(col, "text")
-        # Strip existing arrow
-        heading_text = heading_text.replace(" ▲", "").replace(" ▼", "")
-        arrow = " ▼" if self.sort_reverse else " ▲"
-        self.tree.heading(col, text=heading_text + arrow)
+        # Update header arrows
+        for column, text in self.heading_texts.items():
+            self.tree.heading(column, text=text)
+        for position, (column, reverse) in enumerate(self.sort_columns, 1):
+            arrow = " ▼" if reverse else " ▲"
+            if len(self.sort_columns) > 1:
+                arrow += str(position)
+            self.tree.heading(column, text=self.heading_texts[column] + arrow)
+
+    def _on_heading_shift_click(self, event):
+        if self.tree.identify_region(event.x, event.y) != 'heading':
+            return
+        column = self.tree.identify_column(event.x)
+        col_index = int(column.replace('#', '')) - 1
+        columns = ['filename', 'path'] + self.metadata_fields
+        if 0 <= col_index < len(columns):
+            self.sort_column(columns[col_index], add=True)
+        return "break"
 
     def _populate_table(self, file_paths):
         # Legacy
@@ -563,11 +4031,13 @@ class MusicMetadataEditor(LogicMixin):
         
         item = self.tree.identify_row(event.y)
         if not item: return
+        file_path = self._item_path(item)
+        if not file_path: return
         
         # If user double clicks the filename, start playing
         column = self.tree.identify_column(event.x)
         if column == '#1': # Filename column
-             self.play_song_from_id(item)
+             self.play_song_from_id(file_path)
              return
 
         # Editing logic...
@@ -583,6 +4053,7 @@ class MusicMetadataEditor(LogicMixin):
         bbox = self.tree.bbox(item, column)
         if not bbox: return
         self.editing_item = item
+        self.editing_path = file_path
         self.editing_column = col_name
         self.edit_entry = ttk.Entry(self.tree)
         self.edit_entry.insert(0, current_value)
@@ -601,8 +4072,9 @@ class MusicMetadataEditor(LogicMixin):
 
     def load_and_play(self, path):
         try:
-            pygame.mixer.music.load(path)
-            pygame.mixer.music.play()
+            mixer = self._get_mixer()
+            mixer.music.load(path)
+            mixer.music.play()
             self.is_playing = True
             self.current_song_path = path
             self.btn_play.config(image=self.icons.get('pause')) # Use icon
@@ -616,7 +4088,8 @@ class MusicMetadataEditor(LogicMixin):
             self.lbl_player_artist.config(text=artist)
             
             # Get length
-            audio = MP3(path)
+            import mutagen
+            audio = mutagen.File(path)
             self.song_length = audio.info.length
             self.seek_scale.configure(to=self.song_length)
             
@@ -630,19 +4103,19 @@ class MusicMetadataEditor(LogicMixin):
     def toggle_play(self):
         if not self.current_song_path:
             # Play first selected
-            selected = self.tree.selection()
+            selected = self._selected_path()
             if selected:
-                self.play_song_from_id(selected[0])
+                self.play_song_from_id(selected)
             elif self.shown_file_paths:
                 self.play_song_from_id(self.shown_file_paths[0])
             return
 
         if self.is_playing:
-            pygame.mixer.music.pause()
+            self.mixer.music.pause()
             self.is_playing = False
             self.btn_play.config(image=self.icons.get('play')) # Use icon
         else:
-            pygame.mixer.music.unpause()
+            self.mixer.music.unpause()
             self.is_playing = True
             self.btn_play.config(image=self.icons.get('pause')) # Use icon
 
@@ -653,8 +4126,7 @@ class MusicMetadataEditor(LogicMixin):
             curr_idx = self.shown_file_paths.index(self.current_song_path)
             next_idx = (curr_idx + 1) % len(self.shown_file_paths)
             self.load_and_play(self.shown_file_paths[next_idx])
-            self.tree.selection_set(self.shown_file_paths[next_idx])
-            self.tree.see(self.shown_file_paths[next_idx])
+            self._select_path(self.shown_file_paths[next_idx])
         except ValueError:
             pass
 
@@ -665,24 +4137,24 @@ class MusicMetadataEditor(LogicMixin):
             curr_idx = self.shown_file_paths.index(self.current_song_path)
             prev_idx = (curr_idx - 1) % len(self.shown_file_paths)
             self.load_and_play(self.shown_file_paths[prev_idx])
-            self.tree.selection_set(self.shown_file_paths[prev_idx])
-            self.tree.see(self.shown_file_paths[prev_idx])
+            self._select_path(self.shown_file_paths[prev_idx])
         except ValueError:
             pass
 
     def seek_song(self, value):
         if self.current_song_path:
-            pygame.mixer.music.set_pos(float(value))
+            self._get_mixer().music.set_pos(float(value))
 
     def set_volume(self, value):
-        vol = float(value) / 100
-        pygame.mixer.music.set_volume(vol)
+        self.volume = float(value) / 100
+        if self.mixer is not None:
+            self.mixer.music.set_volume(self.volume)
 
     def update_player_progress(self):
-        if self.is_playing and pygame.mixer.music.get_busy():
+        if self.is_playing and self.mixer.music.get_busy():
             # Get current position in seconds
             # get_pos returns ms
-            current_ms = pygame.mixer.music.get_pos()
+            current_ms = self.mixer.music.get_pos()
             if current_ms >= 0:
                 current_sec = current_ms / 1000.0
                 # If we have a stored start time (for seeking), we might need more logic
@@ -699,7 +4171,7 @@ class MusicMetadataEditor(LogicMixin):
             return
 
         new_value = self.edit_entry.get()
-        file_path = self.editing_item
+        file_path = self.editing_path
         column = self.editing_column
 
         # Update file data
@@ -707,19 +4179,15 @@ class MusicMetadataEditor(LogicMixin):
             self.file_data[file_path][column] = new_value
 
         # Update table
-        current_values = list(self.tree.item(self.editing_item, 'values'))
-        columns = ['filename', 'path'] + self.metadata_fields
-        col_index = columns.index(column)
-        if col_index < len(current_values):
-            current_values[col_index] = new_value
-            self.tree.item(self.editing_item, values=current_values)
+        self._apply_table_row(file_path, self._row_values(file_path), False)
 
-        # Save to file
-        self.save_metadata(file_path, self.file_data[file_path])
+        # Written in the background; edits of the same file are merged into one write
+        self.write_queue.put(file_path, {column: new_value})
 
         # Clean up
         self.edit_entry.destroy()
         self.editing_item = None
+        self.editing_path = None
         self.editing_column = None
         self.edit_entry = None
 
@@ -728,231 +4196,880 @@ class MusicMetadataEditor(LogicMixin):
         if self.edit_entry:
             self.edit_entry.destroy()
         self.editing_item = None
+        self.editing_path = None
         self.editing_column = None
         self.edit_entry = None
 
     def save_metadata(self, file_path, metadata_dict):
-        """Save metadata dictionary to MP3 file."""
+        """Save metadata dictionary to a music file."""
         try:
-            try:
-                audio = MP3(file_path, ID3=EasyID3)
-            except ID3NoHeaderError:
-                audio = MP3(file_path)
-                audio.add_tags()
-                audio = MP3(file_path, ID3=EasyID3)
-
-            # Update metadata fields
-            for field, value in metadata_dict.items():
-                if field in self.metadata_fields:
-                    if value and value.strip():
-                        audio[field] = value.strip()
-                    elif field in audio:
-                        del audio[field]
-
-            audio.save()
+            write_metadata_file(file_path, metadata_dict, self.metadata_fields, self.tag_padding)
+            self.metadata_index.update(file_path, {
+                field: (metadata_dict.get(field) or '').strip() for field in self.metadata_fields})
         except Exception as e:
             messagebox.showerror("Erro", f"Falha ao salvar metadados para {os.path.basename(file_path)}:\n{str(e)}")
 
+    def _write_edit(self, file_path, fields):
+        """Write-behind worker: save the merged cell edits of one file. Raises on failure."""
+        with PROFILER.span('tags.write_behind', fields=len(fields)):
+            write_metadata_file(file_path, fields, self.metadata_fields, self.tag_padding)
+        metadata = self.file_data.get(file_path)
+        if metadata is not None:
+            self.metadata_index.update(file_path, {
+                field: (metadata.get(field) or '').strip() for field in self.metadata_fields})
+
+    def _poll_write_status(self):
+        # Polled on the main thread: the writer thread never calls into Tk, so
+        # on_closing can block in write_queue.flush() without deadlocking
+        status = self.write_queue.counts()
+        if status != self._write_status:
+            self._write_status = status
+            pending, failed = status
+            if failed:
+                text = f"{failed} gravação(ões) falharam — clique para tentar de novo"
+            elif pending:
+                text = f"Gravando {pending} arquivo(s)..."
+            else:
+                text = ""
+            self.lbl_pending.config(text=text)
+        self.root.after(WRITE_STATUS_POLL_MS, self._poll_write_status)
+
     def create_metadata_for_all(self):
-        """Apply filename parsing to all rows in the table."""
+        """Apply filename parsing to all rows in the table, after a preview of the changes."""
         if not self.file_data:
             messagebox.showinfo("Info", "Nenhum arquivo carregado.")
             return
 
         # Disable buttons during processing
+        self._set_busy("Comparando com os metadados atuais...")
+        file_data = self.file_data.snapshot()
+
+        def plan_in_thread():
+            with PROFILER.span('plan', files=len(file_data)):
+                changes, unchanged, unparsed, report = self.plan_filename_changes(file_data)
+            self.ui_scheduler.call(lambda: self._confirm_changes(changes, unchanged, len(unparsed),
+                                                                 folder_report=report))
+
+        threading.Thread(target=plan_in_thread, daemon=True).start()
+
+    def export_metadata(self):
+        """Write path, filename and every field of the loaded files to a CSV or JSON lines file."""
+        if not self.file_data:
+            messagebox.showinfo("Info", "Nenhum arquivo carregado.")
+            return
+        path = filedialog.asksaveasfilename(
+            defaultextension=".csv", filetypes=[("CSV", "*.csv"), ("JSON lines", "*.jsonl")])
+        if not path:
+            return
+        file_data = self.file_data.snapshot()
+        self.lbl_status.config(text="Exportando metadados...")
+
+        def export_in_thread():
+            try:
+                with PROFILER.span('export', files=len(file_data)):
+                    with open(path, 'w', encoding='utf-8', newline='') as f:
+                        count = write_metadata_rows(f, file_data.items(), self.metadata_fields, export_format(path))
+            except OSError as e:
+                self.ui_scheduler.call(lambda: messagebox.showerror("Erro", f"Não foi possível exportar: {e}"))
+                return
+            self.ui_scheduler.call(lambda: self._populate_completed(f" {count} linha(s) exportadas."))
+
+        threading.Thread(target=export_in_thread, daemon=True).start()
+
+    def import_metadata(self):
+        """Apply a CSV/JSON lines file of edits to the loaded files, after a preview of the changes."""
+        if not self.file_data:
+            messagebox.showinfo("Info", "Nenhum arquivo carregado.")
+            return
+        path = filedialog.askopenfilename(
+            filetypes=[("CSV ou JSON lines", "*.csv *.jsonl *.json"), ("Todos os arquivos", "*.*")])
+        if not path:
+            return
+        self._set_busy("Comparando com os metadados atuais...")
+        file_data = self.file_data.snapshot()
+
+        def plan_in_thread():
+            edits = {}
+            skipped = 0
+            try:
+                with PROFILER.span('import.read'):
+                    with open(path, encoding='utf-8-sig', newline='') as f:
+                        for _, file_path, row_edits, error in read_metadata_rows(f, export_format(path),
+                                                                                 self.metadata_fields):
+                            # Only files shown in the table are imported
+                            if error is not None or file_path not in file_data:
+                                skipped += 1
+                            else:
+                                edits.setdefault(file_path, {}).update(row_edits)
+            except (OSError, UnicodeDecodeError, csv.Error) as e:
+                self.ui_scheduler.call(lambda: self._populate_completed())
+                self.ui_scheduler.call(lambda: messagebox.showerror("Erro", f"Não foi possível ler {path}: {e}"))
+                return
+            changes = []
+            for file_path, row_edits in edits.items():
+                current = dict(file_data[file_path])
+                changed = diff_metadata(current, row_edits)
+                if changed:
+                    changes.append((file_path, current, changed))
+            unchanged = len(edits) - len(changes)
+            self.ui_scheduler.call(lambda: self._confirm_changes(
+                changes, unchanged, skipped, title="Importar Metadados",
+                skipped_label="linha(s) ignoradas (inválidas ou de arquivos não carregados)"))
+
+        threading.Thread(target=plan_in_thread, daemon=True).start()
+
+    def transform_metadata(self):
+        """Edit ordered transform rules and preview them over all or only the filtered rows."""
+        if not self.file_data:
+            messagebox.showinfo("Info", "Nenhum arquivo carregado.")
+            return
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Transformar Metadados")
+        dialog.geometry("800x450")
+        dialog.transient(self.root)
+
+        # New rule: operation, field and its two text parameters
+        editor = ttk.Frame(dialog)
+        editor.pack(fill=tk.X, padx=10, pady=10)
+        op_var = tk.StringVar(value=next(iter(TRANSFORM_CHOICES)))
+        field_var = tk.StringVar(value="Todos")
+        find_var = tk.StringVar()
+        replace_var = tk.StringVar()
+        ignore_case_var = tk.BooleanVar(value=False)
+        ttk.Combobox(editor, textvariable=op_var, values=list(TRANSFORM_CHOICES), state="readonly",
+                     width=18).pack(side=tk.LEFT)
+        ttk.Combobox(editor, textvariable=field_var, values=["Todos"] + self.metadata_fields, state="readonly",
+                     width=12).pack(side=tk.LEFT, padx=(5, 0))
+        ttk.Label(editor, text="De:").pack(side=tk.LEFT, padx=(10, 2))
+        ttk.Entry(editor, textvariable=find_var, width=18).pack(side=tk.LEFT)
+        ttk.Label(editor, text="Para:").pack(side=tk.LEFT, padx=(10, 2))
+        ttk.Entry(editor, textvariable=replace_var, width=18).pack(side=tk.LEFT)
+        ttk.Checkbutton(editor, text="Ignorar maiúsc./minúsc.", variable=ignore_case_var).pack(side=tk.LEFT, padx=(10, 0))
+
+        rules_list = tk.Listbox(dialog, height=8)
+        rules_list.pack(fill=tk.BOTH, expand=True, padx=10)
+        for rule in self.transform_rules:
+            rules_list.insert(tk.END, describe_transform_rule(rule))
+
+        def add_rule():
+            rule = dict(TRANSFORM_CHOICES[op_var.get()])
+            if field_var.get() != "Todos":
+                rule['fields'] = [field_var.get()]
+            if rule['op'] == 'replace':
+                rule.update(find=find_var.get(), replace=replace_var.get())
+            elif rule['op'] == 'regex':
+                rule.update(pattern=find_var.get(), replace=replace_var.get())
+            elif rule['op'] == 'split_join':
+                rule.update(split=find_var.get() or '; ', join=replace_var.get() or '; ')
+            if ignore_case_var.get():
+                rule['ignore_case'] = True
+            try:
+                compile_transform_rule(rule)
+            except (ValueError, re.error) as e:
+                messagebox.showerror("Regra inválida", str(e), parent=dialog)
+                return
+            self.transform_rules.append(rule)
+            rules_list.insert(tk.END, describe_transform_rule(rule))
+
+        def remove_rule():
+            for index in reversed(rules_list.curselection()):
+                rules_list.delete(index)
+                del self.transform_rules[index]
+
+        def load_rules():
+            path = filedialog.askopenfilename(parent=dialog, filetypes=[("JSON", "*.json")])
+            if not path:
+                return
+            try:
+                self.transform_rules = Transform.load(path, self.metadata_fields).rules
+            except (OSError, ValueError, re.error) as e:
+                messagebox.showerror("Erro", f"Não foi possível carregar as regras: {e}", parent=dialog)
+                return
+            rules_list.delete(0, tk.END)
+            for rule in self.transform_rules:
+                rules_list.insert(tk.END, describe_transform_rule(rule))
+
+        def save_rules():
+            path = filedialog.asksaveasfilename(parent=dialog, defaultextension=".json", filetypes=[("JSON", "*.json")])
+            if not path:
+                return
+            try:
+                with open(path, 'w', encoding='utf-8') as f:
+                    json.dump({'rules': self.transform_rules}, f, ensure_ascii=False, indent=1)
+            except OSError as e:
+                messagebox.showerror("Erro", f"Não foi possível salvar as regras: {e}", parent=dialog)
+
+        ttk.Button(editor, text="Adicionar", command=add_rule).pack(side=tk.RIGHT)
+        rule_buttons = ttk.Frame(dialog)
+        rule_buttons.pack(fill=tk.X, padx=10, pady=(5, 0))
+        ttk.Button(rule_buttons, text="Remover", command=remove_rule).pack(side=tk.LEFT)
+        ttk.Button(rule_buttons, text="Carregar...", command=load_rules).pack(side=tk.LEFT, padx=(10, 0))
+        ttk.Button(rule_buttons, text="Salvar...", command=save_rules).pack(side=tk.LEFT, padx=(10, 0))
+
+        scope_var = tk.StringVar(value="all")
+        scope = ttk.Frame(dialog)
+        scope.pack(fill=tk.X, padx=10, pady=(10, 0))
+        ttk.Radiobutton(scope, text=f"Todas as linhas ({len(self.file_data)})", value="all",
+                        variable=scope_var).pack(side=tk.LEFT)
+        ttk.Radiobutton(scope, text=f"Só as linhas filtradas ({len(self.shown_file_paths)})", value="shown",
+                        variable=scope_var).pack(side=tk.LEFT, padx=(10, 0))
+
+        def preview():
+            if not self.transform_rules:
+                messagebox.showinfo("Info", "Adicione ao menos uma regra.", parent=dialog)
+                return
+            transform = Transform(self.transform_rules, self.metadata_fields)
+            file_paths = list(self.shown_file_paths) if scope_var.get() == "shown" else None
+            dialog.destroy()
+            self._preview_transform(transform, file_paths)
+
+        buttons = ttk.Frame(dialog)
+        buttons.pack(fill=tk.X, padx=10, pady=10)
+        ttk.Button(buttons, text="Pré-visualizar", command=preview).pack(side=tk.RIGHT)
+        ttk.Button(buttons, text="Fechar", command=dialog.destroy).pack(side=tk.RIGHT, padx=(0, 10))
+
+    def _preview_transform(self, transform, file_paths=None):
+        """Plan transform over a snapshot of the store, then show the usual change preview."""
+        self._set_busy("Aplicando regras em memória...")
+        file_data = self.file_data.snapshot()
+
+        def plan_in_thread():
+            with PROFILER.span('plan', files=len(file_data)):
+                changes, unchanged = transform.plan(file_data, file_paths)
+            outside = 0 if file_paths is None else len(file_data) - len(file_paths)
+            self.ui_scheduler.call(lambda: self._confirm_changes(
+                changes, unchanged, outside, title="Transformar Metadados",
+                skipped_label="fora das linhas filtradas"))
+
+        threading.Thread(target=plan_in_thread, daemon=True).start()
+
+    def _set_busy(self, message):
         self.btn_create_metadata.config(state='disabled')
         self.btn_remove_metadata.config(state='disabled')
+        self.btn_import_metadata.config(state='disabled')
+        self.btn_transform.config(state='disabled')
+        self.btn_restore_snapshot.config(state='disabled')
         
         # Reset progress
-        self.lbl_status.config(text="Processando metadados...")
+        self.lbl_status.config(text=message)
         self.progress['value'] = 0
         self.root.update_idletasks()
 
+    def _confirm_changes(self, changes, unchanged, unparsed_count, title="Pré-visualização", folder_report=None,
+                         skipped_label="com formato não reconhecido"):
+        """Show only the files that would change and apply them on confirmation."""
+        summary = (f"{len(changes)} arquivo(s) serão alterados, {unchanged} já estão corretos, "
+                   f"{unparsed_count} {skipped_label}.")
+        if folder_report:
+            misfits = sum(r[3] for r in folder_report)
+            summary += f"\n{len(folder_report)} pasta(s); {misfits} arquivo(s) fora do padrão da pasta."
+        if not changes:
+            self._populate_completed()
+            messagebox.showinfo("Concluído", f"Nenhuma alteração necessária.\n{summary}")
+            return
+
+        dialog = tk.Toplevel(self.root)
+        dialog.title(title)
+        dialog.geometry("1000x500")
+        dialog.transient(self.root)
+
+        ttk.Label(dialog, text=summary).pack(fill=tk.X, padx=10, pady=(10, 5))
+
+        if folder_report:
+            # Rule chosen for each folder, folders with files outside it first
+            rules_view = ttk.Treeview(dialog, columns=['folder', 'rule', 'files', 'misfits'],
+                                      show='headings', height=min(5, len(folder_report)))
+            for col, text, width in [('folder', 'Pasta', 500), ('rule', 'Padrão', 200),
+                                     ('files', 'Arquivos', 100), ('misfits', 'Fora do padrão', 120)]:
+                rules_view.heading(col, text=text)
+                rules_view.column(col, width=width)
+            for folder, rule, files, misfits in sorted(folder_report, key=lambda r: -r[3])[:PREVIEW_LIMIT]:
+                rules_view.insert('', 'end', values=[folder, rule or "(nenhum)", files, misfits])
+            rules_view.pack(fill=tk.X, padx=10, pady=(0, 5))
+
+        frame = ttk.Frame(dialog)
+        frame.pack(fill=tk.BOTH, expand=True, padx=10)
+        preview = ttk.Treeview(frame, columns=['file', 'field', 'old', 'new'], show='headings')
+        for col, text, width in [('file', 'Arquivo', 300), ('field', 'Campo', 100),
+                                 ('old', 'Atual', 250), ('new', 'Novo', 250)]:
+            preview.heading(col, text=text)
+            preview.column(col, width=width)
+        scrollbar = ttk.Scrollbar(frame, orient='vertical', command=preview.yview)
+        preview.configure(yscrollcommand=scrollbar.set)
+        preview.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.LEFT, fill=tk.Y)
+
+        # The preview is capped; the full list can be huge on large libraries
+        for file_path, current, changed in changes[:PREVIEW_LIMIT]:
+            for field, value in changed.items():
+                preview.insert('', 'end', values=[os.path.basename(file_path), field,
+                                                  current.get(field, ''), value])
+        if len(changes) > PREVIEW_LIMIT:
+            ttk.Label(dialog, text=f"Mostrando {PREVIEW_LIMIT} de {len(changes)} arquivos.").pack(padx=10, anchor='w')
+
+        def cancel():
+            dialog.destroy()
+            self._populate_completed()
+
+        def confirm():
+            dialog.destroy()
+            self._apply_changes(changes)
+
+        buttons = ttk.Frame(dialog)
+        buttons.pack(fill=tk.X, padx=10, pady=10)
+        ttk.Button(buttons, text="Aplicar", command=confirm).pack(side=tk.RIGHT)
+        ttk.Button(buttons, text="Cancelar", command=cancel).pack(side=tk.RIGHT, padx=(0, 10))
+        dialog.protocol("WM_DELETE_WINDOW", cancel)
+        dialog.grab_set()
+
+    def _apply_changes(self, changes):
+        """Write the changed fields of a batch on the writer pool."""
+        self._set_busy("Gravando metadados...")
+        total_files = len(changes)
+
         def process_in_thread():
+            def on_progress(done):
+                # Update progress periodically
+                if done % 5 == 0 or done == total_files:
+                    msg = f"Gravando {done} de {total_files}..."
+                    self.ui_scheduler.call(lambda v=done / total_files * 100, m=msg: self._update_progress(v, m),
+                                           key='progress')
+
+            snapshot = self._open_snapshot('write')
+            if snapshot is None:
+                return
+            with PROFILER.span('write', files=total_files), snapshot:
+                results = apply_metadata_changes(changes, self._reader_pool(), self.metadata_index,
+                                                 on_progress, self.tag_padding, snapshot)
             updated_count = 0
-            error_count = 0
-            file_list = list(self.file_data.keys())
-            total_files = len(file_list)
-
-            for i, file_path in enumerate(file_list):
-                filename = os.path.basename(file_path)
-                parsed = self.parse_filename(filename)
-
-                if parsed:
-                    # Update metadata dict
-                    metadata = self.file_data[file_path].copy()
-
-                    if parsed.get('title'):
-                        metadata['title'] = parsed['title']
-                    if parsed.get('artist'):
-                        metadata['artist'] = parsed['artist']
-                    if parsed.get('track'):
-                        metadata['tracknumber'] = parsed['track']
-
-                    # Set album from folder name
-                    folder_name = os.path.basename(os.path.dirname(file_path))
-                    metadata['album'] = folder_name
-
-                    # Save to file
-                    try:
-                        self.save_metadata(file_path, metadata)
-                        self.file_data[file_path] = metadata
-                        updated_count += 1
-                    except Exception:
-                        error_count += 1
+            errors = []
+            for (file_path, current, changed), (_, error, _) in zip(changes, results):
+                if error is not None:
+                    errors.append(f"{os.path.basename(file_path)}: {error}")
+                    continue
+                updated_count += 1
 
-                    # Update table in main thread
-                    self.root.after(0, lambda fp=file_path, md=metadata: self._update_table_row(fp, md))
-                else:
-                    error_count += 1
-                
-                # Update progress periodically
-                if i % 5 == 0 or i == total_files - 1:
-                    progress_val = ((i + 1) / total_files) * 100
-                    msg = f"Processando {i + 1} de {total_files}..."
-                    self.root.after(0, lambda v=progress_val, m=msg: self._update_progress(v, m))
+                # Update table and data in main thread
+                self._update_table_row(file_path, dict(current, **changed))
 
             # Show completion message
-            self.root.after(0, lambda: self._populate_completed())
-            self.root.after(0, lambda: messagebox.showinfo("Concluído",
-                f"Metadados criados para {updated_count} arquivo(s).\n{error_count} arquivo(s) com formato não reconhecido."))
+            message = (f"Metadados atualizados em {updated_count} arquivo(s).\n{len(errors)} erro(s).\n"
+                       f"{write_summary(results)}\nSnapshot: {snapshot.path}")
+            if errors:
+                message += "\n\n" + "\n".join(errors[:10])
+            self.ui_scheduler.call(lambda: self._populate_completed())
+            self.ui_scheduler.call(lambda: messagebox.showinfo("Concluído", message))
 
         threading.Thread(target=process_in_thread, daemon=True).start()
 
     def _update_table_row(self, file_path, metadata):
-        """Update a single row in the table."""
+        """Queue an update of a single row in the table."""
         filename = os.path.basename(file_path)
         values = [filename, file_path]
         for field in self.metadata_fields:
             values.append(metadata.get(field, ''))
-        self.tree.item(file_path, values=values)
+        self.ui_scheduler.put_row(file_path, values)
 
     def remove_metadata_for_all(self):
-        """Remove all metadata from all files."""
+        """Remove all metadata, or only the chosen frame groups, from all files."""
         if not self.file_data:
             messagebox.showinfo("Info", "Nenhum arquivo carregado.")
             return
 
-        # Confirm action
-        result = messagebox.askyesno("Confirmar",
-            f"Tem certeza que deseja remover TODOS os metadados de {len(self.file_data)} arquivo(s)?\n\nEsta ação não pode ser desfeita!")
-        if not result:
-            return
+        # Confirm action, choosing between a full and a partial strip
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Remover metadados")
+        dialog.transient(self.root)
+        ttk.Label(dialog, text=f"Remover metadados de {len(self.file_data)} arquivo(s)?").pack(
+            anchor='w', padx=10, pady=(10, 5))
+        everything = tk.BooleanVar(value=True)
+        groups = {name: tk.BooleanVar(value=False) for name in STRIP_GROUPS}
+        group_buttons = []
 
-        # Disable buttons during processing
-        self.btn_create_metadata.config(state='disabled')
-        self.btn_remove_metadata.config(state='disabled')
-        
-        # Reset progress
-        self.lbl_status.config(text="Removendo metadados...")
-        self.progress['value'] = 0
-        self.root.update_idletasks()
+        def toggle_groups():
+            state = 'disabled' if everything.get() else 'normal'
+            for button in group_buttons:
+                button.config(state=state)
 
-        def process_in_thread():
-            success_count = 0
-            error_count = 0
-            file_list = list(self.file_data.keys())
-            total_files = len(file_list)
+        ttk.Radiobutton(dialog, text="Todos os metadados", variable=everything, value=True,
+                        command=toggle_groups).pack(anchor='w', padx=10)
+        ttk.Radiobutton(dialog, text="Apenas:", variable=everything, value=False,
+                        command=toggle_groups).pack(anchor='w', padx=10)
+        for name, label in STRIP_GROUPS.items():
+            button = ttk.Checkbutton(dialog, text=label, variable=groups[name], state='disabled')
+            button.pack(anchor='w', padx=30)
+            group_buttons.append(button)
+        ttk.Label(dialog, text="As tags atuais são salvas antes em um snapshot (\"Restaurar Snapshot...\").").pack(
+            anchor='w', padx=10, pady=(5, 0))
 
-            for i, file_path in enumerate(file_list):
-                try:
-                    # Load with ID3 (not EasyID3) to delete all tags
-                    try:
-                        audio = MP3(file_path, ID3=ID3)
-                    except ID3NoHeaderError:
-                        # No tags to remove
-                        success_count += 1
-                        self.root.after(0, lambda fp=file_path: self._clear_table_row(fp))
-                        continue
+        def confirm():
+            frames = None if everything.get() else [name for name, var in groups.items() if var.get()]
+            if frames == []:
+                return
+            dialog.destroy()
+            self._strip_files(frames)
 
-                    # Delete all tags
-                    audio.delete()
-                    audio.save()
+        buttons = ttk.Frame(dialog)
+        buttons.pack(fill=tk.X, padx=10, pady=10)
+        ttk.Button(buttons, text="Remover", command=confirm).pack(side=tk.RIGHT)
+        ttk.Button(buttons, text="Cancelar", command=dialog.destroy).pack(side=tk.RIGHT, padx=(0, 10))
+        dialog.grab_set()
 
-                    # Clear metadata dict
-                    self.file_data[file_path] = {field: '' for field in self.metadata_fields}
-                    success_count += 1
+    def _strip_files(self, frames=None):
+        """Strip every loaded file on the reader pool; frames=None removes all tags."""
+        self._set_busy("Removendo metadados...")
+        file_data = self.file_data.snapshot()
+        file_list = list(file_data.keys())
+        total_files = len(file_list)
 
-                    # Update table in main thread
-                    self.root.after(0, lambda fp=file_path: self._clear_table_row(fp))
-                except Exception as e:
-                    error_count += 1
-                
-                # Update progress
-                if i % 10 == 0 or i == total_files - 1:
-                    progress_val = ((i + 1) / total_files) * 100
-                    msg = f"Removendo {i + 1} de {total_files}..."
-                    self.root.after(0, lambda v=progress_val, m=msg: self._update_progress(v, m))
+        def process_in_thread():
+            def on_progress(done):
+                if done % 10 == 0 or done == total_files:
+                    msg = f"Removendo {done} de {total_files}..."
+                    self.ui_scheduler.call(lambda v=done / total_files * 100, m=msg: self._update_progress(v, m),
+                                           key='progress')
+
+            start = time.perf_counter()
+            snapshot = self._open_snapshot('strip')
+            if snapshot is None:
+                return
+            with snapshot:
+                results = snapshot.map(self._reader_pool(), partial(_strip_file, frames=frames, padding=self.tag_padding),
+                                       file_list, progress=on_progress)
+            elapsed = time.perf_counter() - start
+            done = [file_path for file_path, error, _ in results if error is None]
+            if frames is None:
+                empty = {field: '' for field in self.metadata_fields}
+                self.metadata_index.update_many([(file_path, empty) for file_path in done])
+                for file_path in done:
+                    self._clear_table_row(file_path)
+            else:
+                # Partial strips keep the fields, but size/mtime still changed
+                self.metadata_index.update_many([(file_path, dict(file_data[file_path])) for file_path in done])
+            error_count = total_files - len(done)
 
             # Show completion message
-            self.root.after(0, lambda: self._populate_completed())
-            self.root.after(0, lambda: messagebox.showinfo("Concluído",
-                f"Metadados removidos de {success_count} arquivo(s).\n{error_count} erro(s)."))
+            message = f"{strip_summary(results, elapsed)}\n{error_count} erro(s).\nSnapshot: {snapshot.path}"
+            self.ui_scheduler.call(lambda: self._populate_completed())
+            self.ui_scheduler.call(lambda: messagebox.showinfo("Concluído", message))
 
-        threading.Thread(target=process_in_thread, daemon=True).start()
+        threading.Thread(target=partial(_profiled, 'strip', process_in_thread), daemon=True).start()
+
+    def _open_snapshot(self, label):
+        """Start the tag snapshot of a bulk operation (worker thread); None, after telling the user, on failure."""
+        try:
+            return TagSnapshot(new_snapshot_path(label))
+        except OSError as e:
+            self.ui_scheduler.call(lambda: self._populate_completed())
+            self.ui_scheduler.call(lambda: messagebox.showerror(
+                "Erro", f"Não foi possível criar o snapshot das tags; nada foi alterado.\n{e}"))
+            return None
+
+    def restore_tag_snapshot(self):
+        """Put back the tags saved before a bulk operation, rewriting only the files that differ."""
+        path = filedialog.askopenfilename(initialdir=snapshot_dir(),
+                                          filetypes=[("Snapshot de tags", "*.snap"), ("Todos os arquivos", "*.*")])
+        if not path:
+            return
+        self._set_busy("Restaurando tags...")
+        loaded = set(self.file_data.keys())
+
+        def restore_in_thread():
+            restored = []
+            unchanged = 0
+            errors = []
+            try:
+                for file_path, error, changed in restore_snapshot(path, self._reader_pool(), self.tag_padding):
+                    if error is not None:
+                        errors.append(f"{os.path.basename(file_path)}: {error}")
+                    elif changed:
+                        restored.append(file_path)
+                    else:
+                        unchanged += 1
+                    done = len(restored) + unchanged + len(errors)
+                    if done % 50 == 0:
+                        msg = f"Restaurando tags... {done} arquivo(s)"
+                        self.ui_scheduler.call(lambda m=msg: self.lbl_status.config(text=m), key='progress')
+            except (OSError, ValueError, EOFError) as e:
+                self.ui_scheduler.call(lambda: self._populate_completed())
+                self.ui_scheduler.call(lambda: messagebox.showerror("Erro", f"Não foi possível ler {path}: {e}"))
+                return
+            # Refresh the loaded rows that were rewritten
+            reloaded = []
+            for file_path in restored:
+                if file_path in loaded:
+                    try:
+                        metadata = self.read_metadata(file_path)
+                    except Exception:
+                        continue
+                    self._update_table_row(file_path, metadata)
+                    reloaded.append((file_path, metadata))
+            self.metadata_index.update_many(reloaded)
+
+            message = (f"{len(restored)} arquivo(s) restaurados, {unchanged} já iguais ao snapshot.\n"
+                       f"{len(errors)} erro(s).")
+            if errors:
+                message += "\n\n" + "\n".join(errors[:10])
+            self.ui_scheduler.call(lambda: self._populate_completed())
+            self.ui_scheduler.call(lambda: messagebox.showinfo("Concluído", message))
+
+        threading.Thread(target=partial(_profiled, 'restore', restore_in_thread), daemon=True).start()
 
     def _clear_table_row(self, file_path):
-        """Clear metadata columns for a row in the table."""
+        """Queue clearing the metadata columns for a row in the table."""
         filename = os.path.basename(file_path)
         values = [filename, file_path] + [''] * len(self.metadata_fields)
-        self.tree.item(file_path, values=values)
+        self.ui_scheduler.put_row(file_path, values)
 
 class CLIEditor(LogicMixin):
+    def __init__(self, workers=DEFAULT_READER_WORKERS, mode='thread', fast_read=True,
+                 tag_padding=DEFAULT_TAG_PADDING, filename_rules=None, use_index=True, out=None,
+                 index_path=None, snapshot=True):
+        self.pool = TagReaderPool(workers, mode)
+        self.fast_read = fast_read
+        self.tag_padding = tag_padding
+        if filename_rules is not None:
+            self.filename_rules = filename_rules
+        self.use_index = use_index
+        self.index_path = index_path  # None: the index in the user cache dir
+        self.snapshot = snapshot  # True: automatic, in the user cache dir; a path; or False
+        self.out = out or sys.stdout
+
     def log(self, msg):
         print(msg)
 
+    def emit(self, record):
+        """Write one JSON line to the output stream."""
+        self.out.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def _summary(self, command, start, **counts):
+        counts = dict(counts, elapsed_s=round(time.perf_counter() - start, 3), workers=self.pool.workers)
+        self.emit(dict(type="summary", command=command, **counts))
+        self.out.flush()
+
+    def _open_snapshot(self, label, dry_run):
+        """The TagSnapshot to save tags to before a bulk write, or None when disabled or dry-running."""
+        if dry_run or not self.snapshot:
+            return None
+        return TagSnapshot(new_snapshot_path(label) if self.snapshot is True else self.snapshot)
+
+    def _music_files(self, paths):
+        """Absolute music file paths under the given folders and files, in walk order."""
+        for path in paths:
+            if os.path.isdir(path):
+                yield from scan_music_files(os.path.abspath(path))
+            elif os.path.isfile(path) and backend_for(path) is not None:
+                yield os.path.abspath(path)
+
+    def _read_paths(self, paths):
+        """Yield (file_path, metadata, cached) for every music file under paths.
+
+        Folders go through the metadata index (a throwaway one without
+        use_index); single files are read directly.
+        """
+        metadata_index = MetadataIndex(self.index_path if self.use_index else ':memory:')
+        try:
+            for path in paths:
+                if os.path.isdir(path):
+                    for file_path, metadata, reparsed in read_library(path, self.pool, metadata_index,
+                                                                      METADATA_FIELDS, fast=self.fast_read):
+                        yield file_path, metadata, not reparsed
+                elif os.path.isfile(path) and backend_for(path) is not None:
+                    yield os.path.abspath(path), read_metadata_file(path, fast=self.fast_read), False
+        finally:
+            metadata_index.close()
+
+    def scan_command(self, paths):
+        """Read the tags of every file (refreshing the index) and report which are tagged."""
+        start = time.perf_counter()
+        files = cached_count = untagged = 0
+        for file_path, metadata, cached in self._read_paths(paths):
+            tagged = any(metadata.values())
+            self.emit({"type": "file", "path": file_path, "tagged": tagged, "cached": cached})
+            files += 1
+            cached_count += cached
+            untagged += not tagged
+        self._summary("scan", start, files=files, cached=cached_count, untagged=untagged)
+        return 0
+
+    def apply_command(self, paths, dry_run=False):
+        """Tag files from their names (one rule per folder), writing only real changes."""
+        start = time.perf_counter()
+        file_data = MetadataStore()
+        for file_path, metadata, _ in self._read_paths(paths):
+            file_data[file_path] = metadata
+        changes, unchanged, unparsed, report = self.plan_filename_changes(file_data)
+        for folder, rule, files, misfits in report:
+            self.emit({"type": "folder", "path": folder, "rule": rule, "files": files, "misfits": misfits})
+        for file_path in unparsed:
+            self.emit({"type": "file", "path": file_path, "status": "unparsed"})
+
+        errors, snapshot = self._write_changes(changes, dry_run, 'apply')
+        self._summary("apply", start, dry_run=dry_run, files=len(file_data), changed=len(changes) - errors,
+                      unchanged=unchanged, unparsed=len(unparsed), errors=errors, snapshot=snapshot)
+        return 1 if errors else 0
+
+    def transform_command(self, paths, transform, dry_run=False):
+        """Run transform rules over every file's tags, writing only real changes."""
+        start = time.perf_counter()
+        file_data = MetadataStore()
+        for file_path, metadata, _ in self._read_paths(paths):
+            file_data[file_path] = metadata
+        with PROFILER.span('plan', files=len(file_data)):
+            changes, unchanged = transform.plan(file_data)
+        errors, snapshot = self._write_changes(changes, dry_run, 'transform')
+        self._summary("transform", start, dry_run=dry_run, files=len(file_data), changed=len(changes) - errors,
+                      unchanged=unchanged, errors=errors, snapshot=snapshot)
+        return 1 if errors else 0
+
+    def _write_changes(self, changes, dry_run, label):
+        """Write (file_path, current, changed) on the pool and emit one record per file.
+
+        Returns the error count and the path of the tag snapshot taken (or None).
+        """
+        snapshot = None
+        if dry_run:
+            results = [(file_path, None, False) for file_path, _, _ in changes]
+        else:
+            metadata_index = MetadataIndex(self.index_path) if self.use_index else None
+            if changes:
+                snapshot = self._open_snapshot(label, dry_run)
+            try:
+                results = apply_metadata_changes(changes, self.pool, metadata_index, padding=self.tag_padding,
+                                                 snapshot=snapshot)
+            finally:
+                if snapshot is not None:
+                    snapshot.close()
+            if metadata_index is not None:
+                metadata_index.close()
+        errors = 0
+        for (file_path, current, changed), (_, error, in_place) in zip(changes, results):
+            record = {"type": "file", "path": file_path,
+                      "changes": {field: [current.get(field, ''), value] for field, value in changed.items()}}
+            if error is not None:
+                errors += 1
+                record.update(status="error", error=str(error))
+            elif dry_run:
+                record.update(status="would_change")
+            else:
+                record.update(status="changed", in_place=in_place)
+            self.emit(record)
+        return errors, snapshot and snapshot.path
+
+    def strip_command(self, paths, dry_run=False, frames=None):
+        """Remove all tags, or only the given frames, from every file."""
+        start = time.perf_counter()
+        files = self._music_files(paths)
+        snapshot = self._open_snapshot('strip', dry_run)
+        if dry_run:
+            results = ((file_path, None, None) for file_path in files)
+        else:
+            # Files are stripped while the tree is still being walked, with a bounded backlog
+            strip = partial(_strip_file, frames=frames, padding=self.tag_padding)
+            if snapshot is not None:
+                results = snapshot.stream(self.pool, strip, files)
+            else:
+                results = (result for _, result in self.pool.stream(strip, files))
+        errors = skipped = reclaimed = 0
+        done = []
+        for file_path, error, size in results:
+            if error is not None:
+                errors += 1
+                self.emit({"type": "file", "path": file_path, "status": "error", "error": str(error)})
+                continue
+            done.append(file_path)
+            if dry_run:
+                self.emit({"type": "file", "path": file_path, "status": "would_strip"})
+            elif size is None:
+                skipped += 1
+                self.emit({"type": "file", "path": file_path, "status": "skipped"})
+            else:
+                reclaimed += size
+                self.emit({"type": "file", "path": file_path, "status": "stripped", "bytes": size})
+        if snapshot is not None:
+            snapshot.close()
+        if self.use_index and not dry_run:
+            metadata_index = MetadataIndex(self.index_path)
+            if frames:
+                # Fields were kept; drop the entries so the next read refreshes size/mtime
+                metadata_index.remove_many(done)
+            else:
+                metadata_index.update_many([(file_path, {field: '' for field in METADATA_FIELDS})
+                                            for file_path in done])
+            metadata_index.close()
+        self._summary("strip", start, dry_run=dry_run, files=len(done) + errors,
+                      stripped=len(done) - skipped, skipped=skipped, bytes_reclaimed=reclaimed, errors=errors,
+                      snapshot=snapshot and snapshot.path)
+        return 1 if errors else 0
+
+    def export_command(self, paths, output=None, fmt=None):
+        """Stream path, filename and every metadata field of each file as CSV or JSON lines."""
+        start = time.perf_counter()
+        fmt = fmt or export_format(output)
+        target = open(output, 'w', encoding='utf-8', newline='') if output else self.out
+        try:
+            rows = ((file_path, metadata) for file_path, metadata, _ in self._read_paths(paths))
+            files = write_metadata_rows(target, rows, METADATA_FIELDS, fmt)
+        finally:
+            if output:
+                target.close()
+        self._summary("export", start, files=files, output=output, format=fmt)
+        return 0
+
+    def import_command(self, source, fmt=None, dry_run=False):
+        """Apply a CSV/JSON lines file of edits, writing only the fields that differ from the current tags."""
+        start = time.perf_counter()
+        fmt = fmt or export_format(source)
+        counts = Counter()
+        metadata_index = MetadataIndex(self.index_path if self.use_index else ':memory:')
+        snapshot = None  # one archive for every batch, opened by the first write
+        try:
+            with open(source, encoding='utf-8-sig', newline='') as f:
+                for batch in _batched(read_metadata_rows(f, fmt), IMPORT_BATCH_SIZE):
+                    snapshot = self._import_batch(batch, metadata_index, dry_run, counts, snapshot)
+        except (OSError, UnicodeDecodeError, csv.Error) as e:
+            print(f"Não foi possível ler {source}: {e}", file=sys.stderr)
+            return 2
+        finally:
+            metadata_index.close()
+            if snapshot is not None:
+                snapshot.close()
+        self._summary("import", start, dry_run=dry_run, rows=counts['rows'], changed=counts['changed'],
+                      unchanged=counts['unchanged'], missing=counts['missing'], invalid=counts['invalid'],
+                      errors=counts['errors'], snapshot=snapshot and snapshot.path)
+        return 1 if counts['errors'] or counts['missing'] or counts['invalid'] else 0
+
+    def _import_batch(self, batch, metadata_index, dry_run, counts, snapshot=None):
+        """Diff one batch of import rows against the current tags and write the changes.
+
+        Returns the tag snapshot in use, opening it on the first batch that writes.
+        """
+        counts['rows'] += len(batch)
+        edits = {}  # file_path -> (line, edits); later rows for a file add to earlier ones
+        for line, file_path, row_edits, error in batch:
+            if error is not None:
+                counts['invalid'] += 1
+                self.emit({"type": "row", "line": line, "status": "invalid", "error": error})
+            elif file_path in edits:
+                edits[file_path][1].update(row_edits)
+            else:
+                edits[file_path] = (line, row_edits)
+        current = read_current_metadata(list(edits), self.pool, metadata_index, METADATA_FIELDS, self.fast_read)
+        changes = []
+        lines = []
+        for file_path, (line, row_edits) in edits.items():
+            if file_path not in current:
+                counts['missing'] += 1
+                self.emit({"type": "row", "line": line, "path": file_path, "status": "missing"})
+                continue
+            changed = diff_metadata(current[file_path], row_edits)
+            if changed:
+                changes.append((file_path, current[file_path], changed))
+                lines.append(line)
+            else:
+                counts['unchanged'] += 1
+        if dry_run:
+            results = [(file_path, None, False) for file_path, _, _ in changes]
+        else:
+            if snapshot is None and changes:
+                snapshot = self._open_snapshot('import', dry_run)
+            results = apply_metadata_changes(changes, self.pool, metadata_index, padding=self.tag_padding,
+                                             snapshot=snapshot)
+        for line, (file_path, current_metadata, changed), (_, error, in_place) in zip(lines, changes, results):
+            record = {"type": "row", "line": line, "path": file_path,
+                      "changes": {field: [current_metadata.get(field, ''), value] for field, value in changed.items()}}
+            if error is not None:
+                counts['errors'] += 1
+                record.update(status="error", error=str(error))
+            else:
+                counts['changed'] += 1
+                if dry_run:
+                    record.update(status="would_change")
+                else:
+                    record.update(status="changed", in_place=in_place)
+            self.emit(record)
+        return snapshot
+
+    def restore_command(self, source):
+        """Put back the tags saved in a snapshot, rewriting only the files that differ from it."""
+        start = time.perf_counter()
+        counts = Counter()
+        restored = []
+        try:
+            for file_path, error, changed in restore_snapshot(source, self.pool, self.tag_padding):
+                if isinstance(error, FileNotFoundError):
+                    counts['missing'] += 1
+                    self.emit({"type": "file", "path": file_path, "status": "missing"})
+                elif error is not None:
+                    counts['errors'] += 1
+                    self.emit({"type": "file", "path": file_path, "status": "error", "error": str(error)})
+                elif changed:
+                    restored.append(file_path)
+                    self.emit({"type": "file", "path": file_path, "status": "restored"})
+                else:
+                    counts['unchanged'] += 1
+                    self.emit({"type": "file", "path": file_path, "status": "unchanged"})
+        except (OSError, ValueError, EOFError) as e:
+            print(f"Não foi possível ler {source}: {e}", file=sys.stderr)
+            return 2
+        if self.use_index:
+            # The fields are only known by reading the files again; the next scan does it
+            metadata_index = MetadataIndex(self.index_path)
+            metadata_index.remove_many(restored)
+            metadata_index.close()
+        self._summary("restore", start, files=len(restored) + sum(counts.values()), restored=len(restored),
+                      unchanged=counts['unchanged'], missing=counts['missing'], errors=counts['errors'])
+        return 1 if counts['errors'] or counts['missing'] else 0
+
     def process(self, path):
         self.log(f"Processando pasta: {path}")
-        files_to_process = []
-        for root, dirs, files in os.walk(path):
-            for file in files:
-                if file.lower().endswith('.mp3'):
-                    files_to_process.append(os.path.join(root, file))
+        files_to_process = list(scan_music_files(path))
 
         self.log(f"Encontrados {len(files_to_process)} arquivos.")
 
         if not files_to_process:
-            self.log("Nenhum arquivo MP3 encontrado para processar.")
+            self.log("Nenhum arquivo de música encontrado para processar.")
             return
 
         success_count = 0
         error_count = 0
 
-        for file_path in files_to_process:
-            filename = os.path.basename(file_path)
-            metadata = self.parse_filename(filename)
-            if metadata:
-                try:
-                    try:
-                        audio = MP3(file_path, ID3=EasyID3)
-                    except ID3NoHeaderError:
-                        audio = MP3(file_path)
-                        audio.add_tags()
-                        audio = MP3(file_path, ID3=EasyID3)
-
-                    if metadata['title']:
-                        audio['title'] = metadata['title']
-                    if metadata['artist']:
-                        audio['artist'] = metadata['artist']
-                    if metadata['track']:
-                        audio['tracknumber'] = metadata['track']
-                    audio['album'] = os.path.basename(os.path.dirname(file_path))
-                    audio.save()
-
-                    log_msg = f"[OK] {filename} -> T: {metadata['title']}"
-                    if metadata['artist']:
-                        log_msg += f", A: {metadata['artist']}"
-                    self.log(log_msg)
-                    success_count += 1
-                except Exception as e:
-                    self.log(f"[ERRO] Falha ao salvar {filename}: {e}")
-                    error_count += 1
+        start = time.perf_counter()
+        parsed, report = self.parse_folders(files_to_process)
+        for folder, rule, files, misfits in report:
+            self.log(f"[PASTA] {folder}: padrão {rule or '(nenhum)'}, {files} arquivo(s), "
+                     f"{misfits} fora do padrão")
+        tag_file = partial(_tag_from_filename, padding=self.tag_padding)
+        for ok, log_msg in self.pool.map(tag_file, list(parsed.items())):
+            self.log(log_msg)
+            if ok:
+                success_count += 1
             else:
-                self.log(f"[PULAR] Formato não reconhecido: {filename}")
                 error_count += 1
+        elapsed = time.perf_counter() - start
         self.log(f"\nConcluído! Sucesso: {success_count}, Erros/Pulados: {error_count}")
+        self.log(f"{len(files_to_process)} arquivos em {elapsed:.1f}s "
+                 f"({len(files_to_process) / max(elapsed, 1e-6):.0f} arq/s, {self.pool.workers} workers)")
+
+    def search(self, path, query, field=None, fuzzy=True):
+        """Print the files under path matching query, best matches first when fuzzy."""
+        index = SearchIndex(METADATA_FIELDS)
+        metadata_index = MetadataIndex(self.index_path if self.use_index else ':memory:')
+        try:
+            for file_path, metadata, _ in read_library(path, self.pool, metadata_index, METADATA_FIELDS,
+                                                       fast=self.fast_read):
+                index.set_row(file_path, metadata)
+        finally:
+            metadata_index.close()
+        if fuzzy:
+            results = index.fuzzy_search(query, field)
+        else:
+            results = index.search(query, field)
+        for file_path in results:
+            self.log(file_path)
+        self.log(f"\n{len(results)} resultado(s) para '{query}'.")
 
-def run_cli():
+def run_cli(args, filename_rules=None):
     print("=== Organizador de Músicas (Modo CLI) ===")
     print("Interface gráfica não disponível neste ambiente.")
     path = input("Digite o caminho da pasta com as músicas: ").strip()
@@ -961,14 +5078,162 @@ def run_cli():
         print("Pasta inválida ou não encontrada.")
         return
 
-    cli_editor = CLIEditor()
+    cli_editor = CLIEditor(args.workers, args.pool, not args.full_read, args.tag_padding, filename_rules)
     cli_editor.process(path)
     print("\nProcessamento CLI finalizado!")
 
+def run_command(args, filename_rules=None):
+    """Run a headless subcommand; returns the process exit code."""
+    paths = [args.source] if args.command in ('import', 'restore') else args.paths
+    missing = [p for p in paths if not os.path.exists(p)]
+    if missing:
+        print(f"Caminho(s) não encontrado(s): {', '.join(missing)}", file=sys.stderr)
+        return 2
+    snapshot = False if getattr(args, 'no_snapshot', False) else getattr(args, 'snapshot', None) or True
+    cli_editor = CLIEditor(args.workers, args.pool, not args.full_read, args.tag_padding, filename_rules,
+                           use_index=not args.no_index, snapshot=snapshot)
+    if args.command == 'scan':
+        return cli_editor.scan_command(args.paths)
+    elif args.command in ('apply', 'parse'):
+        return cli_editor.apply_command(args.paths, args.dry_run)
+    elif args.command == 'strip':
+        return cli_editor.strip_command(args.paths, args.dry_run, args.frames)
+    elif args.command == 'export':
+        return cli_editor.export_command(args.paths, args.output, args.format)
+    elif args.command == 'import':
+        return cli_editor.import_command(args.source, args.format, args.dry_run)
+    elif args.command == 'restore':
+        return cli_editor.restore_command(args.source)
+    elif args.command == 'transform':
+        try:
+            transform = Transform.load(args.transforms)
+        except (OSError, ValueError, re.error) as e:
+            print(f"Não foi possível carregar as transformações de {args.transforms}: {e}", file=sys.stderr)
+            return 2
+        return cli_editor.transform_command(args.paths, transform, args.dry_run)
+
+def _add_common_arguments(parser, suppress=False):
+    # Subcommands repeat these with SUPPRESS defaults so they can follow the subcommand name
+    default = (lambda value: argparse.SUPPRESS) if suppress else (lambda value: value)
+    parser.add_argument("--workers", type=int, default=default(DEFAULT_READER_WORKERS),
+                        help="Número de leitores/gravadores em paralelo")
+    parser.add_argument("--pool", choices=TagReaderPool.MODES, default=default('thread'),
+                        help="Tipo de pool: threads ou processos")
+    parser.add_argument("--full-read", action="store_true", default=default(False),
+                        help="Lê o arquivo completo (cabeçalhos de áudio inclusive) em vez de apenas as tags")
+    parser.add_argument("--tag-padding", type=int, default=default(DEFAULT_TAG_PADDING),
+                        help="Bytes de padding reservados ao criar/ampliar uma tag")
+    parser.add_argument("--rules", metavar="ARQUIVO", default=default(None),
+                        help="Arquivo JSON com regras extras de leitura do nome do arquivo")
+    parser.add_argument("--no-index", action="store_true", default=default(False),
+                        help="Não usa nem atualiza o índice de metadados em disco")
+    parser.add_argument("--profile", metavar="ARQUIVO", default=default(None),
+                        help="Mede as etapas e grava um relatório JSON ao sair (Chrome trace se terminar em .trace.json)")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Organizador de Músicas")
+    _add_common_arguments(parser)
+    parser.add_argument("--frame-budget", type=int, default=DEFAULT_FRAME_BUDGET_MS,
+                        help="Tempo máximo (ms) por quadro para atualizar a tabela")
+    parser.add_argument("--watch", action="store_true",
+                        help="Monitora a pasta carregada e atualiza só os arquivos alterados")
+    parser.add_argument("--virtual-table", action="store_true",
+                        help="Inicia com a tabela virtualizada (bibliotecas muito grandes)")
+    parser.add_argument("--search", metavar="TEXTO",
+                        help="Busca aproximada (sem acentos, tolera erros) em --folder e sai")
+    parser.add_argument("--folder", help="Pasta usada por --search")
+    parser.add_argument("--startup-time", action="store_true",
+                        help="Mostra o tempo de importação e da primeira pintura da janela (que é fechada em seguida)")
+    parser.add_argument("--field", choices=['filename'] + METADATA_FIELDS,
+                        help="Restringe --search a um campo")
+    parser.add_argument("--exact", action="store_true",
+                        help="Usa busca por substring em vez da aproximada")
+
+    # Headless subcommands: JSON lines per file on stdout, then a summary line
+    subparsers = parser.add_subparsers(dest="command", metavar="COMANDO")
+    commands = [
+        ("scan", [], "Lê as tags (atualizando o índice) e lista os arquivos"),
+        ("apply", ["parse"], "Cria metadados a partir do nome dos arquivos"),
+        ("strip", [], "Remove todas as tags"),
+        ("export", [], "Exporta caminho, nome e metadados em CSV ou JSON lines"),
+        ("import", [], "Aplica um arquivo CSV/JSON lines de edições, gravando só o que mudou"),
+        ("transform", [], "Aplica regras de substituição/regex/caixa/espaços aos metadados"),
+        ("restore", [], "Restaura as tags salvas em um snapshot, regravando só os arquivos diferentes"),
+    ]
+    for name, aliases, help_text in commands:
+        command = subparsers.add_parser(name, aliases=aliases, help=help_text, description=help_text)
+        if name == "import":
+            command.add_argument("source", metavar="ARQUIVO",
+                                 help="Arquivo com as colunas path e os campos a alterar (ex. um export editado)")
+        elif name == "restore":
+            command.add_argument("source", metavar="ARQUIVO",
+                                 help="Snapshot (.snap) salvo antes de um strip/apply/import/transform")
+        else:
+            command.add_argument("paths", nargs="+", metavar="CAMINHO",
+                                 help="Pastas ou arquivos de música (MP3, FLAC, M4A, OGG)")
+        _add_common_arguments(command, suppress=True)
+        if name in ("apply", "strip", "import", "transform"):
+            command.add_argument("--dry-run", action="store_true",
+                                 help="Só relata o que seria feito, sem gravar")
+            command.add_argument("--snapshot", metavar="ARQUIVO",
+                                 help="Onde salvar as tags atuais antes de gravar (padrão: pasta de cache, "
+                                      f"mantendo os {SNAPSHOT_KEEP} mais recentes)")
+            command.add_argument("--no-snapshot", action="store_true",
+                                 help="Não salva as tags atuais antes de gravar")
+        if name == "export":
+            command.add_argument("--output", "-o", metavar="ARQUIVO",
+                                 help="Arquivo de saída (padrão: saída padrão)")
+        if name in ("export", "import"):
+            command.add_argument("--format", choices=EXPORT_FORMATS,
+                                 help="Formato do arquivo (padrão: csv para .csv, senão jsonl)")
+        if name == "strip":
+            command.add_argument("--frames", nargs="+", metavar="QUADRO",
+                                 help=f"Remove só estes grupos ({', '.join(STRIP_GROUPS)}) ou chaves "
+                                      "de tag (ex. TXXX:foo), mantendo o resto")
+        if name == "transform":
+            command.add_argument("--transforms", metavar="ARQUIVO", required=True,
+                                 help="Arquivo JSON com a lista ordenada de regras de transformação")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
-    if GUI_AVAILABLE:
+    # Required for the process pool inside a PyInstaller executable
+    multiprocessing.freeze_support()
+    args = parse_args()
+    try:
+        filename_rules = FilenameRules.load(args.rules)
+    except (OSError, ValueError, re.error) as e:
+        print(f"Não foi possível carregar as regras de {args.rules}: {e}")
+        sys.exit(1)
+    if args.profile:
+        PROFILER.enable()
+    exit_code = 0
+    app = None
+    if args.command:
+        with PROFILER.span(args.command):
+            exit_code = run_command(args, filename_rules)
+    elif args.search is not None:
+        if not args.folder or not os.path.isdir(args.folder):
+            print("Informe uma pasta válida com --folder.")
+            sys.exit(1)
+        with PROFILER.span('search'):
+            CLIEditor(args.workers, args.pool, not args.full_read, args.tag_padding).search(args.folder, args.search, args.field, not args.exact)
+    elif GUI_AVAILABLE:
         root = tk.Tk()
-        app = MusicMetadataEditor(root)
-        root.mainloop()
+        # The GUI writes the profile from on_closing
+        app = MusicMetadataEditor(root, args.workers, args.pool, args.frame_budget, args.virtual_table,
+                                  not args.full_read, args.tag_padding, filename_rules, args.profile,
+                                  args.watch)
+        if args.startup_time:
+            # Let the theme load too, so the report lists every module a start loads
+            root.update()
+            print(json.dumps(startup_report(app.first_paint)), file=sys.stderr)
+            root.destroy()
+        else:
+            root.mainloop()
     else:
-        run_cli()
+        run_cli(args, filename_rules)
+    if args.startup_time and app is None:
+        print(json.dumps(startup_report()), file=sys.stderr)
+    if args.profile and app is None:
+        PROFILER.export(args.profile)
+    sys.exit(exit_code)
@@ -0,0 +1,104 @@
+import io
+import os
+import json
+
+import mutagen
+from mutagen.flac import FLAC, Picture
+from mutagen.mp4 import MP4Cover, MP4FreeForm
+
+from benchmark import generate_corpus
+from main import CLIEditor, read_metadata_file
+
+
+def run(command, *args, **options):
+    """Run a CLIEditor command without index or snapshot; returns (exit code, JSON lines)."""
+    out = io.StringIO()
+    editor = CLIEditor(use_index=False, out=out, snapshot=False, **options)
+    code = getattr(editor, command)(*args)
+    return code, [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def test_apply_on_process_pool(tmp_path):
+    files = generate_corpus(str(tmp_path), 12, tag_density=0.0, untagged=1.0, album_size=3,
+                            formats=('mp3', 'flac', 'm4a', 'ogg'))
+    code, records = run('apply_command', [str(tmp_path)], workers=2, mode='process')
+    summary = records[-1]
+    assert code == 0
+    assert summary['errors'] == 0 and summary['changed'] > 0
+    assert any(read_metadata_file(path)['title'] for path in files)
+
+
+def test_process_on_process_pool(tmp_path, capsys):
+    files = generate_corpus(str(tmp_path), 8, untagged=1.0, album_size=4, formats=('mp3', 'flac'))
+    CLIEditor(2, 'process', use_index=False).process(str(tmp_path))
+    assert "Erros/Pulados: 0" in capsys.readouterr().out
+    assert all(read_metadata_file(path)['album'] == os.path.basename(os.path.dirname(path)) for path in files)
+
+
+def test_dry_run_reports_would_change(tmp_path):
+    generate_corpus(str(tmp_path), 6, tag_density=0.0, untagged=1.0, album_size=3)
+    code, records = run('apply_command', [str(tmp_path)], True)
+    statuses = {record['status'] for record in records if record['type'] == 'file'}
+    assert code == 0
+    assert 'would_change' in statuses and 'changed' not in statuses
+
+
+def test_strip_removes_flac_pictures(tmp_path):
+    [path] = generate_corpus(str(tmp_path), 1, untagged=0.0, formats=('flac',))
+    audio = FLAC(path)
+    picture = Picture()
+    picture.data = b'\x89PNG' + b'x' * 4000
+    audio.add_picture(picture)
+    audio.save()
+
+    code, records = run('strip_command', [str(tmp_path)])
+    assert code == 0 and records[0]['status'] == 'stripped'
+    audio = FLAC(path)
+    assert not audio.pictures and not audio.tags
+
+    # Art alone is still a tag to strip
+    audio.add_picture(picture)
+    audio.save()
+    code, records = run('strip_command', [str(tmp_path)])
+    assert records[0]['status'] == 'stripped' and not FLAC(path).pictures
+    code, records = run('strip_command', [str(tmp_path)])
+    assert records[0]['status'] == 'skipped'
+
+
+def all_tags(path):
+    audio = mutagen.File(path)
+    tags = sorted((str(key), repr(value)) for key, value in (audio.tags.items() if audio.tags else ()))
+    return tags, [picture.data for picture in getattr(audio, 'pictures', [])]
+
+
+def test_snapshot_restores_every_tag(tmp_path):
+    files = generate_corpus(str(tmp_path / "lib"), 8, untagged=0.25, album_size=2,
+                            formats=('mp3', 'flac', 'm4a', 'ogg'))
+    for path in files:
+        audio = mutagen.File(path)
+        if path.endswith('.mp3') or audio.tags is None:
+            continue
+        if path.endswith('.m4a'):
+            audio.tags['\xa9cmt'] = ['comentário']
+            audio.tags['covr'] = [MP4Cover(b'\x89PNG' + b'c' * 500)]
+            audio.tags['----:com.apple.iTunes:replaygain_track_gain'] = [MP4FreeForm(b'-6.1 dB')]
+        else:
+            audio.tags['comment'] = 'comentário'
+            audio.tags['replaygain_track_gain'] = '-6.1 dB'
+            if path.endswith('.flac'):
+                picture = Picture()
+                picture.data = b'\x89PNG' + b'p' * 500
+                audio.add_picture(picture)
+        audio.save()
+    before = {path: all_tags(path) for path in files}
+    snapshot = str(tmp_path / "tags.snap")
+
+    editor = CLIEditor(use_index=False, out=io.StringIO(), snapshot=snapshot)
+    assert editor.strip_command([str(tmp_path / "lib")]) == 0
+    assert all(not all_tags(path)[0] and not all_tags(path)[1] for path in files)
+
+    code, records = run('restore_command', snapshot)
+    assert code == 0
+    assert {path: all_tags(path) for path in files} == before
+    code, records = run('restore_command', snapshot)
+    assert records[-1]['restored'] == 0
@@ -0,0 +1,19 @@
+import os
+
+from main import MetadataIndex
+
+
+def test_load_folder_includes_non_bmp_names(tmp_path):
+    folder = tmp_path / "música"
+    folder.mkdir()
+    names = ["a.mp3", "\U0001f3b5 emoji.mp3", "\U00020000 ext-b.mp3", "￿.mp3"]
+    index = MetadataIndex(':memory:')
+    for name in names:
+        (folder / name).write_bytes(b'')
+        index.update(str(folder / name), {'title': name})
+    (tmp_path / "músicas").mkdir()
+    (tmp_path / "músicas" / "outra.mp3").write_bytes(b'')
+    index.update(str(tmp_path / "músicas" / "outra.mp3"), {})
+
+    found = index.load_folder(str(folder))
+    assert sorted(os.path.basename(path) for path in found) == sorted(names)
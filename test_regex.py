@@ -1,35 +1,114 @@
 import re
+import os
+import sys
+import time
+import random
 
-def parse_filename(filename):
-    # Remove extension
-    if '.' in filename:
-        name = filename.rsplit('.', 1)[0]
-    else:
-        name = filename
-
-    # Regex patterns to try
-    # Pattern 1: Track - Title - Artist (Standard)
-    # Handles: "01 - DE LADINHO - IVETE SANGALO", "03a - MUSICA - ARTISTA"
-    # Also handles loose spacing around hyphens
-    pattern1 = r"^(\d+[a-zA-Z]?)\s*-\s*(.+?)\s*-\s*(.+)$"
-
-    match = re.match(pattern1, name)
-    if match:
-        return {
-            "track": match.group(1).strip(),
-            "title": match.group(2).strip(),
-            "artist": match.group(3).strip()
-        }
+from main import DEFAULT_FILENAME_RULES, FilenameRules, filename_metadata
+
+
+def legacy_parse_filename(filename):
+    """The original per-call parser: rebuilds and tries each pattern with re.match."""
+    name, _ = os.path.splitext(filename)
+    patterns = [rule['pattern'] for rule in DEFAULT_FILENAME_RULES]
+    for pattern in patterns:
+        match = re.match(pattern, name)
+        if match:
+            parsed = {'track': None, 'title': None, 'artist': None}
+            parsed.update({k: v.strip() for k, v in match.groupdict().items()})
+            return parsed
     return None
 
+
+def synthetic_names(count, seed=0):
+    """Reproducible mix of every default format plus names no rule accepts."""
+    rng = random.Random(seed)
+    words = ["AMOR", "Saudade", "ESTRADA", "Coração", "Luar", "SERTÃO", "Mar", "Festa",
+             "Viola", "Noite", "Xote", "Forró", "Pé", "de", "Serra", "Lua", "Café"]
+
+    def phrase():
+        return " ".join(rng.choice(words) for _ in range(rng.randint(1, 4)))
+
+    names = []
+    for _ in range(count):
+        kind = rng.randrange(5)
+        track = f"{rng.randint(1, 99):02d}" + rng.choice(["", "", "", "a"])
+        if kind == 0:
+            name = f"{track} - {phrase()} - {phrase()}"
+        elif kind == 1:
+            name = f"{track} - {phrase()}   {phrase()}"
+        elif kind == 2:
+            name = f"{track}- {phrase()}"
+        elif kind == 3:
+            name = f"{phrase()} - {phrase()}"
+        else:
+            name = phrase()
+        names.append(name + ".mp3")
+    return names
+
+
+def test_compiled_rules_match_legacy_parser():
+    names = synthetic_names(5000) + test_cases
+    rules = FilenameRules()
+    assert [rules.parse(n) for n in names] == [legacy_parse_filename(n) for n in names]
+
+
+def test_custom_rule_fields_become_tags():
+    rules = FilenameRules([
+        {"name": "disco", "pattern": r"^(?P<track>\d+) - (?P<title>.+) \[(?P<album>[^\]]+)\] \((?P<genre>\w+)\)$"},
+        {"name": "ano", "pattern": r"^(?P<title>.+) \((?P<date>\d{4})\)$"},
+    ])
+    path = os.path.join("Musicas", "Pasta", "03 - Luar [Sertão] (Forró).mp3")
+    assert filename_metadata(path, rules.parse(os.path.basename(path))) == {
+        'tracknumber': '03', 'title': 'Luar', 'album': 'Sertão', 'genre': 'Forró'}
+    # Without an album group the folder name is the album
+    path = os.path.join("Musicas", "Pasta", "Saudade (1999).mp3")
+    assert filename_metadata(path, rules.parse(os.path.basename(path))) == {
+        'title': 'Saudade', 'date': '1999', 'album': 'Pasta'}
+
+
+def benchmark(count):
+    names = synthetic_names(count)
+    distinct = len(set(names))
+
+    start = time.perf_counter()
+    legacy = [legacy_parse_filename(n) for n in names]
+    legacy_time = time.perf_counter() - start
+
+    rules = FilenameRules()
+    start = time.perf_counter()
+    compiled = [rules.parse(n) for n in names]
+    cold_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    [rules.parse(n) for n in names]
+    warm_time = time.perf_counter() - start
+
+    assert compiled == legacy, "compiled rules disagree with the legacy parser"
+    print(f"\n{count} nomes ({distinct} distintos)")
+    print(f"  legado (re.match sequencial): {legacy_time:.3f}s")
+    print(f"  regras compiladas (1ª vez):   {cold_time:.3f}s ({legacy_time / cold_time:.1f}x)")
+    print(f"  regras compiladas (memo):     {warm_time:.3f}s ({legacy_time / warm_time:.1f}x)")
+
+
 test_cases = [
     "01 - DE LADINHO - IVETE SANGALO.mp3",
     "03 - MUSICA- ARTISTA.mp3",
     "03a - MUSICA - ARTISTA.mp3",
     "04 - MUSICA - ARTISTA", # No extension
     "10 - Title With - Dash - Artist", # Tricky one
-    "Invalid Format - Artist"
+    "50 - SERTANEJA   DINO FRANCO E MOURAÍ.mp3",
+    "40- Footloose.mp3",
+    "SANTANA O CANTADOR - XOTE PÉ DE SERRA.mp3",
+    "Invalid Format - Artist",
+    "SemSeparador.mp3",
 ]
 
-for test in test_cases:
-    print(f"Testing: '{test}' -> {parse_filename(test)}")
+if __name__ == "__main__":
+    rules = FilenameRules()
+    for test in test_cases:
+        index, parsed = rules.match(test)
+        rule = rules.names[index] if index is not None else None
+        print(f"Testing: '{test}' -> {parsed} [{rule}]")
+
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 300_000)
@@ -0,0 +1,69 @@
+import os
+
+from main import SearchIndex, fold_text
+
+FIELDS = ('title', 'artist', 'album')
+
+
+def index_of(rows):
+    index = SearchIndex(FIELDS)
+    for file_path, metadata in rows.items():
+        index.set_row(file_path, metadata)
+    return index
+
+
+ROWS = {
+    os.path.join("lib", "01 - Luar.mp3"): {'title': 'Luar do Sertão', 'artist': 'Luiz Gonzaga', 'album': 'Xote'},
+    os.path.join("lib", "02 - Viola.mp3"): {'title': 'Viola Enluarada', 'artist': 'Marcos Valle', 'album': 'Viola'},
+    os.path.join("lib", "03 - Mar.mp3"): {'title': 'O Mar', 'artist': 'Dorival Caymmi', 'album': 'Canções'},
+}
+LUAR, VIOLA, MAR = ROWS
+
+
+def test_substring_search_follows_edits_and_removals():
+    index = index_of(ROWS)
+    assert index.search("LUAR") == [LUAR, VIOLA]  # "Enluarada" contains it too, row order kept
+    assert index.search("lu", 'artist') == [LUAR]
+    assert index.search("mar", 'filename') == [MAR]
+    # Queries never match across field boundaries
+    assert index.search("sertão\nluiz") == []
+
+    index.set_row(MAR, dict(ROWS[MAR], title='Luar do Mar'))
+    assert index.search("luar", 'title') == [LUAR, VIOLA, MAR]
+    index.set_row(LUAR, dict(ROWS[LUAR], title='Asa Branca'))
+    assert index.search("luar", 'title') == [VIOLA, MAR]
+    index.remove(VIOLA)
+    assert index.search("luar", 'title') == [MAR]
+    # A re-added row is found again under its new values
+    index.set_row(VIOLA, ROWS[VIOLA])
+    assert index.search("luar", 'title') == [VIOLA, MAR]
+
+
+def test_narrowing_a_previous_result():
+    index = index_of(ROWS)
+    previous = index.search("lua")
+    assert index.search("luar do", candidates=previous) == index.search("luar do") == [LUAR]
+
+
+def test_fuzzy_search_folds_accents_and_ranks_matches():
+    rows = {
+        "a.mp3": {'title': 'Pé de Serra', 'artist': 'Santana', 'album': 'Xote'},
+        "b.mp3": {'title': 'Sertaneja', 'artist': 'Dino Franco e Mouraí', 'album': 'Serra Acima'},
+        "c.mp3": {'title': 'Serrado', 'artist': 'Djavan', 'album': 'Pé no Chão'},
+    }
+    index = index_of(rows)
+    assert fold_text("MOURAÍ") == "mourai"
+    assert index.fuzzy_search("mourai") == ["b.mp3"]
+    # Every query word must match; exact words outrank prefixes, ties keep row order
+    assert index.fuzzy_search("pe de serra") == ["a.mp3"]
+    assert index.fuzzy_search("pe serra") == ["a.mp3", "c.mp3"]
+    assert index.fuzzy_search("serra") == ["a.mp3", "b.mp3", "c.mp3"]
+    # One typo is tolerated in longer words
+    assert index.fuzzy_search("sertanaja") == ["b.mp3"]
+    assert index.fuzzy_search("serra", 'album') == ["b.mp3"]
+    assert index.fuzzy_matches("a.mp3", "PÉ SERRA") and not index.fuzzy_matches("a.mp3", "djavan")
+
+    index.set_row("c.mp3", dict(rows["c.mp3"], artist='Mouraí'))
+    assert index.fuzzy_search("mourai") == ["b.mp3", "c.mp3"]
+    index.remove("b.mp3")
+    assert index.fuzzy_search("mourai") == ["c.mp3"]
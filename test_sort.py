@@ -0,0 +1,39 @@
+from main import MetadataStore, SortKeys, natural_key
+
+
+def test_natural_key_orders_track_numbers():
+    tracks = ['10/13', '3a', '', '10/12', '2', '03', '1/12']
+    assert sorted(tracks, key=natural_key) == ['', '1/12', '2', '03', '3a', '10/12', '10/13']
+
+
+def library(store):
+    rows = {
+        "b/03a - Mar.mp3": {'album': 'Beira', 'tracknumber': '3a', 'title': 'mar'},
+        "b/10 - Luar.mp3": {'album': 'Beira', 'tracknumber': '10/12', 'title': 'Luar'},
+        "a/02 - Viola.mp3": {'album': 'Amor', 'tracknumber': '2', 'title': 'Viola'},
+        "b/02 - Festa.mp3": {'album': 'beira', 'tracknumber': '2', 'title': 'Festa'},
+        "a/sem faixa.mp3": {'album': 'Amor', 'tracknumber': '', 'title': 'Noite'},
+    }
+    for file_path, metadata in rows.items():
+        store[file_path] = metadata
+    return store
+
+
+def test_multi_column_sort_and_key_refresh():
+    for file_data in (library({}), library(MetadataStore())):
+        keys = SortKeys()
+        paths = list(file_data)
+        keys.sort(paths, [('album', False), ('tracknumber', False)], file_data)
+        assert paths == ["a/sem faixa.mp3", "a/02 - Viola.mp3", "b/02 - Festa.mp3",
+                         "b/03a - Mar.mp3", "b/10 - Luar.mp3"]
+        assert keys.sort(list(file_data), [('title', True)], file_data)[0] == "a/02 - Viola.mp3"
+
+        # Built columns keep their keys until the edited row is refreshed
+        file_data["b/10 - Luar.mp3"] = dict(file_data["b/10 - Luar.mp3"], tracknumber='1')
+        keys.set_row("b/10 - Luar.mp3", file_data["b/10 - Luar.mp3"])
+        keys.sort(paths, [('album', False), ('tracknumber', False)], file_data)
+        assert paths[2:] == ["b/10 - Luar.mp3", "b/02 - Festa.mp3", "b/03a - Mar.mp3"]
+
+        del file_data["a/02 - Viola.mp3"]
+        keys.remove("a/02 - Viola.mp3")
+        assert "a/02 - Viola.mp3" not in keys.column('tracknumber', file_data)
@@ -0,0 +1,51 @@
+import re
+
+import pytest
+
+from main import MetadataStore, Transform
+
+RULES = [
+    {'op': 'replace', 'find': ' E ', 'replace': ' & ', 'fields': ['artist']},
+    {'op': 'trim'},
+    {'op': 'case', 'mode': 'title', 'fields': ['title']},
+    {'op': 'split_join', 'split': r'\s*[,;]\s*', 'regex': True, 'unique': True, 'fields': ['genre']},
+]
+
+
+def library(store):
+    rows = {
+        "1.mp3": {'title': 'PÉ  DE SERRA', 'artist': 'Dino Franco E Mouraí', 'genre': 'Forró, Xote; Forró'},
+        "2.mp3": {'title': 'Luar Do Sertão', 'artist': 'Luiz Gonzaga', 'genre': 'Baião'},
+        "3.mp3": {'title': 'viola d\'água ', 'artist': 'Santana', 'genre': ''},
+    }
+    for file_path, metadata in rows.items():
+        store[file_path] = metadata
+    return store
+
+
+def test_plan_lists_only_real_changes():
+    transform = Transform(RULES)
+    for file_data in (library({}), library(MetadataStore())):
+        changes, unchanged = transform.plan(file_data)
+        assert unchanged == 1
+        assert {file_path: fields for file_path, _, fields in changes} == {
+            "1.mp3": {'title': 'Pé De Serra', 'artist': 'Dino Franco & Mouraí', 'genre': 'Forró; Xote'},
+            "3.mp3": {'title': "Viola D'água"},
+        }
+        # The current values ride along for the preview
+        assert dict(changes[0][1])['artist'] == 'Dino Franco E Mouraí'
+        # Only the given rows are planned
+        changes, unchanged = transform.plan(file_data, ["2.mp3", "3.mp3", "gone.mp3"])
+        assert [(file_path, fields) for file_path, _, fields in changes] == [("3.mp3", {'title': "Viola D'água"})]
+        assert unchanged == 1
+
+
+def test_bad_rules_are_rejected():
+    with pytest.raises(re.error):
+        Transform([{'op': 'regex', 'pattern': '(unclosed'}])
+    with pytest.raises(re.error):
+        Transform([{'op': 'regex', 'pattern': 'a', 'replace': r'\2'}])
+    with pytest.raises(ValueError):
+        Transform([{'op': 'trim', 'fields': ['lyrics']}])
+    with pytest.raises(ValueError):
+        Transform([{'op': 'case', 'mode': 'camel'}])
@@ -0,0 +1,37 @@
+import time
+import threading
+
+from main import WriteBehindQueue
+
+
+def test_flush_writes_pending_edits_at_once():
+    written = []
+    queue = WriteBehindQueue(lambda path, fields: written.append((path, fields)), delay=60)
+    queue.put('a.mp3', {'title': 'A'})
+    queue.put('a.mp3', {'artist': 'B'})
+    queue.put('b.mp3', {'title': 'C'})
+    start = time.monotonic()
+    assert queue.flush(timeout=5)
+    assert time.monotonic() - start < 5
+    assert sorted(written) == [('a.mp3', {'title': 'A', 'artist': 'B'}), ('b.mp3', {'title': 'C'})]
+    assert queue.counts() == (0, 0)
+
+
+def test_unwritten_reports_pending_and_in_flight_edits():
+    started = threading.Event()
+    release = threading.Event()
+
+    def write(path, fields):
+        started.set()
+        release.wait(5)
+
+    queue = WriteBehindQueue(write, delay=0)
+    queue.put('a.mp3', {'title': 'A'})
+    assert started.wait(5)
+    queue.put('a.mp3', {'artist': 'B'})
+    queue.put('b.mp3', {'title': 'C'})
+    assert queue.unwritten(['a.mp3', 'b.mp3', 'c.mp3']) == {
+        'a.mp3': {'title': 'A', 'artist': 'B'}, 'b.mp3': {'title': 'C'}}
+    release.set()
+    assert queue.flush(timeout=5)
+    assert queue.unwritten(['a.mp3', 'b.mp3']) == {}